@@ -1,26 +1,141 @@
-from django.contrib import admin
+from datetime import timedelta
+
+from django import forms
+from django.contrib import admin, messages
+from django.db.models import Q
+from django.utils import timezone
 
 # Register your models here.
-from .models import Bus, Route, Trip, Booking
+from .models import (
+    ArchivedBooking, ArchivedTrip, Bus, Route, RoutePoint, Trip, Booking, TripSchedule, TripSeatInventory,
+)
+from .pagination import EstimatedCountPaginator
+from .schedules import generate_trips
+from .utils import fold_place_name
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Trang danh sách cho bảng lớn: không COUNT(*) cả bảng (kể cả dòng "tổng số" khi đang lọc)."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Bus)
 class BusAdmin(admin.ModelAdmin):
     list_display = ('LICENSE_PLATE', 'bus_type', 'total_seats')
+    search_fields = ('LICENSE_PLATE',)
+    ordering = ('LICENSE_PLATE',)
+
+
+class RoutePointInline(admin.TabularInline):
+    model = RoutePoint
+    extra = 0
+    fields = ('order', 'name', 'address', 'point_type', 'surcharge')
 
 
 @admin.register(Route)
 class RouteAdmin(admin.ModelAdmin):
     list_display = ('origin', 'destination', 'base_price')
+    # Cần để admin hiện ô tìm kiếm (và cho autocomplete_fields); cách tìm thật ở get_search_results
+    search_fields = ('^origin_key', '^destination_key')
+    ordering = ('origin_key', 'destination_key')
+    inlines = [RoutePointInline]
+
+    def get_search_results(self, request, queryset, search_term):
+        # Tìm theo tiền tố của cả cụm đã bỏ dấu ("Hà Nội" -> "ha noi"), không tách từng từ như search_fields
+        # của admin: dùng được route_city_keys_idx / index của destination_key
+        term = fold_place_name(search_term)
+        if not term:
+            return queryset, False
+        return queryset.filter(Q(origin_key__startswith=term) | Q(destination_key__startswith=term)), False
 
 
 @admin.register(Trip)
-class TripAdmin(admin.ModelAdmin):
+class TripAdmin(LargeTableAdmin):
     list_display = ('route', 'bus', 'departure_time', 'status')
     list_filter = ('status', 'departure_time')
+    list_select_related = ('route', 'bus')
+    autocomplete_fields = ('route', 'bus')
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Đổi xe thì số ghế thay đổi -> dựng lại sơ đồ ghế
+        if change and 'bus' in form.changed_data:
+            TripSeatInventory.rebuild(obj)
+
+
+@admin.register(TripSchedule)
+class TripScheduleAdmin(admin.ModelAdmin):
+    list_display = ('route', 'bus', 'days_of_week', 'departure_times', 'valid_from', 'valid_until', 'is_active')
+    list_filter = ('is_active',)
+    list_select_related = ('route', 'bus')
+    autocomplete_fields = ('route', 'bus')
+    actions = ['generate_next_30_days']
+
+    @admin.action(description="Sinh chuyến 30 ngày tới")
+    def generate_next_30_days(self, request, queryset):
+        today = timezone.localdate()
+        result = generate_trips(today, today + timedelta(days=29), queryset.filter(is_active=True))
+        self.message_user(request, f"Đã tạo {result['created']} chuyến, bỏ qua {result['existing']} chuyến đã có.")
+        if result['bus_conflicts']:
+            self.message_user(request, f"{len(result['bus_conflicts'])} chuyến bị bỏ qua vì xe đã chạy chuyến khác "
+                                       f"cùng giờ.", messages.WARNING)
+
+
+class BookingAdminForm(forms.ModelForm):
+    class Meta:
+        model = Booking
+        fields = '__all__'
+
+    def validate_unique(self):
+        # Thay cho UniqueConstraint(trip, seat_number) đã bỏ: Booking.save giữ ghế sau khi form đã hợp lệ,
+        # trùng chặng lúc đó là SeatConflict (lỗi 500 ở admin) nên kiểm tra trước để báo lỗi ngay trên form.
+        # Chạy sau full_clean() của model: các cột của vé đã hợp lệ
+        super().validate_unique()
+        booking = self.instance
+        if self.errors or booking.status not in Booking.ACTIVE_STATUSES:
+            return
+        taken = Booking.objects.filter(
+            trip_id=booking.trip_id, seat_number=booking.seat_number, status__in=Booking.ACTIVE_STATUSES,
+            pickup_point__order__lt=booking.dropoff_point.order, dropoff_point__order__gt=booking.pickup_point.order,
+        ).exclude(pk=booking.pk).exclude(status='PENDING', hold_expires_at__lte=timezone.now())
+        if taken.exists():
+            self.add_error('seat_number', f"Ghế số {booking.seat_number} đã có người đặt trên chặng này.")
 
 
 @admin.register(Booking)
-class BookingAdmin(admin.ModelAdmin):
+class BookingAdmin(LargeTableAdmin):
+    form = BookingAdminForm
     list_display = ('id', 'user', 'trip', 'seat_number', 'status')
     list_filter = ('status',)
+    # Booking.__str__ (nhãn checkbox) đọc điểm đón/trả, Trip.__str__ đọc route: nạp sẵn để mỗi dòng không query thêm
+    list_select_related = ('user', 'trip__route', 'pickup_point', 'dropoff_point')
+    raw_id_fields = ('user', 'trip', 'pickup_point', 'dropoff_point')
+
+
+class ArchiveAdmin(LargeTableAdmin):
+    """Bảng lưu trữ chỉ để xem, dữ liệu do lệnh archive_trips chuyển sang."""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedTrip)
+class ArchivedTripAdmin(ArchiveAdmin):
+    list_display = ('id', 'route', 'bus', 'departure_time', 'status', 'archived_at')
+    list_filter = ('status', 'departure_time')
+    list_select_related = ('route', 'bus')
+
+
+@admin.register(ArchivedBooking)
+class ArchivedBookingAdmin(ArchiveAdmin):
+    list_display = ('id', 'user', 'trip', 'seat_number', 'status', 'price_paid')
+    list_filter = ('status',)
+    list_select_related = ('user', 'trip__route')
+    raw_id_fields = ('user', 'trip', 'pickup_point', 'dropoff_point')
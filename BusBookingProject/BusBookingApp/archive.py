@@ -0,0 +1,88 @@
+"""Chuyển chuyến đã kết thúc (COMPLETED/CANCELLED) từ lâu cùng vé của chúng sang bảng lưu trữ.
+
+Mỗi lô là 1 transaction ngắn: chép chuyến và vé sang ArchivedTrip/ArchivedBooking rồi xóa khỏi
+bảng nóng. Lô bị ngắt giữa chừng thì rollback toàn bộ, nên chạy lại lúc nào cũng tiếp tục đúng
+chỗ (chỉ cần chọn lại các chuyến còn ở bảng nóng), không phải lưu trạng thái.
+
+Xóa bằng câu DELETE ... WHERE ... IN (...) thẳng qua cursor, không qua QuerySet.delete(): Collector
+sẽ nạp từng vé lên để bắn post_delete (trả ghế, làm mới cache theo từng vé). Các receiver đó không
+cần ở đây: sơ đồ ghế và SeatClaim của chuyến bị xóa cùng lô, còn cache response được làm mới
+1 lần cho mỗi chuyến sau commit (_invalidate_trips). Thêm receiver post_delete mới cho Trip/Booking
+thì phải làm phần tương ứng ở đây.
+"""
+from datetime import timedelta
+
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from .cache import invalidate_trip_responses
+from .models import ArchivedBooking, ArchivedTrip, Booking, SeatClaim, Trip, TripSeatInventory
+
+BATCH_SIZE = 100  # số chuyến mỗi lô (~ vài nghìn vé)
+INSERT_BATCH_SIZE = 1000
+
+TRIP_FIELDS = ['id', 'route_id', 'bus_id', 'departure_time', 'arrival_time', 'status']
+BOOKING_FIELDS = ['id', 'user_id', 'trip_id', 'pickup_point_id', 'dropoff_point_id', 'seat_number',
+                  'booking_time', 'status', 'price_paid']
+
+
+def archivable_trips(older_than_days):
+    """Chuyến đã kết thúc, xuất phát trước hôm nay ``older_than_days`` ngày."""
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    return Trip.objects.filter(status__in=Trip.FINISHED_STATUSES, departure_time__lt=cutoff)
+
+
+def _invalidate_trips(trips):
+    # Như receiver post_save/post_delete của Trip: chuyến, tìm kiếm theo ngày và tìm kiếm mọi chuyến
+    for trip_id, departure_time in trips:
+        invalidate_trip_responses(trip_id, timezone.localtime(departure_time).date())
+
+
+def _delete_rows(model, field_name, values):
+    """DELETE FROM <bảng của model> WHERE <cột> IN (values), không bắn signal (xem đầu module)."""
+    db = router.db_for_write(model)
+    quote_name = connections[db].ops.quote_name
+    sql = 'DELETE FROM {} WHERE {} IN ({})'.format(
+        quote_name(model._meta.db_table), quote_name(model._meta.get_field(field_name).column),
+        ', '.join(['%s'] * len(values)),
+    )
+    with connections[db].cursor() as cursor:
+        cursor.execute(sql, list(values))
+
+
+@transaction.atomic
+def archive_batch(trip_ids):
+    """Chuyển các chuyến ``trip_ids`` (và toàn bộ vé) sang bảng lưu trữ, trả về (số chuyến, số vé).
+
+    Đọc lại trạng thái trong transaction: chuyến vừa được mở lại (đổi status) thì bỏ qua.
+    """
+    trips = list(Trip.objects.select_for_update()
+                 .filter(pk__in=trip_ids, status__in=Trip.FINISHED_STATUSES).values(*TRIP_FIELDS))
+    trip_ids = [trip['id'] for trip in trips]
+    if not trip_ids:
+        return 0, 0
+    bookings = list(Booking.objects.filter(trip_id__in=trip_ids).values(*BOOKING_FIELDS))
+    ArchivedTrip.objects.bulk_create([ArchivedTrip(**trip) for trip in trips], batch_size=INSERT_BATCH_SIZE)
+    ArchivedBooking.objects.bulk_create([ArchivedBooking(**booking) for booking in bookings],
+                                        batch_size=INSERT_BATCH_SIZE)
+
+    # Bảng con trước (khóa ngoại); không qua signal, phần việc của các receiver làm ngay dưới đây
+    for model in (SeatClaim, Booking, TripSeatInventory):
+        _delete_rows(model, 'trip', trip_ids)
+    _delete_rows(Trip, 'id', trip_ids)
+    archived = [(trip['id'], trip['departure_time']) for trip in trips]
+    transaction.on_commit(lambda: _invalidate_trips(archived))
+    return len(trip_ids), len(bookings)
+
+
+def archive_trips(older_than_days, batch_size=BATCH_SIZE, max_batches=None):
+    """Chuyển dần từng lô theo thứ tự id; mỗi lô xong thì yield (số chuyến, số vé, id chuyến cuối)."""
+    last_id, batches = 0, 0
+    while max_batches is None or batches < max_batches:
+        trip_ids = list(archivable_trips(older_than_days).filter(pk__gt=last_id)
+                        .order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not trip_ids:
+            return
+        last_id = trip_ids[-1]
+        batches += 1
+        yield (*archive_batch(trip_ids), last_id)
@@ -0,0 +1,83 @@
+"""Xác thực JWT (cookie/header) có cache User trong bộ nhớ process.
+
+JWTCookieAuthentication đọc bảng auth_user ở mọi request dù token đã mang user id.
+CachedJWTCookieAuthentication giữ User đã nạp trong 1 LRU có giới hạn và TTL, khóa theo
+(user id, phiên bản). Phiên bản của từng user nằm trong cache chung (xem cache.invalidate_user)
+và được tăng khi user được lưu (đổi mật khẩu, sửa thông tin, khóa tài khoản), bị xóa hoặc đăng xuất,
+nên bản cũ không còn được đọc tới ở mọi process dùng chung cache.
+
+Vì vậy chạy nhiều worker thì cache mặc định phải dùng chung (REDIS_URL): với LocMemCache, phiên bản
+chỉ được tăng ở process đã sửa user, các worker khác vẫn nhận user cũ (kể cả đã bị khóa) tới khi
+hết hạn, nên khi đó TTL bị giới hạn ở LOCAL_CACHE_MAX_TTL (xem cache.versioned_timeout).
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from dj_rest_auth.jwt_auth import JWTCookieAuthentication
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .cache import get_user_version, versioned_timeout
+
+
+class UserCache:
+    """LRU {key: user} có giới hạn ``AUTH_USER_CACHE_SIZE`` phần tử, mỗi phần tử sống ``AUTH_USER_CACHE_TTL`` giây
+    (cache cục bộ: tối đa ``LOCAL_CACHE_MAX_TTL``)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user
+
+    def set(self, key, user):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + versioned_timeout(settings.AUTH_USER_CACHE_TTL), user)
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.AUTH_USER_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+user_cache = UserCache()
+
+
+class CachedJWTCookieAuthentication(JWTCookieAuthentication):
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None or not settings.AUTH_USER_CACHE_TTL:
+            return super().get_user(validated_token)
+
+        key = (str(user_id), get_user_version(user_id))
+        user = user_cache.get(key)
+        if user is None:
+            # Lần đầu: nạp từ DB, kiểm tra is_active/thu hồi token như JWTAuthentication
+            user = super().get_user(validated_token)
+            user_cache.set(key, user)
+        elif api_settings.CHECK_REVOKE_TOKEN and \
+                validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+            # Token cấp trước lần đổi mật khẩu gần nhất
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        # Mỗi request 1 bản sao: thuộc tính gắn thêm vào request.user không lọt sang request khác
+        return copy.copy(user)
@@ -0,0 +1,141 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.utils import timezone
+
+# Tăng khi đổi cấu trúc RouteSerializer để bỏ qua toàn bộ payload cũ trong cache
+ROUTE_PAYLOAD_SCHEMA = 2
+
+
+def _fresh_version():
+    # Phiên bản mới không bao giờ trùng phiên bản cũ, kể cả khi key version đã bị cache đẩy ra
+    return time.time_ns()
+
+
+def get_versions(names):
+    """Đọc phiên bản hiện tại của nhiều "không gian key" (1 lần get_many), chưa có thì khởi tạo."""
+    keys = {name: f'{name}:version' for name in names}
+    found = cache.get_many(keys.values())
+    versions = {}
+    for name, key in keys.items():
+        version = found.get(key)
+        if version is None:
+            cache.add(key, _fresh_version(), timeout=None)
+            version = cache.get(key)
+        versions[name] = version
+    return versions
+
+
+def bump_version(name):
+    """Đổi phiên bản: các key dựng từ phiên bản cũ không còn được đọc tới nữa và sẽ tự hết hạn."""
+    try:
+        cache.incr(f'{name}:version')
+    except ValueError:
+        cache.set(f'{name}:version', _fresh_version(), timeout=None)
+
+
+def is_shared_cache():
+    """Cache mặc định có dùng chung giữa các process (Redis...) không; LocMemCache thì mỗi process 1 bản."""
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+def versioned_timeout(timeout):
+    """TTL cho dữ liệu chỉ được làm mới bằng cách đổi phiên bản.
+
+    Với cache riêng của từng process, bump_version chỉ có tác dụng ở process đã sửa dữ liệu; các
+    worker khác chỉ thấy dữ liệu mới khi bản cũ hết hạn, nên TTL bị giới hạn ở LOCAL_CACHE_MAX_TTL.
+    """
+    if is_shared_cache():
+        return timeout
+    return min(timeout, settings.LOCAL_CACHE_MAX_TTL)
+
+
+# --------------------------------------
+# Payload tuyến đường (RouteSerializer)
+# --------------------------------------
+
+def _route_namespace(route_id):
+    return f'route:{route_id}'
+
+
+def get_route_payloads(route_ids, loader):
+    """Đọc payload RouteSerializer của nhiều tuyến từ cache, tuyến nào thiếu thì gọi ``loader``.
+
+    ``loader(missing_ids)`` trả về {route_id: payload}; kết quả được ghi lại vào cache
+    dưới key có kèm phiên bản hiện tại của tuyến (xem ``invalidate_route``).
+    """
+    route_ids = set(route_ids)
+    if not route_ids:
+        return {}
+    namespaces = {route_id: _route_namespace(route_id) for route_id in route_ids}
+    versions = get_versions(namespaces.values())
+    keys = {route_id: f'{name}:payload:{ROUTE_PAYLOAD_SCHEMA}:{versions[name]}'
+            for route_id, name in namespaces.items()}
+    cached = cache.get_many(keys.values())
+    payloads = {route_id: cached[key] for route_id, key in keys.items() if key in cached}
+    missing = route_ids - payloads.keys()
+    if missing:
+        loaded = loader(missing)
+        cache.set_many({keys[route_id]: payload for route_id, payload in loaded.items()},
+                       timeout=versioned_timeout(settings.ROUTE_CACHE_TIMEOUT))
+        payloads.update(loaded)
+    return payloads
+
+
+def invalidate_route(route_id):
+    bump_version(_route_namespace(route_id))
+
+
+# --------------------------------------
+# Response tìm kiếm/chi tiết chuyến xe
+# --------------------------------------
+
+TRIPS_ALL = 'trips:all'
+
+
+def trips_on_date(date):
+    return f'trips:date:{date.isoformat()}'
+
+
+def trip_namespace(trip_id):
+    return f'trips:trip:{trip_id}'
+
+
+def response_cache_key(scope, namespaces):
+    """Key cache của 1 response: băm phần tham số đã chuẩn hóa, kèm phiên bản của các namespace liên quan."""
+    versions = get_versions(namespaces)
+    digest = hashlib.md5(repr(scope).encode('utf-8')).hexdigest()
+    return 'trips:response:{}:{}'.format(digest, ':'.join(str(versions[name]) for name in namespaces))
+
+
+def invalidate_trip_responses(trip_id, date):
+    """Bỏ các response đã cache của 1 chuyến và của các lượt tìm kiếm có thể chứa chuyến đó."""
+    for name in (trip_namespace(trip_id), trips_on_date(date), TRIPS_ALL):
+        bump_version(name)
+
+
+def invalidate_trip_responses_on_commit(trip):
+    trip_id, date = trip.pk, timezone.localtime(trip.departure_time).date()
+    transaction.on_commit(lambda: invalidate_trip_responses(trip_id, date))
+
+
+# --------------------------------------
+# User đã xác thực (authentication.CachedJWTCookieAuthentication)
+# --------------------------------------
+
+def user_namespace(user_id):
+    return f'auth-user:{user_id}'
+
+
+def get_user_version(user_id):
+    name = user_namespace(user_id)
+    return get_versions([name])[name]
+
+
+def invalidate_user(user_id):
+    bump_version(user_namespace(user_id))
@@ -0,0 +1,115 @@
+"""Xuất vé (Booking) kèm user, chuyến, điểm đón/trả dạng CSV hoặc NDJSON, đọc và ghi theo luồng.
+
+Chỉ đọc ``values_list`` (tuple, không dựng model) theo từng lô; mỗi dòng được ghi ra ngay nên bộ nhớ
+không tăng theo số dòng. Dùng chung cho endpoint (StreamingHttpResponse) và lệnh export_bookings.
+Vé của chuyến đã chuyển sang bảng lưu trữ (ArchivedBooking, cùng tên cột) vẫn được xuất như thường.
+"""
+import csv
+import heapq
+import json
+from datetime import datetime, time, timedelta
+from operator import itemgetter
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import ArchivedBooking, ArchivedTrip, Booking, Trip
+
+CHUNK_SIZE = 2000
+
+# (tên cột, lookup)
+BOOKING_COLUMNS = [
+    ('booking_id', 'pk'),
+    ('booking_time', 'booking_time'),
+    ('status', 'status'),
+    ('seat_number', 'seat_number'),
+    ('price_paid', 'price_paid'),
+    ('user_id', 'user_id'),
+    ('username', 'user__username'),
+    ('email', 'user__email'),
+    ('trip_id', 'trip_id'),
+    ('departure_time', 'trip__departure_time'),
+    ('origin', 'trip__route__origin'),
+    ('destination', 'trip__route__destination'),
+    ('bus', 'trip__bus__LICENSE_PLATE'),
+    ('pickup_order', 'pickup_point__order'),
+    ('pickup_point', 'pickup_point__name'),
+    ('dropoff_order', 'dropoff_point__order'),
+    ('dropoff_point', 'dropoff_point__name'),
+]
+HEADER = [name for name, _ in BOOKING_COLUMNS]
+LOOKUPS = [lookup for _, lookup in BOOKING_COLUMNS]
+
+
+def manifest_queryset(trip_id):
+    """Danh sách hành khách của 1 chuyến (vé còn hiệu lực), theo thứ tự điểm đón trên tuyến.
+
+    Chuyến đã lưu trữ thì đọc từ ArchivedBooking; None nếu không có chuyến ``trip_id``.
+    """
+    if Trip.objects.filter(pk=trip_id).exists():
+        model = Booking
+    elif ArchivedTrip.objects.filter(pk=trip_id).exists():
+        model = ArchivedBooking
+    else:
+        return None
+    return model.objects.filter(trip_id=trip_id, status__in=Booking.ACTIVE_STATUSES) \
+        .order_by('pickup_point__order', 'seat_number', 'pk')
+
+
+def bookings_on(date):
+    """Vé đặt trong ngày ``date`` (giờ địa phương) ở bảng nóng và bảng lưu trữ, mỗi bảng 1 queryset theo pk."""
+    start = timezone.make_aware(datetime.combine(date, time.min))
+    return [model.objects.filter(booking_time__gte=start, booking_time__lt=start + timedelta(days=1)).order_by('pk')
+            for model in (Booking, ArchivedBooking)]
+
+
+def iter_rows(queryset, chunk_size=CHUNK_SIZE):
+    """Các dòng (tuple theo BOOKING_COLUMNS) của ``queryset`` đã sắp xếp.
+
+    Sắp xếp theo pk (bản dump lớn) thì đọc từng lô ``pk > pk cuối lô trước``: driver MySQL
+    nạp hết kết quả của 1 câu SELECT vào bộ nhớ kể cả khi dùng .iterator(), còn mỗi lô keyset
+    là 1 câu SELECT nhỏ dùng index khóa chính. Thứ tự khác (manifest 1 chuyến) thì dùng .iterator().
+    """
+    if tuple(queryset.query.order_by) not in (('pk',), ('id',)):
+        yield from queryset.values_list(*LOOKUPS).iterator(chunk_size=chunk_size)
+        return
+    last_pk = None
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(chunk.values_list(*LOOKUPS)[:chunk_size])
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last_pk = rows[-1][0]
+
+
+def iter_merged_rows(querysets):
+    """Dòng của nhiều queryset cùng sắp xếp theo pk (bảng nóng + bảng lưu trữ), trộn lại theo pk."""
+    return heapq.merge(*map(iter_rows, querysets), key=itemgetter(0))
+
+
+class _Echo:
+    # csv.writer ghi vào đây và nhận lại chuỗi vừa ghi (không giữ lại gì)
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    # BOM để Excel đọc đúng tiếng Việt
+    yield '\ufeff' + writer.writerow(HEADER)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def ndjson_lines(rows):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield encoder.encode(dict(zip(HEADER, row))) + '\n'
+
+
+# định dạng: (content type, phần mở rộng file, hàm sinh dòng)
+FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv', csv_lines),
+    'ndjson': ('application/x-ndjson; charset=utf-8', 'ndjson', ndjson_lines),
+}
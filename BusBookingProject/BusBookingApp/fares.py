@@ -0,0 +1,57 @@
+"""Giá vé theo cặp điểm đón/trả (ma trận giá) và hệ số giá theo độ lấp đầy của chuyến.
+
+Giá 1 chặng = giá gốc của tuyến + phụ phí điểm đón + phụ phí điểm trả; nếu bật
+FARE_OCCUPANCY_MULTIPLIERS thì nhân thêm hệ số theo tỉ lệ ghế đã bán của chuyến và làm tròn
+tới FARE_ROUNDING đồng. Ma trận giá gốc được tính sẵn 1 lần cùng payload tuyến đường (có cache,
+xem serializers.RouteSerializer); đặt vé dùng đúng hàm ``fare`` trên các object đã nạp sẵn.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+
+ONE = Decimal(1)
+
+
+def fare(base_price, pickup_surcharge, dropoff_surcharge, multiplier=ONE):
+    price = Decimal(base_price) + Decimal(pickup_surcharge) + Decimal(dropoff_surcharge)
+    if multiplier == ONE:
+        return price
+    step = Decimal(settings.FARE_ROUNDING)
+    return (price * multiplier / step).quantize(ONE, rounding=ROUND_HALF_UP) * step
+
+
+def fare_matrix(base_price, points):
+    """Ma trận giá gốc từ các điểm ``[(id, surcharge)]`` theo thứ tự trên tuyến.
+
+    ``fares[i]`` là giá từ điểm i tới lần lượt các điểm sau nó (i+1, i+2, ...), chỉ nửa trên
+    của ma trận vì điểm trả luôn đứng sau điểm đón.
+    """
+    surcharges = [surcharge for _, surcharge in points]
+    return {
+        'points': [point_id for point_id, _ in points],
+        'fares': [[int(fare(base_price, surcharges[i], surcharges[j])) for j in range(i + 1, len(points))]
+                  for i in range(len(points) - 1)],
+    }
+
+
+def apply_multiplier(fares, multiplier):
+    """Ma trận giá cuối của 1 chuyến từ ma trận giá gốc (``fare_matrix()['fares']``)."""
+    if multiplier == ONE:
+        return fares
+    return [[int(fare(price, 0, 0, multiplier)) for price in row] for row in fares]
+
+
+def dynamic_pricing_enabled():
+    return bool(settings.FARE_OCCUPANCY_MULTIPLIERS)
+
+
+def occupancy_multiplier(inventory):
+    """Hệ số giá theo tỉ lệ ghế không còn trống trên toàn tuyến của chuyến (1 nếu tắt)."""
+    if not dynamic_pricing_enabled() or inventory is None or not inventory.total_seats:
+        return ONE
+    occupancy = 1 - inventory.available_count / inventory.total_seats
+    multiplier = ONE
+    for threshold, value in sorted(settings.FARE_OCCUPANCY_MULTIPLIERS):
+        if occupancy >= threshold:
+            multiplier = Decimal(str(value))
+    return multiplier
@@ -0,0 +1,157 @@
+"""Đẩy thay đổi sơ đồ ghế của từng chuyến tới client (SSE, xem views.TripSeatEventsView).
+
+Mỗi lần giữ/trả ghế thành công (đặt vé, hủy vé, vé PENDING hết hạn), sau khi transaction
+commit sẽ phát 1 sự kiện ``seats`` gồm trạng thái các chặng của đúng những ghế vừa đổi.
+Backend phát chọn qua ``SEAT_EVENTS_BACKEND``: mặc định trong cùng process (chạy 1 process ASGI),
+nhiều process thì dùng Redis pub/sub.
+"""
+import asyncio
+import json
+import threading
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+# Client không theo kịp quá số sự kiện này thì bỏ hết, chỉ báo reset để tải lại sơ đồ ghế
+SUBSCRIPTION_QUEUE_SIZE = 100
+RESET = {'type': 'reset'}
+
+
+class Subscription:
+    """Hàng đợi sự kiện của 1 kết nối, gắn với event loop của kết nối đó."""
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(SUBSCRIPTION_QUEUE_SIZE)
+
+    def push(self, event):
+        # Chỉ gọi trên event loop của kết nối (loop.call_soon_threadsafe)
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESET)
+
+    async def get(self, timeout=None):
+        """Sự kiện tiếp theo; hết ``timeout`` giây mà không có thì ném TimeoutError."""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class InProcessBroadcaster:
+    """Phát sự kiện tới các kết nối SSE trong cùng process (an toàn khi gọi từ thread khác)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+
+    def has_subscribers(self, trip_id):
+        return bool(self._subscriptions.get(trip_id))
+
+    def publish(self, trip_id, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(trip_id, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.push, event)
+            except RuntimeError:
+                # Event loop của kết nối đã đóng
+                pass
+
+    @asynccontextmanager
+    async def subscribe(self, trip_id):
+        subscription = Subscription()
+        with self._lock:
+            self._subscriptions.setdefault(trip_id, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            with self._lock:
+                subscriptions = self._subscriptions.get(trip_id, set())
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    self._subscriptions.pop(trip_id, None)
+
+
+class RedisBroadcaster:
+    """Phát sự kiện qua Redis pub/sub (kênh ``seat-events:<trip_id>``) để mọi process đều nhận được."""
+    channel_prefix = 'seat-events:'
+
+    def __init__(self, url=None):
+        try:
+            import redis
+            import redis.asyncio
+        except ImportError as e:
+            raise ImproperlyConfigured("RedisBroadcaster cần cài gói redis (pip install redis).") from e
+        self.url = url or settings.SEAT_EVENTS_REDIS_URL
+        if not self.url:
+            raise ImproperlyConfigured("RedisBroadcaster cần REDIS_URL trong .env.")
+        self.redis = redis
+        self.client = redis.Redis.from_url(self.url)
+
+    def channel(self, trip_id):
+        return f'{self.channel_prefix}{trip_id}'
+
+    def has_subscribers(self, trip_id):
+        # Không biết process khác có ai đang nghe hay không
+        return True
+
+    def publish(self, trip_id, event):
+        self.client.publish(self.channel(trip_id), json.dumps(event))
+
+    @asynccontextmanager
+    async def subscribe(self, trip_id):
+        subscription = Subscription()
+        client = self.redis.asyncio.Redis.from_url(self.url)
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(self.channel(trip_id))
+
+        async def forward():
+            async for message in pubsub.listen():
+                if message['type'] == 'message':
+                    subscription.push(json.loads(message['data']))
+
+        task = asyncio.create_task(forward())
+        try:
+            yield subscription
+        finally:
+            task.cancel()
+            await pubsub.aclose()
+            await client.aclose()
+
+
+@lru_cache(maxsize=None)
+def get_broadcaster():
+    return import_string(settings.SEAT_EVENTS_BACKEND)()
+
+
+def seat_changes_event(trip_id, seat_numbers):
+    """Sự kiện ``seats``: trạng thái các chặng ('0' trống, '1' đã giữ) của từng ghế vừa đổi."""
+    from .models import TripSeatInventory
+
+    inventory = TripSeatInventory.current(trip_id)
+    if inventory is None:
+        return RESET
+    return {
+        'type': 'seats',
+        'segment_count': inventory.segment_count,
+        'available_count': inventory.available_count,
+        'seats': {str(seat_number): inventory.seat_segments(seat_number)
+                  for seat_number in sorted(seat_numbers) if 1 <= seat_number <= inventory.total_seats},
+    }
+
+
+def publish_seat_changes(trip_id, seat_numbers):
+    broadcaster = get_broadcaster()
+    # Không ai theo dõi chuyến này thì không cần đọc lại sơ đồ ghế
+    if broadcaster.has_subscribers(trip_id):
+        broadcaster.publish(trip_id, seat_changes_event(trip_id, seat_numbers))
+
+
+def publish_seat_changes_on_commit(trip_id, seat_numbers):
+    seat_numbers = list(seat_numbers)
+    transaction.on_commit(lambda: publish_seat_changes(trip_id, seat_numbers))
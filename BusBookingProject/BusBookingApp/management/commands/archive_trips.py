@@ -0,0 +1,44 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from BusBookingApp.archive import BATCH_SIZE, archivable_trips, archive_trips
+from BusBookingApp.models import Booking
+
+
+class Command(BaseCommand):
+    help = ("Chuyển chuyến đã kết thúc (COMPLETED/CANCELLED) từ lâu và vé của chúng sang bảng lưu trữ, "
+            "mỗi lô 1 transaction ngắn. Dừng giữa chừng (Ctrl+C, --max-batches) rồi chạy lại sẽ làm tiếp.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=None,
+                            help=f"Chỉ chuyển chuyến xuất phát trước số ngày này (mặc định ARCHIVE_AFTER_DAYS, "
+                                 f"hiện là {settings.ARCHIVE_AFTER_DAYS})")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help=f"Số chuyến mỗi transaction (mặc định {BATCH_SIZE})")
+        parser.add_argument('--max-batches', type=int, default=None, help="Dừng sau số lô này")
+        parser.add_argument('--pause', type=float, default=0.1,
+                            help="Số giây nghỉ giữa 2 lô để nhường khóa cho request thật và bản sao "
+                                 "bắt kịp (mặc định 0.1)")
+        parser.add_argument('--dry-run', action='store_true', help="Chỉ đếm, không ghi vào DB")
+
+    def handle(self, *args, older_than_days, batch_size, max_batches, pause, dry_run, verbosity, **options):
+        if older_than_days is None:
+            older_than_days = settings.ARCHIVE_AFTER_DAYS
+        if older_than_days < 1 or batch_size < 1:
+            raise CommandError("--older-than-days và --batch-size phải >= 1.")
+        if dry_run:
+            trips = archivable_trips(older_than_days)
+            self.stdout.write(f"[dry-run] Sẽ chuyển {trips.count()} chuyến, "
+                              f"{Booking.objects.filter(trip__in=trips).count()} vé.")
+            return
+
+        total_trips = total_bookings = 0
+        for batch, (trips, bookings, last_id) in enumerate(archive_trips(older_than_days, batch_size, max_batches), 1):
+            total_trips += trips
+            total_bookings += bookings
+            if verbosity > 1:
+                self.stdout.write(f"Lô {batch}: {trips} chuyến, {bookings} vé (tới chuyến #{last_id})")
+            time.sleep(pause)
+        self.stdout.write(f"Đã chuyển {total_trips} chuyến, {total_bookings} vé sang bảng lưu trữ.")
@@ -0,0 +1,98 @@
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from dj_rest_auth.jwt_auth import JWTCookieAuthentication
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from BusBookingApp.authentication import CachedJWTCookieAuthentication, user_cache
+from BusBookingApp.metrics import percentile
+from BusBookingApp.models import RoutePoint, Trip
+from BusBookingApp.synthetic import generate_timetable
+from BusBookingApp.views import BookingCreateView
+
+MODES = {
+    'jwt_cookie': JWTCookieAuthentication,
+    'cached_jwt_cookie': CachedJWTCookieAuthentication,
+}
+
+
+class Command(BaseCommand):
+    help = ("So sánh JWTCookieAuthentication và CachedJWTCookieAuthentication trên BookingCreateView: "
+            "số query (và số query vào auth_user) mỗi request, thời gian xử lý. Chạy trên 1 database tạm.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help="Số request đặt vé mỗi chế độ (mặc định 200)")
+        parser.add_argument('--json', action='store_true', dest='as_json', help="In kết quả dạng JSON")
+
+    def handle(self, *args, requests, as_json, **options):
+        old_name = connection.settings_dict['NAME']
+        if connection.vendor == 'sqlite':
+            connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.mkdtemp(), 'bench_auth.sqlite3')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        authentication_classes = BookingCreateView.authentication_classes
+        try:
+            with override_settings(DATABASE_ROUTERS=[], ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                seats = self.prepare(requests * len(MODES))
+                results = {}
+                for mode, authentication_class in MODES.items():
+                    BookingCreateView.authentication_classes = [authentication_class]
+                    results[mode] = self.run_mode([seats.pop() for _ in range(requests)])
+        finally:
+            BookingCreateView.authentication_classes = authentication_classes
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        if as_json:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"{'':20}{'query/req':>10}{'auth_user/req':>15}{'mean (ms)':>12}{'p95 (ms)':>12}")
+        for mode, result in results.items():
+            self.stdout.write(f"{mode:20}{result['queries_per_request']:>10}{result['auth_user_queries_per_request']:>15}"
+                              f"{result['wall_ms_mean']:>12}{result['wall_ms_p95']:>12}")
+
+    def prepare(self, count):
+        seats_per_bus = 40
+        generate_timetable(buses=1, routes=1, points_per_route=2, days=1,
+                           trips_per_day=-(-count // seats_per_bus), fill=0, seats_per_bus=seats_per_bus, seed=1)
+        self.user = User.objects.create_user(username='bench-auth')
+        self.points = list(RoutePoint.objects.order_by('order').values_list('pk', flat=True))
+        return [(trip_id, seat_number) for trip_id in Trip.objects.values_list('pk', flat=True)
+                for seat_number in range(1, seats_per_bus + 1)][:count]
+
+    def run_mode(self, seats):
+        cache.clear()
+        user_cache.clear()
+        client = APIClient()
+        client.cookies[settings.REST_AUTH['JWT_AUTH_COOKIE']] = str(AccessToken.for_user(self.user))
+        walls, queries, user_queries = [], [], []
+        for trip_id, seat_number in seats:
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = client.post(reverse('booking-create'), {
+                    'trip': trip_id, 'seat_number': seat_number,
+                    'pickup_point': self.points[0], 'dropoff_point': self.points[-1],
+                })
+                walls.append(time.perf_counter() - started)
+            if response.status_code != 201:
+                raise RuntimeError(f"{response.status_code}: {response.content[:200]!r}")
+            queries.append(len(captured))
+            user_queries.append(sum('auth_user' in query['sql'] and query['sql'].startswith('SELECT')
+                                    for query in captured))
+        return {
+            'requests': len(seats),
+            'queries_per_request': round(statistics.fmean(queries), 2),
+            'auth_user_queries_per_request': round(statistics.fmean(user_queries), 2),
+            'wall_ms_mean': round(statistics.mean(walls) * 1000, 3),
+            'wall_ms_p95': round(percentile(walls, 0.95) * 1000, 3),
+        }
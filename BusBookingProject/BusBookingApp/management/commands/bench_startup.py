@@ -0,0 +1,113 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from BusBookingApp.metrics import percentile
+
+# Chạy trong 1 process Python mới: dựng WSGI app như worker (gunicorn/uWSGI) rồi gửi thẳng 2 request
+# (không qua django.test để không tính thêm import của nó). In 1 dòng JSON ra stdout.
+CHILD = """
+import json, sys, time
+setup_started = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+setup_done = time.perf_counter()
+from wsgiref.util import setup_testing_defaults
+
+def call(path, query, host):
+    environ = {'PATH_INFO': path, 'QUERY_STRING': query, 'HTTP_HOST': host}
+    setup_testing_defaults(environ)
+    status = []
+    started = time.perf_counter()
+    response = application(environ, lambda s, headers, exc_info=None: status.append(s))
+    b''.join(response)
+    getattr(response, 'close', lambda: None)()
+    return int(status[0].split()[0]), time.perf_counter() - started
+
+first_status, first = call(*sys.argv[1:4])
+first_done = time.time()
+warm_status, warm = call(*sys.argv[1:4])
+print(json.dumps({'setup': setup_done - setup_started, 'first': first, 'warm': warm, 'first_done': first_done,
+                  'status': first_status, 'warm_status': warm_status,
+                  'modules': len(sys.modules)}))
+"""
+
+
+def parse_importtime(stderr):
+    """{gói cấp cao nhất: tổng self time (giây)} từ output của ``python -X importtime``."""
+    packages = Counter()
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        packages[name.strip().split('.')[0]] += int(self_us) / 1e6
+    return packages
+
+
+class Command(BaseCommand):
+    help = ("Đo chi phí khởi động 1 worker: thời gian import (theo gói), django.setup(), và thời gian tới "
+            "response đầu tiên của 1 endpoint (mặc định trip-list) tính từ lúc process bắt đầu. "
+            "Mỗi lần đo là 1 process mới, dùng DB và settings hiện tại.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help="Số process mới cần đo (mặc định 5)")
+        parser.add_argument('--url-name', default='trip-list', help="Endpoint gọi lần đầu (mặc định trip-list)")
+        parser.add_argument('--query', default='', help="Query string, ví dụ: seat_map=none")
+        parser.add_argument('--top', type=int, default=10, help="Số gói import chậm nhất cần in (mặc định 10)")
+        parser.add_argument('--json', action='store_true', dest='as_json', help="In kết quả dạng JSON")
+
+    def handle(self, *args, runs, url_name, query, top, as_json, **options):
+        path = reverse(url_name)
+        host = next((h.lstrip('.') for h in settings.ALLOWED_HOSTS if h != '*'), 'localhost')
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE}
+        samples, packages = [], Counter()
+        for _ in range(runs):
+            spawned = time.time()
+            proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', CHILD, path, query, host],
+                                  cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+            exited = time.time()
+            if proc.returncode:
+                raise CommandError(proc.stderr.strip().splitlines()[-1])
+            sample = json.loads(proc.stdout.strip().splitlines()[-1])
+            sample['cold_start'] = sample.pop('first_done') - spawned
+            sample['process'] = exited - spawned
+            samples.append(sample)
+            packages.update(parse_importtime(proc.stderr))
+        if samples[0]['status'] != 200:
+            self.stderr.write(f"Cảnh báo: {path} trả về {samples[0]['status']}, kiểm tra DB/settings.")
+
+        def median_ms(key):
+            return round(percentile([sample[key] for sample in samples], 0.5) * 1000, 1)
+
+        result = {
+            'url': f'{path}?{query}' if query else path,
+            'runs': runs,
+            'status': samples[0]['status'],
+            'modules_loaded': samples[0]['modules'],
+            'import_ms': round(sum(packages.values()) / runs * 1000, 1),
+            'setup_ms': median_ms('setup'),
+            'first_response_ms': median_ms('first'),
+            'warm_response_ms': median_ms('warm'),
+            'cold_start_ms': median_ms('cold_start'),
+            'process_ms': median_ms('process'),
+            'top_packages_ms': {name: round(seconds / runs * 1000, 1) for name, seconds in packages.most_common(top)},
+        }
+        if as_json:
+            self.stdout.write(json.dumps(result, indent=2))
+            return
+        self.stdout.write(f"{result['url']} (HTTP {result['status']}), trung vị của {runs} process:")
+        for key, label in [('import_ms', "import (tổng self time)"), ('setup_ms', "django.setup() + WSGI app"),
+                           ('first_response_ms', "response đầu tiên"), ('warm_response_ms', "response thứ hai"),
+                           ('cold_start_ms', "từ lúc spawn tới response đầu"), ('process_ms', "cả process")]:
+            self.stdout.write(f"  {label:32}{result[key]:>10} ms")
+        self.stdout.write(f"  {'số module đã nạp':32}{result['modules_loaded']:>10}")
+        self.stdout.write("Gói import chậm nhất (self time, ms):")
+        for name, ms in result['top_packages_ms'].items():
+            self.stdout.write(f"  {name:32}{ms:>10}")
@@ -0,0 +1,211 @@
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from BusBookingApp.metrics import percentile
+from BusBookingApp.models import RoutePoint, Trip, TripSeatInventory
+from BusBookingApp.synthetic import generate_timetable
+
+
+BENCH_OPTIONS = ('days', 'routes', 'points', 'fill', 'iterations', 'threads', 'rounds', 'seed')
+
+
+def measure(operation, iterations):
+    """Chạy ``operation(i)`` ``iterations`` lần: số query, thời gian; thêm 1 lần chạy riêng để đo bộ nhớ đỉnh."""
+    walls, queries = [], []
+    for i in range(iterations):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            operation(i)
+            walls.append(time.perf_counter() - started)
+        queries.append(len(captured))
+    # tracemalloc làm chậm code Python nên không đo chung với thời gian
+    tracemalloc.start()
+    operation(iterations)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'iterations': iterations,
+        'queries': max(queries),
+        'wall_ms_mean': round(statistics.mean(walls) * 1000, 3),
+        'wall_ms_p95': round(percentile(walls, 0.95) * 1000, 3),
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+class Command(BaseCommand):
+    help = ("Benchmark tìm kiếm chuyến, chi tiết chuyến, đặt 1 vé và tranh chấp đặt cùng ghế ở nhiều cỡ dữ liệu; "
+            "chạy trên 1 database tạm (như khi chạy test) của DB đang cấu hình, kết quả dạng JSON.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10,50,200',
+                            help="Các cỡ dữ liệu: số chuyến mỗi ngày, cách nhau bởi dấu phẩy (mặc định 10,50,200)")
+        parser.add_argument('--days', type=int, default=3, help="Số ngày lịch chạy (mặc định 3)")
+        parser.add_argument('--routes', type=int, default=10, help="Số tuyến (mặc định 10)")
+        parser.add_argument('--points', type=int, default=4, help="Số điểm đón/trả mỗi tuyến (mặc định 4)")
+        parser.add_argument('--fill', type=float, default=0.5, help="Tỉ lệ ghế đã có vé (mặc định 0.5)")
+        parser.add_argument('--iterations', type=int, default=20, help="Số lần đo mỗi kịch bản (mặc định 20)")
+        parser.add_argument('--threads', type=int, default=8, help="Số request cùng đặt 1 ghế (mặc định 8)")
+        parser.add_argument('--rounds', type=int, default=5, help="Số ghế bị tranh chấp (mặc định 5)")
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--output', default=None, help="Ghi JSON ra file thay vì stdout")
+
+    def handle(self, *args, sizes, output, **options):
+        self.options = {name: options[name] for name in BENCH_OPTIONS}
+        self.options['sizes'] = sizes
+        self.rng = random.Random(options['seed'])
+        old_name = connection.settings_dict['NAME']
+        if connection.vendor == 'sqlite':
+            # SQLite trong bộ nhớ (mặc định khi test) khóa cả bảng khi nhiều thread cùng ghi: dùng file tạm
+            connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')
+        # Database tạm riêng: không đụng dữ liệu thật, bị xóa sau khi chạy xong
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        # Vé bị từ chối (409) trong kịch bản tranh chấp là kết quả mong đợi, không cần log
+        request_logger = logging.getLogger('django.request')
+        log_level = request_logger.level
+        request_logger.setLevel(logging.CRITICAL)
+        try:
+            with override_settings(TRIP_RESPONSE_CACHE_TTL=0, DATABASE_ROUTERS=[],
+                                   ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                results = [self.run_size(int(size)) for size in sizes.split(',')]
+        finally:
+            request_logger.setLevel(log_level)
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        report = json.dumps({'meta': self.meta(), 'results': results}, indent=2, ensure_ascii=False)
+        if output:
+            with open(output, 'w', encoding='utf-8') as f:
+                f.write(report + '\n')
+            self.stderr.write(f"Đã ghi kết quả vào {output}")
+        else:
+            self.stdout.write(report)
+
+    def meta(self):
+        try:
+            commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                    cwd=settings.BASE_DIR, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            'commit': commit,
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'created_at': timezone.now().isoformat(),
+            'options': self.options,
+        }
+
+    def run_size(self, trips_per_day):
+        options = self.options
+        call_command('flush', interactive=False, verbosity=0)
+        self.user = User.objects.create_user(username='bench-client')
+        started = time.perf_counter()
+        counts = generate_timetable(routes=options['routes'], points_per_route=options['points'],
+                                    days=options['days'], trips_per_day=trips_per_day, fill=options['fill'],
+                                    seed=options['seed'])
+        generate_seconds = time.perf_counter() - started
+
+        self.trips = list(Trip.objects.select_related('route'))
+        self.endpoints = {}
+        for point in RoutePoint.objects.order_by('route_id', 'order'):
+            pickup, _ = self.endpoints.setdefault(point.route_id, (point, point))
+            self.endpoints[point.route_id] = (pickup, point)
+        self.free_seats = [
+            (inventory.trip_id, seat_number)
+            for inventory in TripSeatInventory.objects.all()
+            for seat_number in sorted(inventory.free_seats())
+        ]
+        self.rng.shuffle(self.free_seats)
+
+        iterations = options['iterations']
+        return {
+            'trips_per_day': trips_per_day,
+            'rows': counts,
+            'generate_seconds': round(generate_seconds, 3),
+            'scenarios': {
+                'trip_search': measure(self.trip_search, iterations),
+                'trip_detail': measure(self.trip_detail, iterations),
+                'single_booking': measure(self.single_booking, iterations),
+                'concurrent_booking': self.concurrent_booking(options['threads'], options['rounds']),
+            },
+        }
+
+    def expect(self, response, *expected):
+        if response.status_code not in expected:
+            raise RuntimeError(f"{response.status_code}: {response.content[:200]!r}")
+        return response
+
+    def trip_search(self, i):
+        trip = self.rng.choice(self.trips)
+        params = {'origin': trip.route.origin, 'date': timezone.localtime(trip.departure_time).date().isoformat()}
+        self.expect(APIClient().get(reverse('trip-list'), params), 200)
+
+    def trip_detail(self, i):
+        self.expect(APIClient().get(reverse('trip-detail', args=[self.rng.choice(self.trips).pk])), 200)
+
+    def booking_payload(self, trip_id, seat_number):
+        route_id = next(trip.route_id for trip in self.trips if trip.pk == trip_id)
+        pickup, dropoff = self.endpoints[route_id]
+        return {'trip': trip_id, 'seat_number': seat_number, 'pickup_point': pickup.pk, 'dropoff_point': dropoff.pk}
+
+    def single_booking(self, i):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.expect(client.post(reverse('booking-create'), self.booking_payload(*self.free_seats.pop())), 201)
+
+    def concurrent_booking(self, threads, rounds):
+        """``threads`` request cùng lúc giành 1 ghế, lặp ``rounds`` ghế: đúng ra mỗi ghế chỉ 1 request thành công."""
+        outcomes, walls = {'created': 0, 'rejected': 0, 'errors': 0}, []
+        lock = threading.Lock()
+
+        def attempt(barrier, payload):
+            # Lỗi 500 (vd. DB bị khóa) được đếm vào errors thay vì ném ra thread
+            client = APIClient(raise_request_exception=False)
+            client.force_authenticate(self.user)
+            try:
+                barrier.wait()
+                status_code = client.post(reverse('booking-create'), payload).status_code
+                outcome = {201: 'created', 409: 'rejected'}.get(status_code, 'errors')
+            finally:
+                connections.close_all()
+            with lock:
+                outcomes[outcome] += 1
+
+        for _ in range(rounds):
+            payload = self.booking_payload(*self.free_seats.pop())
+            barrier = threading.Barrier(threads)
+            workers = [threading.Thread(target=attempt, args=(barrier, payload)) for _ in range(threads)]
+            started = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            walls.append(time.perf_counter() - started)
+        return {
+            'threads': threads,
+            'rounds': rounds,
+            **outcomes,
+            'double_bookings': max(outcomes['created'] - rounds, 0),
+            'wall_ms_mean': round(statistics.mean(walls) * 1000, 3),
+            'wall_ms_max': round(max(walls) * 1000, 3),
+        }
@@ -0,0 +1,41 @@
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+import BusBookingApp.schema  # noqa: F401  (extension của drf-spectacular)
+
+
+class Command(BaseCommand):
+    help = ("Bước build: sinh schema OpenAPI (drf-spectacular) ra file tĩnh OPENAPI_SCHEMA_FILE để /api/schema/ "
+            "đọc thẳng từ đĩa, worker không phải import drf-spectacular và sinh schema lúc chạy.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=None, help="File đích (mặc định OPENAPI_SCHEMA_FILE)")
+        parser.add_argument('--check', action='store_true',
+                            help="Chỉ kiểm tra file hiện có còn khớp với code không (cho CI), không ghi")
+        parser.add_argument('--fail-on-warn', action='store_true', help="Lỗi nếu drf-spectacular có cảnh báo")
+
+    def handle(self, *args, output, check, fail_on_warn, **options):
+        output = Path(output or settings.OPENAPI_SCHEMA_FILE)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        # Ghi ra file tạm cùng thư mục rồi thay nguyên khối: worker đang phục vụ không đọc phải file dở
+        fd, tmp = tempfile.mkstemp(dir=output.parent, prefix='.schema-', suffix=output.suffix)
+        os.close(fd)
+        try:
+            call_command('spectacular', file=tmp, format='openapi-json' if output.suffix == '.json' else 'openapi',
+                         validate=True, fail_on_warn=fail_on_warn, stdout=self.stdout, stderr=self.stderr)
+            if check:
+                if not output.is_file() or Path(tmp).read_bytes() != output.read_bytes():
+                    raise CommandError(f"{output} đã cũ, chạy lại: python manage.py build_schema")
+                self.stdout.write(f"{output} khớp với code.")
+                return
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, output)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self.stdout.write(self.style.SUCCESS(f"Đã ghi schema vào {output}"))
@@ -0,0 +1,37 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from BusBookingApp.exports import FORMATS, bookings_on, iter_merged_rows, manifest_queryset
+
+
+class Command(BaseCommand):
+    help = ("Xuất vé kèm user, chuyến, điểm đón/trả dạng CSV hoặc NDJSON, ghi theo luồng (bộ nhớ không tăng "
+            "theo số dòng): vé đặt trong 1 ngày (--date) hoặc danh sách hành khách của 1 chuyến (--trip).")
+
+    def add_arguments(self, parser):
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument('--date', type=date.fromisoformat, help="Ngày đặt vé YYYY-MM-DD")
+        target.add_argument('--trip', type=int, help="Id chuyến cần xuất danh sách hành khách")
+        parser.add_argument('--format', choices=FORMATS, default='csv', dest='output_format')
+        parser.add_argument('--output', default=None, help="Ghi ra file thay vì stdout")
+
+    def handle(self, *args, date, trip, output_format, output, **options):
+        if trip is not None:
+            queryset = manifest_queryset(trip)
+            if queryset is None:
+                raise CommandError(f"Không có chuyến #{trip}.")
+            querysets = [queryset]
+        else:
+            querysets = bookings_on(date)
+        lines = FORMATS[output_format][2](iter_merged_rows(querysets))
+        if not output:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        count = -1 if output_format == 'csv' else 0  # không tính dòng tiêu đề
+        with open(output, 'w', encoding='utf-8', newline='') as f:
+            for line in lines:
+                f.write(line)
+                count += 1
+        self.stderr.write(f"Đã ghi {count} vé vào {output}")
@@ -0,0 +1,27 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from BusBookingApp.synthetic import generate_timetable
+
+
+class Command(BaseCommand):
+    help = "Sinh lịch chạy giả lập (xe, tuyến, điểm đón/trả, chuyến, vé) bằng bulk_create để đo hiệu năng."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--buses', type=int, default=20, help="Số xe (mặc định 20)")
+        parser.add_argument('--routes', type=int, default=10, help="Số tuyến (mặc định 10)")
+        parser.add_argument('--points', type=int, default=4, help="Số điểm đón/trả mỗi tuyến (mặc định 4)")
+        parser.add_argument('--days', type=int, default=7, help="Số ngày lịch chạy (mặc định 7)")
+        parser.add_argument('--trips-per-day', type=int, default=50, help="Số chuyến mỗi ngày (mặc định 50)")
+        parser.add_argument('--fill', type=float, default=0.5, help="Tỉ lệ ghế đã có vé, 0..1 (mặc định 0.5)")
+        parser.add_argument('--seats', type=int, default=40, help="Số ghế mỗi xe (mặc định 40)")
+        parser.add_argument('--start-date', type=date.fromisoformat, default=None,
+                            help="Ngày đầu tiên YYYY-MM-DD (mặc định ngày mai)")
+        parser.add_argument('--seed', type=int, default=None, help="Seed để sinh lại đúng bộ dữ liệu")
+
+    def handle(self, *args, buses, routes, points, days, trips_per_day, fill, seats, start_date, seed, **options):
+        counts = generate_timetable(buses=buses, routes=routes, points_per_route=points, days=days,
+                                    trips_per_day=trips_per_day, fill=min(max(fill, 0), 1), seats_per_bus=seats,
+                                    start_date=start_date, seed=seed)
+        self.stdout.write(', '.join(f"{count} {name}" for name, count in counts.items()))
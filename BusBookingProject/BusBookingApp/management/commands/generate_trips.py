@@ -0,0 +1,35 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from BusBookingApp.models import TripSchedule
+from BusBookingApp.schedules import generate_trips
+
+
+class Command(BaseCommand):
+    help = ("Sinh chuyến xe từ các lịch chạy định kỳ (TripSchedule) đang bật, bỏ qua chuyến đã có "
+            "và chuyến làm trùng xe. Chạy lại nhiều lần không sinh trùng (vd. chạy hằng ngày bằng cron).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', type=date.fromisoformat, default=None,
+                            help="Ngày đầu tiên YYYY-MM-DD (mặc định hôm nay)")
+        parser.add_argument('--days', type=int, default=30, help="Số ngày cần sinh (mặc định 30)")
+        parser.add_argument('--schedule', type=int, action='append', dest='schedule_ids',
+                            help="Chỉ sinh cho lịch có id này (lặp lại được)")
+        parser.add_argument('--dry-run', action='store_true', help="Chỉ đếm, không ghi vào DB")
+
+    def handle(self, *args, start_date, days, schedule_ids, dry_run, **options):
+        if days < 1:
+            raise CommandError("--days phải >= 1.")
+        start_date = start_date or timezone.localdate()
+        schedules = TripSchedule.objects.filter(is_active=True)
+        if schedule_ids:
+            schedules = schedules.filter(pk__in=schedule_ids)
+        result = generate_trips(start_date, start_date + timedelta(days=days - 1), schedules, dry_run=dry_run)
+        for schedule, departure_time in result['bus_conflicts']:
+            self.stderr.write(f"Trùng xe, bỏ qua: lịch #{schedule.pk} ({schedule.bus.LICENSE_PLATE}) "
+                              f"lúc {timezone.localtime(departure_time):%d/%m/%Y %H:%M}")
+        prefix = "[dry-run] " if dry_run else ""
+        self.stdout.write(f"{prefix}Đã tạo {result['created']} chuyến, bỏ qua {result['existing']} chuyến đã có, "
+                          f"{len(result['bus_conflicts'])} chuyến trùng xe.")
@@ -0,0 +1,93 @@
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.http import QueryDict
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from BusBookingApp.metrics import percentile
+
+
+def summarize(latencies, elapsed):
+    return {
+        'requests': len(latencies),
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+class Command(BaseCommand):
+    help = ("Đo thông lượng và độ trễ p99 của tìm kiếm chuyến xe qua WSGI (TripListView, luồng đồng bộ) "
+            "và ASGI (AsyncTripListView, asyncio) trên cùng dữ liệu của database đang cấu hình.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help="Số request mỗi chế độ (mặc định 500)")
+        parser.add_argument('--concurrency', type=int, default=20,
+                            help="Số request chạy đồng thời: số thread (WSGI) / số task (ASGI)")
+        parser.add_argument('--query', default='',
+                            help="Query string của lượt tìm kiếm, vd. 'origin=ha noi&date=2030-05-01'")
+        parser.add_argument('--with-cache', action='store_true',
+                            help="Giữ cache response (mặc định tắt để đo đúng đường đọc DB)")
+        parser.add_argument('--json', action='store_true', dest='as_json', help="In kết quả dạng JSON")
+
+    def handle(self, *args, requests, concurrency, query, with_cache, as_json, **options):
+        self.query = QueryDict(query)
+        ttl = settings.TRIP_RESPONSE_CACHE_TTL if with_cache else 0
+        # Client/AsyncClient gửi Host: testserver như khi chạy test
+        with override_settings(TRIP_RESPONSE_CACHE_TTL=ttl, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            results = {
+                'wsgi': self.run_wsgi(reverse('trip-list'), requests, concurrency),
+                'asgi': asyncio.run(self.run_asgi(reverse('trip-list-async'), requests, concurrency)),
+            }
+        if as_json:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"{'':6}{'req':>8}{'req/s':>10}{'p50 (ms)':>12}{'p99 (ms)':>12}")
+        for mode, result in results.items():
+            self.stdout.write(f"{mode:6}{result['requests']:>8}{result['throughput_rps']:>10}"
+                              f"{result['p50_ms']:>12}{result['p99_ms']:>12}")
+
+    def check_response(self, response):
+        if response.status_code != 200:
+            raise RuntimeError(f"{response.status_code}: {response.content[:200]!r}")
+
+    def run_wsgi(self, path, total, concurrency):
+        def worker(count):
+            client, latencies = Client(), []
+            try:
+                for _ in range(count):
+                    started = time.perf_counter()
+                    self.check_response(client.get(path, self.query))
+                    latencies.append(time.perf_counter() - started)
+            finally:
+                connections.close_all()
+            return latencies
+
+        self.check_response(Client().get(path, self.query))  # làm nóng
+        counts = [total // concurrency + (i < total % concurrency) for i in range(concurrency)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = [latency for chunk in executor.map(worker, counts) for latency in chunk]
+        return summarize(latencies, time.perf_counter() - started)
+
+    async def run_asgi(self, path, total, concurrency):
+        client, latencies = AsyncClient(), []
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch():
+            async with semaphore:
+                started = time.perf_counter()
+                self.check_response(await client.get(path, self.query))
+                latencies.append(time.perf_counter() - started)
+
+        await fetch()  # làm nóng
+        latencies.clear()
+        started = time.perf_counter()
+        await asyncio.gather(*(fetch() for _ in range(total)))
+        return summarize(latencies, time.perf_counter() - started)
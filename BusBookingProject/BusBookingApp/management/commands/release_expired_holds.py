@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from BusBookingApp.models import Booking
+
+
+class Command(BaseCommand):
+    help = "Hủy các vé PENDING đã quá hạn giữ chỗ và trả ghế về sơ đồ ghế, theo từng lô nhỏ."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help="Số vé tối đa mỗi transaction (mặc định 500)")
+        parser.add_argument('--loop', action='store_true',
+                            help="Chạy liên tục như 1 worker thay vì dọn xong rồi thoát")
+        parser.add_argument('--interval', type=float, default=30,
+                            help="Số giây nghỉ giữa các lượt khi chạy --loop (mặc định 30)")
+        parser.add_argument('--pause', type=float, default=0.05,
+                            help="Số giây nghỉ giữa 2 lô để nhường khóa cho request thật (mặc định 0.05)")
+
+    def handle(self, *args, batch_size, loop, interval, pause, **options):
+        while True:
+            released = self.release_all(batch_size, pause)
+            if released:
+                self.stdout.write(f"Đã hủy {released} vé quá hạn giữ chỗ.")
+            if not loop:
+                return
+            time.sleep(interval)
+
+    def release_all(self, batch_size, pause):
+        total = 0
+        while True:
+            released = Booking.release_expired_holds(batch_size=batch_size)
+            total += released
+            if released < batch_size:
+                return total
+            time.sleep(pause)
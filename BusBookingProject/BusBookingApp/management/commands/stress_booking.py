@@ -0,0 +1,167 @@
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, connections
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from BusBookingApp.metrics import percentile
+from BusBookingApp.models import Booking, RoutePoint, Trip, TripSeatInventory
+from BusBookingApp.synthetic import generate_timetable
+
+# Mã lỗi khóa của MySQL: 1213 deadlock, 1205 chờ khóa quá hạn
+MYSQL_LOCK_ERRORS = (1213, 1205)
+
+
+def is_lock_error(error):
+    if error.args and error.args[0] in MYSQL_LOCK_ERRORS:
+        return True
+    return 'locked' in str(error) or 'deadlock' in str(error).lower()
+
+
+def find_double_bookings(trip_ids):
+    """Các cặp vé còn hiệu lực cùng ghế, cùng chuyến có chặng chồng nhau (đúng ra phải rỗng)."""
+    spans = defaultdict(list)
+    rows = Booking.objects.filter(trip_id__in=trip_ids, status__in=Booking.ACTIVE_STATUSES) \
+        .values_list('pk', 'trip_id', 'seat_number', 'pickup_point__order', 'dropoff_point__order')
+    for pk, trip_id, seat_number, start, end in rows:
+        spans[trip_id, seat_number].append((start, end, pk))
+    overlaps = []
+    for (trip_id, seat_number), seat_spans in spans.items():
+        seat_spans.sort()
+        # Quét theo điểm đón, giữ các chặng chưa kết thúc: mỗi chặng chồng với mọi chặng còn mở,
+        # không chỉ chặng liền trước, vd. (0, 3), (1, 2), (2, 3) là 2 cặp
+        open_spans = []
+        for start, end, pk in seat_spans:
+            open_spans = [(open_end, open_pk) for open_end, open_pk in open_spans if open_end > start]
+            overlaps += [{'trip': trip_id, 'seat_number': seat_number, 'bookings': [open_pk, pk]}
+                         for _, open_pk in open_spans]
+            open_spans.append((end, pk))
+    return overlaps
+
+
+def find_inventory_mismatches(trip_ids):
+    """Các chuyến có sơ đồ ghế đang lưu khác với sơ đồ dựng lại từ Booking."""
+    mismatches = []
+    for trip in Trip.objects.filter(pk__in=trip_ids).select_related('bus', 'seat_inventory'):
+        stored = trip.seat_inventory
+        rebuilt = TripSeatInventory.build(trip, stored.segment_count, Booking.objects.filter(
+            trip=trip, status__in=Booking.ACTIVE_STATUSES
+        ).values_list('seat_number', 'pickup_point__order', 'dropoff_point__order'))
+        if rebuilt.occupancy != stored.occupancy or rebuilt.available_count != stored.available_count:
+            mismatches.append(trip.pk)
+    return mismatches
+
+
+class Command(BaseCommand):
+    help = ("Stress test đặt vé: nhiều thread cùng gửi POST tới BookingCreateView, dồn vào vài chuyến và "
+            "vài ghế 'nóng'. Báo thông lượng, tỉ lệ 409 (tranh chấp ghế), số lỗi khóa/deadlock và kiểm tra "
+            "có ghế nào bị bán trùng chặng. Chạy trên 1 database tạm của DB đang cấu hình.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=400, help="Tổng số request đặt vé (mặc định 400)")
+        parser.add_argument('--workers', type=int, default=16, help="Số thread gửi request cùng lúc (mặc định 16)")
+        parser.add_argument('--trips', type=int, default=2, help="Số chuyến bị tranh chấp (mặc định 2)")
+        parser.add_argument('--hot-seats', type=int, default=8,
+                            help="Mỗi request chọn ngẫu nhiên 1 trong số ghế đầu này (mặc định 8)")
+        parser.add_argument('--points', type=int, default=4, help="Số điểm đón/trả mỗi tuyến (mặc định 4)")
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--json', action='store_true', dest='as_json', help="In kết quả dạng JSON")
+
+    def handle(self, *args, requests, workers, trips, hot_seats, points, seed, as_json, **options):
+        old_name = connection.settings_dict['NAME']
+        if connection.vendor == 'sqlite':
+            # SQLite trong bộ nhớ khóa cả bảng khi nhiều thread cùng ghi: dùng file tạm
+            connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.mkdtemp(), 'stress.sqlite3')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        # Hàng trăm response 409 là kết quả mong đợi, không cần log
+        request_logger = logging.getLogger('django.request')
+        log_level = request_logger.level
+        request_logger.setLevel(logging.CRITICAL)
+        try:
+            with override_settings(DATABASE_ROUTERS=[], ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                result = self.stress(requests, workers, trips, hot_seats, points, seed)
+        finally:
+            request_logger.setLevel(log_level)
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        if as_json:
+            self.stdout.write(json.dumps(result, indent=2))
+            return
+        for name, value in result.items():
+            self.stdout.write(f"{name:24}{value}")
+
+    def stress(self, requests, workers, trips, hot_seats, points, seed):
+        rng = random.Random(seed)
+        generate_timetable(buses=trips, routes=1, points_per_route=points, days=1, trips_per_day=trips,
+                           fill=0, seed=seed)
+        user = User.objects.create_user(username='stress-client')
+        trip_ids = list(Trip.objects.values_list('pk', flat=True))
+        route_points = list(RoutePoint.objects.order_by('order').values_list('pk', flat=True))
+        payloads = []
+        for _ in range(requests):
+            start = rng.randrange(len(route_points) - 1)
+            payloads.append({
+                'trip': rng.choice(trip_ids), 'seat_number': rng.randint(1, hot_seats),
+                'pickup_point': route_points[start],
+                'dropoff_point': route_points[rng.randrange(start + 1, len(route_points))],
+            })
+
+        outcomes, latencies, lock = Counter(), [], threading.Lock()
+        barrier = threading.Barrier(workers)
+
+        def worker(chunk):
+            client = APIClient()
+            client.force_authenticate(user)
+            try:
+                barrier.wait()
+                for payload in chunk:
+                    started = time.perf_counter()
+                    try:
+                        status_code = client.post(reverse('booking-create'), payload).status_code
+                        outcome = {201: 'created', 409: 'conflicts'}.get(status_code, 'errors')
+                    except OperationalError as e:
+                        outcome = 'deadlocks' if is_lock_error(e) else 'errors'
+                    except Exception:
+                        outcome = 'errors'
+                    with lock:
+                        outcomes[outcome] += 1
+                        latencies.append(time.perf_counter() - started)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker, args=(payloads[i::workers],)) for i in range(workers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        double_bookings = find_double_bookings(trip_ids)
+        return {
+            'database': connection.vendor,
+            'requests': requests,
+            'workers': workers,
+            'throughput_rps': round(requests / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 0.5) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+            'created': outcomes['created'],
+            'conflicts': outcomes['conflicts'],
+            'conflict_rate': round(outcomes['conflicts'] / requests, 3),
+            'deadlocks': outcomes['deadlocks'],
+            'errors': outcomes['errors'],
+            'double_bookings': len(double_bookings),
+            'double_booking_samples': double_bookings[:5],
+            'inventory_mismatches': find_inventory_mismatches(trip_ids),
+        }
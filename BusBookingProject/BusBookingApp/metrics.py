@@ -0,0 +1,171 @@
+"""Số liệu theo endpoint: số query, thời gian DB, thời gian serializer, độ trễ và kích thước response.
+
+Chỉ chạy khi bật REQUEST_METRICS (settings thêm RequestMetricsMiddleware vào MIDDLEWARE).
+Mỗi endpoint (tên URL đã resolve) giữ ``REQUEST_METRICS_WINDOW`` mẫu gần nhất trong bộ nhớ
+của process để tính phân vị; đọc ở /api/_metrics/ dạng text của Prometheus.
+"""
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+
+def percentile(values, q):
+    """Phân vị ``q`` (0..1) theo hạng gần nhất: giá trị nhỏ nhất mà ít nhất q * n mẫu không lớn hơn nó.
+
+    Dùng chung cho /api/_metrics/ và mọi lệnh đo (bench_*, loadtest_trips, stress_booking) để số liệu
+    của các công cụ so được với nhau. ``values`` không cần sắp xếp sẵn.
+    """
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, math.ceil(q * len(values)) - 1))]
+
+
+# Số liệu của request đang chạy; None khi middleware không bật (mọi hook chỉ tốn 1 lần đọc biến này)
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self._serializer_depth = 0
+
+    def server_timing(self, total):
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'serializer;dur={self.serializer_time * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+
+@contextmanager
+def collect():
+    """Bắt đầu ghi số liệu cho 1 request (kể cả phần chạy trong thread của sync_to_async)."""
+    metrics = RequestMetrics()
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+def time_queries(execute, sql, params, many, context):
+    """Execute wrapper gắn vào mọi kết nối DB (xem install_query_timer)."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - started
+
+
+def install_query_timer(connection, **kwargs):
+    if time_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_queries)
+
+
+class TimedSerializerMixin:
+    """Cộng thời gian dựng ``serializer.data`` vào số liệu của request (serializer lồng nhau chỉ tính 1 lần)."""
+
+    @property
+    def data(self):
+        metrics = _current.get()
+        if metrics is None:
+            return super().data
+        metrics._serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().data
+        finally:
+            metrics._serializer_depth -= 1
+            if not metrics._serializer_depth:
+                metrics.serializer_time += time.perf_counter() - started
+
+
+class EndpointStats:
+    FIELDS = ('duration', 'queries', 'db_time', 'serializer_time', 'response_bytes')
+
+    def __init__(self, window):
+        self.count = 0
+        self.sums = dict.fromkeys(self.FIELDS, 0)
+        self.samples = {field: deque(maxlen=window) for field in self.FIELDS}
+
+    def add(self, **values):
+        self.count += 1
+        for field, value in values.items():
+            self.sums[field] += value
+            self.samples[field].append(value)
+
+    def quantiles(self, field):
+        samples = sorted(self.samples[field])
+        if not samples:
+            return {}
+        return {q: percentile(samples, q) for q in QUANTILES}
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, endpoint, **values):
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = EndpointStats(settings.REQUEST_METRICS_WINDOW)
+            stats.add(**values)
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+    def render_prometheus(self):
+        metrics = [
+            ('duration', 'busbooking_request_duration_seconds', "Thời gian xử lý request"),
+            ('queries', 'busbooking_request_db_queries', "Số câu SQL mỗi request"),
+            ('db_time', 'busbooking_request_db_seconds', "Tổng thời gian chạy SQL mỗi request"),
+            ('serializer_time', 'busbooking_request_serializer_seconds', "Thời gian dựng serializer.data"),
+            ('response_bytes', 'busbooking_response_bytes', "Kích thước body response"),
+        ]
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+            lines = [
+                '# HELP busbooking_requests_total Số request theo endpoint',
+                '# TYPE busbooking_requests_total counter',
+            ]
+            lines += [f'busbooking_requests_total{{endpoint="{name}"}} {stats.count}' for name, stats in endpoints]
+            for field, metric, description in metrics:
+                lines += [f'# HELP {metric} {description}', f'# TYPE {metric} summary']
+                for name, stats in endpoints:
+                    for quantile, value in stats.quantiles(field).items():
+                        lines.append(f'{metric}{{endpoint="{name}",quantile="{quantile}"}} {value:g}')
+                    lines.append(f'{metric}_sum{{endpoint="{name}"}} {stats.sums[field]:g}')
+                    lines.append(f'{metric}_count{{endpoint="{name}"}} {stats.count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def record_response(request, response, metrics):
+    """Ghi số liệu của request vào registry và thêm header Server-Timing."""
+    total = time.perf_counter() - metrics.started
+    match = getattr(request, 'resolver_match', None)
+    endpoint = (match.url_name or match.view_name) if match else 'unmatched'
+    response_bytes = 0 if response.streaming else len(response.content)
+    registry.record(endpoint, duration=total, queries=metrics.queries, db_time=metrics.db_time,
+                    serializer_time=metrics.serializer_time, response_bytes=response_bytes)
+    response['Server-Timing'] = metrics.server_timing(total)
+    return response
@@ -0,0 +1,37 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from .metrics import collect, install_query_timer, record_response
+
+
+class RequestMetricsMiddleware:
+    """Đo số query, thời gian DB/serializer và kích thước response theo từng endpoint.
+
+    Bật bằng REQUEST_METRICS=true trong .env (settings đưa middleware này lên đầu MIDDLEWARE);
+    số liệu đọc ở /api/_metrics/, từng response có thêm header Server-Timing.
+    Chạy được cả sync (WSGI) lẫn async (ASGI) nên không ép view async phải chạy qua thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        # Query chạy trên kết nối của bất kỳ thread nào (kể cả sync_to_async) đều được đếm
+        connection_created.connect(install_query_timer, dispatch_uid='request-metrics-query-timer')
+        for connection in connections.all(initialized_only=True):
+            install_query_timer(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with collect() as metrics:
+            response = self.get_response(request)
+        return record_response(request, response, metrics)
+
+    async def __acall__(self, request):
+        with collect() as metrics:
+            response = await self.get_response(request)
+        return record_response(request, response, metrics)
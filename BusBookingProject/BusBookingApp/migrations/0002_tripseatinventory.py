@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BusBookingApp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TripSeatInventory',
+            fields=[
+                ('trip', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='seat_inventory', serialize=False, to='BusBookingApp.trip')),
+                ('total_seats', models.PositiveIntegerField()),
+                ('available_count', models.PositiveIntegerField()),
+                ('occupancy', models.TextField()),
+            ],
+        ),
+    ]
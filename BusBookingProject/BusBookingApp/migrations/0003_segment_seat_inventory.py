@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:17
+
+from django.db import migrations, models
+
+
+def reset_seat_inventories(apps, schema_editor):
+    # Sơ đồ ghế cũ mỗi ghế 1 ký tự, không theo chặng -> xóa để dựng lại từ Booking khi đọc
+    apps.get_model('BusBookingApp', 'TripSeatInventory').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BusBookingApp', '0002_tripseatinventory'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='booking',
+            name='unique_seat_per_trip',
+        ),
+        migrations.AddField(
+            model_name='tripseatinventory',
+            name='segment_count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.RunPython(reset_seat_inventories, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:19
+
+from django.db import migrations, models
+
+from BusBookingApp.utils import fold_place_name
+
+
+def fill_route_city_keys(apps, schema_editor):
+    Route = apps.get_model('BusBookingApp', 'Route')
+    routes = list(Route.objects.all())
+    for route in routes:
+        route.origin_key = fold_place_name(route.origin)
+        route.destination_key = fold_place_name(route.destination)
+    Route.objects.bulk_update(routes, ['origin_key', 'destination_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BusBookingApp', '0003_segment_seat_inventory'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='route',
+            name='destination_key',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='route',
+            name='origin_key',
+            field=models.CharField(default='', editable=False, max_length=100),
+        ),
+        migrations.RunPython(fill_route_city_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='route',
+            index=models.Index(fields=['origin_key', 'destination_key'], name='route_city_keys_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['status', 'departure_time'], name='trip_status_departure_idx'),
+        ),
+    ]
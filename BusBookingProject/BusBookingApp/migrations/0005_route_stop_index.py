@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from BusBookingApp.places import route_stop_entries
+
+
+def build_route_stops(apps, schema_editor):
+    Route = apps.get_model('BusBookingApp', 'Route')
+    RouteStop = apps.get_model('BusBookingApp', 'RouteStop')
+    stops = []
+    for route in Route.objects.prefetch_related('points'):
+        points = [(point.name, point.order) for point in route.points.all()]
+        stops += [
+            RouteStop(route=route, name=name, key=key, order=order)
+            for name, key, order in route_stop_entries(route.origin, route.destination, points)
+        ]
+    RouteStop.objects.bulk_create(stops, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BusBookingApp', '0004_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RouteStop',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('key', models.CharField(db_index=True, max_length=200)),
+                ('order', models.IntegerField()),
+                ('route', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stops', to='BusBookingApp.route')),
+            ],
+        ),
+        migrations.RunPython(build_route_stops, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:28
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import F
+
+# Giá trị mặc định của BOOKING_HOLD_MINUTES lúc viết migration: migration không đọc settings hiện tại
+HOLD_MINUTES = 15
+
+
+def expire_existing_pending_bookings(apps, schema_editor):
+    # Vé PENDING cũ được giữ chỗ tính từ lúc đặt; sơ đồ ghế dựng lại để có next_hold_expiry
+    Booking = apps.get_model('BusBookingApp', 'Booking')
+    Booking.objects.filter(status='PENDING').update(
+        hold_expires_at=F('booking_time') + timedelta(minutes=HOLD_MINUTES)
+    )
+    apps.get_model('BusBookingApp', 'TripSeatInventory').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BusBookingApp', '0005_route_stop_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='hold_expires_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='tripseatinventory',
+            name='next_hold_expiry',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['status', 'hold_expires_at'], name='booking_hold_expiry_idx'),
+        ),
+        migrations.RunPython(expire_existing_pending_bookings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BusBookingApp', '0006_booking_hold_expiry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TripSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('days_of_week', models.CharField(default='0123456', help_text='Các ngày chạy trong tuần: 0 = Thứ 2 ... 6 = Chủ nhật, vd. 01234', max_length=7)),
+                ('departure_times', models.CharField(help_text='Giờ xuất phát, cách nhau bởi dấu phẩy, vd. 06:00,13:30', max_length=500)),
+                ('valid_from', models.DateField()),
+                ('valid_until', models.DateField(blank=True, help_text='Để trống nếu chạy không thời hạn', null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('bus', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='schedules', to='BusBookingApp.bus')),
+                ('route', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedules', to='BusBookingApp.route')),
+            ],
+        ),
+    ]
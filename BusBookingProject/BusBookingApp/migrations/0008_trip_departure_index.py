@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BusBookingApp', '0007_trip_schedule'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['departure_time'], name='trip_departure_idx'),
+        ),
+    ]
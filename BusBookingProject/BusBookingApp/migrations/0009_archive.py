@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BusBookingApp', '0008_trip_departure_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTrip',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('departure_time', models.DateTimeField()),
+                ('arrival_time', models.DateTimeField()),
+                ('status', models.CharField(choices=[('SCHEDULED', 'Sắp chạy'), ('RUNNING', 'Đang chạy'), ('COMPLETED', 'Hoàn thành'), ('CANCELLED', 'Hủy')], max_length=20)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('bus', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_trips', to='BusBookingApp.bus')),
+                ('route', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_trips', to='BusBookingApp.route')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedBooking',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('seat_number', models.PositiveIntegerField()),
+                ('booking_time', models.DateTimeField()),
+                ('status', models.CharField(choices=[('PENDING', 'Chờ thanh toán'), ('CONFIRMED', 'Đã đặt'), ('CANCELLED', 'Đã hủy')], max_length=20)),
+                ('price_paid', models.DecimalField(decimal_places=0, max_digits=10)),
+                ('dropoff_point', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='BusBookingApp.routepoint', verbose_name='Điểm trả')),
+                ('pickup_point', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='BusBookingApp.routepoint', verbose_name='Điểm đón')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_bookings', to=settings.AUTH_USER_MODEL)),
+                ('trip', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bookings', to='BusBookingApp.archivedtrip')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedtrip',
+            index=models.Index(fields=['departure_time'], name='archived_trip_departure_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedbooking',
+            index=models.Index(fields=['booking_time'], name='archived_booking_time_idx'),
+        ),
+    ]
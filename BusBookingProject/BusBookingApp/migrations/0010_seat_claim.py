@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def claim_active_bookings(apps, schema_editor):
+    # Ghi chặng của các vé đang giữ ghế; có 2 vé chồng chặng thì migration dừng ở đây để sửa tay
+    Booking = apps.get_model('BusBookingApp', 'Booking')
+    SeatClaim = apps.get_model('BusBookingApp', 'SeatClaim')
+    holds = Booking.objects.filter(status__in=['PENDING', 'CONFIRMED']).values_list(
+        'pk', 'trip_id', 'seat_number', 'pickup_point__order', 'dropoff_point__order').iterator()
+    SeatClaim.objects.bulk_create((
+        SeatClaim(booking_id=booking_id, trip_id=trip_id, seat_number=seat_number, segment=segment)
+        for booking_id, trip_id, seat_number, start, end in holds for segment in range(start, end)
+    ), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BusBookingApp', '0009_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeatClaim',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seat_number', models.PositiveIntegerField()),
+                ('segment', models.PositiveIntegerField()),
+                ('booking', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seat_claims', to='BusBookingApp.booking')),
+                ('trip', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='BusBookingApp.trip')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('trip', 'seat_number', 'segment'), name='unique_seat_segment_claim')],
+            },
+        ),
+        migrations.RunPython(claim_active_bookings, migrations.RunPython.noop),
+    ]
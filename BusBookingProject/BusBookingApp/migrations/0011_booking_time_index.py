@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BusBookingApp', '0010_seat_claim'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['booking_time'], name='booking_time_idx'),
+        ),
+    ]
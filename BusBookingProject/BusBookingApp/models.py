@@ -1,6 +1,21 @@
-from django.db import models
+import operator
+from datetime import time, timedelta
+from functools import reduce
+
+from django.conf import settings
+from django.db import IntegrityError, models, router, transaction
+from django.db.models import Case, ExpressionWrapper, F, Max, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce, Concat, Least, Substr
+from django.db.models.lookups import Exact
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+from .cache import invalidate_trip_responses_on_commit
+from .fares import ONE, dynamic_pricing_enabled, fare, occupancy_multiplier
+from .live import publish_seat_changes_on_commit
+from .places import route_stop_entries
+from .utils import fold_place_name
 
 
 # ... (Model Bus giữ nguyên) ...
@@ -20,6 +35,22 @@ class Route(models.Model):
     distance_km = models.FloatField(null=True, blank=True)
     base_price = models.DecimalField(max_digits=10, decimal_places=0)
     duration_hours = models.FloatField(help_text="Thời gian di chuyển dự kiến")
+    # Tên điểm đi/đến đã bỏ dấu, chữ thường (xem utils.fold_place_name) để tìm kiếm dùng được index
+    origin_key = models.CharField(max_length=100, editable=False, default='')
+    destination_key = models.CharField(max_length=100, editable=False, default='', db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['origin_key', 'destination_key'], name='route_city_keys_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.origin_key = fold_place_name(self.origin)
+        self.destination_key = fold_place_name(self.destination)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'origin_key', 'destination_key'}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.origin} -> {self.destination}"
@@ -48,24 +79,135 @@ class RoutePoint(models.Model):
     def __str__(self):
         return f"[{self.route.origin}-{self.route.destination}] {self.name} ({self.get_point_type_display()})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Thứ tự lúc nạp: lưu lại mà không đổi thứ tự thì các chặng của tuyến vẫn như cũ (xem signals)
+        if 'order' in field_names:
+            instance._loaded_order = instance.order
+        return instance
+
+
+# Chỉ mục địa danh (điểm đi/đến của Route + tên RoutePoint) cho tìm kiếm và gợi ý
+class RouteStop(models.Model):
+    route = models.ForeignKey(Route, on_delete=models.CASCADE, related_name='stops')
+    name = models.CharField(max_length=200)
+    key = models.CharField(max_length=200, db_index=True)  # tên đã bỏ dấu (hoặc 1 hậu tố từ của tên)
+    order = models.IntegerField()  # thứ tự trên tuyến, so với RoutePoint.order
+
+    def __str__(self):
+        return f"{self.name} ({self.route})"
+
+    @classmethod
+    def rebuild_for_route(cls, route):
+        cls.objects.filter(route=route).delete()
+        points = list(route.points.values_list('name', 'order'))
+        cls.objects.bulk_create([
+            cls(route=route, name=name, key=key, order=order)
+            for name, key, order in route_stop_entries(route.origin, route.destination, points)
+        ])
+
+    @classmethod
+    def routes_serving(cls, origin=None, destination=None):
+        """Queryset route_id của các tuyến đi qua ``origin`` rồi mới tới ``destination`` (so khớp tiền tố).
+
+        Chỉ có 1 trong 2 thì vẫn phải còn điểm dừng sau ``origin`` (hoặc trước ``destination``) trên
+        tuyến: điểm cuối tuyến không phải là điểm đi, điểm đầu tuyến không phải là điểm đến.
+        """
+        stops = cls.objects.all()
+        if origin:
+            stops = stops.filter(key__istartswith=fold_place_name(origin))
+            if destination:
+                stops = stops.filter(route__stops__key__istartswith=fold_place_name(destination),
+                                     route__stops__order__gt=F('order'))
+            else:
+                stops = stops.filter(route__stops__order__gt=F('order'))
+        elif destination:
+            stops = stops.filter(key__istartswith=fold_place_name(destination), route__stops__order__lt=F('order'))
+        return stops.values('route_id')
+
 
 # ... (Model Trip giữ nguyên) ...
 class Trip(models.Model):
+    STATUS_CHOICES = [('SCHEDULED', 'Sắp chạy'), ('RUNNING', 'Đang chạy'), ('COMPLETED', 'Hoàn thành'),
+                      ('CANCELLED', 'Hủy')]
+    # Các trạng thái đã kết thúc, có thể chuyển sang bảng lưu trữ (xem archive.py)
+    FINISHED_STATUSES = ['COMPLETED', 'CANCELLED']
+
     route = models.ForeignKey(Route, on_delete=models.CASCADE, related_name='trips')
     bus = models.ForeignKey(Bus, on_delete=models.PROTECT)
     departure_time = models.DateTimeField()
     arrival_time = models.DateTimeField()
-    status = models.CharField(
-        max_length=20,
-        choices=[('SCHEDULED', 'Sắp chạy'), ('RUNNING', 'Đang chạy'), ('COMPLETED', 'Hoàn thành'),
-                 ('CANCELLED', 'Hủy')],
-        default='SCHEDULED'
-    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='SCHEDULED')
+
+    class Meta:
+        indexes = [
+            # Tìm chuyến: WHERE status = 'SCHEDULED' AND departure_time >= ... ORDER BY departure_time, id
+            models.Index(fields=['status', 'departure_time'], name='trip_status_departure_idx'),
+            # Bộ lọc theo ngày của admin (không kèm status)
+            models.Index(fields=['departure_time'], name='trip_departure_idx'),
+        ]
 
     def __str__(self):
         return f"{self.route} | {self.departure_time.strftime('%d/%m %H:%M')}"
 
 
+# Lịch chạy định kỳ: sinh Trip hàng loạt (xem schedules.generate_trips)
+class TripSchedule(models.Model):
+    WEEKDAYS = '0123456'  # Thứ 2 = 0 ... Chủ nhật = 6 (như date.weekday())
+
+    route = models.ForeignKey(Route, on_delete=models.CASCADE, related_name='schedules')
+    bus = models.ForeignKey(Bus, on_delete=models.PROTECT, related_name='schedules')
+    days_of_week = models.CharField(max_length=7, default=WEEKDAYS,
+                                    help_text="Các ngày chạy trong tuần: 0 = Thứ 2 ... 6 = Chủ nhật, vd. 01234")
+    departure_times = models.CharField(max_length=500,
+                                       help_text="Giờ xuất phát, cách nhau bởi dấu phẩy, vd. 06:00,13:30")
+    valid_from = models.DateField()
+    valid_until = models.DateField(null=True, blank=True, help_text="Để trống nếu chạy không thời hạn")
+    is_active = models.BooleanField(default=True)
+
+    def __str__(self):
+        return f"{self.route} | {self.bus.LICENSE_PLATE} | {self.departure_times}"
+
+    def clean(self):
+        if not self.days_of_week or set(self.days_of_week) - set(self.WEEKDAYS):
+            raise ValidationError({'days_of_week': "Chỉ gồm các chữ số 0 (Thứ 2) tới 6 (Chủ nhật)."})
+        try:
+            if not self.times():
+                raise ValueError
+        except ValueError:
+            raise ValidationError({'departure_times': "Giờ xuất phát phải có dạng HH:MM, cách nhau bởi dấu phẩy."})
+        if self.valid_until and self.valid_until < self.valid_from:
+            raise ValidationError({'valid_until': "Ngày kết thúc phải sau ngày bắt đầu."})
+
+    def times(self):
+        """Các giờ xuất phát (datetime.time), đã sắp xếp, bỏ trùng."""
+        values = (value.strip() for value in self.departure_times.split(','))
+        return sorted({time.fromisoformat(value) for value in values if value})
+
+    def dates(self, start_date, end_date):
+        """Các ngày chạy trong [start_date, end_date] (đã cắt theo thời hạn của lịch)."""
+        start_date = max(start_date, self.valid_from)
+        if self.valid_until:
+            end_date = min(end_date, self.valid_until)
+        weekdays = {int(day) for day in self.days_of_week}
+        return [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)
+                if (start_date + timedelta(days=offset)).weekday() in weekdays]
+
+
+class SeatConflict(ValidationError):
+    """Ghế đã có người giữ trên chặng cần đặt; ``suggested_seats`` là các ghế còn trống gần nhất.
+
+    ``errors`` giữ nguyên dạng lỗi theo từng ghế ({'seats': {'5': ...}}), ValidationError không nhận dict lồng nhau.
+    """
+
+    def __init__(self, errors, suggested_seats=()):
+        super().__init__({field: list(messages.values()) if isinstance(messages, dict) else messages
+                          for field, messages in errors.items()})
+        self.errors = errors
+        self.suggested_seats = list(suggested_seats)
+
+
 # 4. Quản lý Đặt vé (CẬP NHẬT LOGIC)
 class Booking(models.Model):
     STATUS_CHOICES = [
@@ -73,6 +215,10 @@ class Booking(models.Model):
         ('CONFIRMED', 'Đã đặt'),
         ('CANCELLED', 'Đã hủy'),
     ]
+    # Các trạng thái vẫn đang giữ ghế
+    ACTIVE_STATUSES = ['PENDING', 'CONFIRMED']
+    # Các cột quyết định chặng đang giữ (xem _current_hold)
+    HOLD_FIELDS = frozenset({'status', 'trip_id', 'seat_number', 'pickup_point_id', 'dropoff_point_id'})
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='bookings')
     trip = models.ForeignKey(Trip, on_delete=models.CASCADE, related_name='bookings')
@@ -87,26 +233,33 @@ class Booking(models.Model):
     booking_time = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
     price_paid = models.DecimalField(max_digits=10, decimal_places=0)
+    # Vé PENDING chỉ giữ ghế tới thời điểm này; quá hạn thì coi như ghế trống
+    # (xem TripSeatInventory.for_trips) và lệnh release_expired_holds sẽ hủy vé
+    hold_expires_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     class Meta:
-        constraints = [
-            models.UniqueConstraint(
-                fields=['trip', 'seat_number'],
-                condition=models.Q(status__in=['PENDING', 'CONFIRMED']),
-                name='unique_seat_per_trip'
-            )
+        indexes = [
+            # release_expired_holds: WHERE status = 'PENDING' AND hold_expires_at <= now ORDER BY hold_expires_at
+            models.Index(fields=['status', 'hold_expires_at'], name='booking_hold_expiry_idx'),
+            # Xuất vé theo ngày đặt (exports.bookings_on)
+            models.Index(fields=['booking_time'], name='booking_time_idx'),
         ]
 
+    # Không còn UniqueConstraint(trip, seat_number): 1 ghế được bán nhiều lần cho các chặng
+    # không chồng nhau, việc chặn trùng chặng do TripSeatInventory.claim() đảm nhiệm,
+    # SeatClaim là chốt chặn cuối ở tầng DB.
+
     def clean(self):
         # 1. Logic cũ: Kiểm tra ghế
         if self.seat_number > self.trip.bus.total_seats:
             raise ValidationError(f"Ghế số {self.seat_number} không tồn tại.")
 
         # 2. Logic MỚI: Kiểm tra điểm đón/trả có thuộc Route của Trip không?
-        if self.pickup_point.route != self.trip.route:
+        # So sánh route_id để không phải nạp lại Route của từng điểm
+        if self.pickup_point.route_id != self.trip.route_id:
             raise ValidationError({'pickup_point': "Điểm đón không thuộc lộ trình của chuyến xe này."})
 
-        if self.dropoff_point.route != self.trip.route:
+        if self.dropoff_point.route_id != self.trip.route_id:
             raise ValidationError({'dropoff_point': "Điểm trả không thuộc lộ trình của chuyến xe này."})
 
         # 3. Logic MỚI: Kiểm tra loại điểm (Điểm trả thì không được đón, trừ khi là BOTH)
@@ -122,15 +275,616 @@ class Booking(models.Model):
         if self.pickup_point.order >= self.dropoff_point.order:
             raise ValidationError("Điểm trả khách phải nằm sau điểm đón khách trong lộ trình.")
 
-    def save(self, *args, **kwargs):
+    def calculate_price(self):
+        # Cùng công thức với ma trận giá trả về trong response chuyến xe (fares.fare_matrix),
+        # tính trên route/điểm đón/điểm trả đã nạp sẵn nên không query thêm
+        multiplier = ONE
+        if dynamic_pricing_enabled():
+            # Sơ đồ ghế đã nạp cùng trip (select_related) thì không query lại
+            inventory = TripSeatInventory.for_trips([self.trip], ignore_expired_holds=True)[self.trip_id]
+            multiplier = occupancy_multiplier(inventory)
+        return fare(self.trip.route.base_price, self.pickup_point.surcharge, self.dropoff_point.surcharge, multiplier)
+
+    @classmethod
+    def book_seats(cls, user, trip, pickup_point, dropoff_point, seat_numbers):
+        """Đặt nhiều ghế của cùng 1 chuyến trong 1 transaction: được tất cả hoặc không ghế nào.
+
+        Nơi gọi đã kiểm tra dữ liệu (clean); hàm này chỉ giữ tất cả ghế bằng 1 câu UPDATE
+        rồi ghi các vé bằng 1 lần bulk_create. Ghế nào đã bị giữ thì báo lỗi theo từng ghế.
+        """
+        seat_numbers = sorted(set(seat_numbers))
+        start, end = pickup_point.order, dropoff_point.order
+        hold_expires_at = cls.new_hold_expiry()
+        bookings = [cls(user=user, trip=trip, pickup_point=pickup_point, dropoff_point=dropoff_point,
+                        seat_number=seat_number, hold_expires_at=hold_expires_at) for seat_number in seat_numbers]
+        price = bookings[0].calculate_price()
+        with transaction.atomic():
+            inventory = TripSeatInventory.for_trip(trip)
+            if end > inventory.segment_count:
+                inventory = TripSeatInventory.rebuild(trip)
+            if not inventory.claim_many(seat_numbers, start, end, hold_until=hold_expires_at):
+                # Có ghế vừa bị người khác giữ: đọc lại sơ đồ ghế để chỉ ra đúng ghế nào và gợi ý ghế khác
+                free = TripSeatInventory.for_trips([trip], ignore_expired_holds=True, refresh=True)[trip.pk] \
+                    .free_seats(start, end)
+                raise SeatConflict({'seats': {
+                    str(seat_number): f"Ghế số {seat_number} đã có người đặt trên chặng này."
+                    for seat_number in seat_numbers if seat_number not in free
+                } or "Không giữ được ghế, vui lòng thử lại."},
+                    TripSeatInventory.nearest_seats(free, seat_numbers))
+            for booking in bookings:
+                booking.price_paid = price
+            cls.objects.bulk_create(bookings)
+            if bookings[0].pk is None:
+                # MySQL không trả id sau bulk_create; chặng này của mỗi ghế chỉ có đúng 1 vé đang giữ
+                ids = dict(cls.objects.filter(trip=trip, pickup_point=pickup_point, dropoff_point=dropoff_point,
+                                              seat_number__in=seat_numbers, status__in=cls.ACTIVE_STATUSES)
+                           .values_list('seat_number', 'pk'))
+                for booking in bookings:
+                    booking.pk = ids[booking.seat_number]
+            if not SeatClaim.add([(booking.pk, trip.pk, booking.seat_number, start, end) for booking in bookings]):
+                raise SeatConflict({'seats': "Không giữ được ghế, vui lòng thử lại."})
+            # bulk_create không bắn post_save: tự làm mới cache response của chuyến
+            invalidate_trip_responses_on_commit(trip)
+        for booking in bookings:
+            booking._loaded_hold = booking._current_hold()
+            booking._loaded_hold_expiry = booking.hold_expires_at
+        return bookings
+
+    @staticmethod
+    def new_hold_expiry():
+        return timezone.now() + timedelta(minutes=settings.BOOKING_HOLD_MINUTES)
+
+    @classmethod
+    def release_expired_holds(cls, batch_size=500, trip_ids=None):
+        """Hủy 1 lô vé PENDING đã quá hạn giữ chỗ và trả ghế; trả về số vé đã hủy.
+
+        Mỗi lô là 1 transaction ngắn: chọn id theo index (status, hold_expires_at),
+        khóa đúng các dòng đó (bỏ qua dòng đang bị khóa), hủy bằng 1 câu UPDATE
+        rồi trả ghế theo từng chuyến/chặng. Gọi lặp lại tới khi trả về 0.
+        """
+        now = timezone.now()
+        expired = cls.objects.filter(status='PENDING', hold_expires_at__lte=now)
+        if trip_ids is not None:
+            expired = expired.filter(trip_id__in=trip_ids)
+        with transaction.atomic():
+            rows = list(
+                expired.order_by('hold_expires_at').select_for_update(skip_locked=True, of=('self',))
+                .values_list('pk', 'trip_id', 'seat_number', 'pickup_point__order', 'dropoff_point__order',
+                             'trip__departure_time')[:batch_size]
+            )
+            if not rows:
+                return 0
+            booking_ids = [row[0] for row in rows]
+            cls.objects.filter(pk__in=booking_ids).update(status='CANCELLED', hold_expires_at=None)
+            SeatClaim.objects.filter(booking_id__in=booking_ids).delete()
+
+            spans, trips = {}, {}
+            for _, trip_id, seat_number, start, end, departure_time in rows:
+                spans.setdefault((trip_id, start, end), []).append(seat_number)
+                trips[trip_id] = departure_time
+            inventories = TripSeatInventory.objects.in_bulk(trips.keys())
+            for (trip_id, start, end), seat_numbers in spans.items():
+                if trip_id in inventories:
+                    inventories[trip_id].release_many(seat_numbers, start, end)
+            TripSeatInventory.refresh_next_hold_expiry(trips.keys())
+
+            # UPDATE hàng loạt không bắn post_save: tự làm mới cache response của các chuyến
+            for trip_id, departure_time in trips.items():
+                invalidate_trip_responses_on_commit(Trip(pk=trip_id, departure_time=departure_time))
+        return len(rows)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Nạp thiếu cột (only/defer) thì không đọc: truy cập cột bị defer gọi refresh_from_db,
+        # mà refresh_from_db lại đi qua from_db -> đệ quy. Khi cần sẽ đọc lại ở _loaded_hold_or_fetch()
+        if cls.HOLD_FIELDS.issubset(field_names):
+            instance._loaded_hold = instance._current_hold()
+        if 'hold_expires_at' in field_names:
+            instance._loaded_hold_expiry = instance.hold_expires_at
+        return instance
+
+    def _current_hold(self):
+        # (chuyến, ghế, điểm đón, điểm trả) mà booking này đang giữ trong TripSeatInventory, None nếu không giữ
+        if self.status in self.ACTIVE_STATUSES:
+            return self.trip_id, self.seat_number, self.pickup_point_id, self.dropoff_point_id
+        return None
+
+    def _loaded_hold_or_fetch(self):
+        # Chặng đang giữ theo DB; vé nạp bằng only()/defer() thì đọc lại đúng các cột đó (1 query)
+        if not hasattr(self, '_loaded_hold'):
+            row = None
+            if not self._state.adding:
+                row = type(self)._base_manager.using(self._state.db).filter(pk=self.pk) \
+                    .values_list('status', 'trip_id', 'seat_number', 'pickup_point_id', 'dropoff_point_id').first()
+            self._loaded_hold = tuple(row[1:]) if row is not None and row[0] in self.ACTIVE_STATUSES else None
+        return self._loaded_hold
+
+    def save(self, *args, validate=True, **kwargs):
+        """Lưu vé và giữ chặng trong TripSeatInventory.
+
+        ``validate=False`` khi nơi gọi đã tự chạy ``clean()`` (vd. BookingSerializer)
+        để không kiểm tra lại lần 2 cùng các query kiểm tra khóa ngoại của full_clean().
+        """
         # Tự động cộng phụ phí (nếu có) vào giá vé
         if not self.price_paid:
-            base = self.trip.route.base_price
-            surcharge = self.pickup_point.surcharge + self.dropoff_point.surcharge
-            self.price_paid = base + surcharge
+            self.price_paid = self.calculate_price()
 
-        self.full_clean()
-        super().save(*args, **kwargs)
+        # Vé chờ thanh toán giữ ghế có thời hạn, vé đã xác nhận/đã hủy thì không
+        if self.status != 'PENDING':
+            self.hold_expires_at = None
+        elif self._state.adding and self.hold_expires_at is None:
+            self.hold_expires_at = self.new_hold_expiry()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'hold_expires_at'}
+
+        if validate:
+            self.full_clean()
+
+        # Đồng bộ sơ đồ ghế trong cùng transaction: giữ chặng trước rồi mới ghi Booking,
+        # nếu chặng đã có người giữ thì dừng ngay, không chạm tới bảng Booking
+        loaded_hold = self._loaded_hold_or_fetch()
+        current_hold = self._current_hold()
+        if loaded_hold == current_hold:
+            super().save(*args, **kwargs)
+            self._hold_expiry_saved()
+            return
+        conflict = {'seat_number': f"Ghế số {self.seat_number} đã có người đặt trên chặng này."}
+        with transaction.atomic():
+            inventory = TripSeatInventory.for_trip(self.trip)
+            if current_hold is not None and self.dropoff_point.order > inventory.segment_count:
+                # Lộ trình vừa thêm điểm mới -> sơ đồ ghế cũ không đủ chặng
+                inventory = TripSeatInventory.rebuild(self.trip)
+            moved_from = loaded_hold[0] if loaded_hold is not None and loaded_hold[0] != self.trip_id else None
+            if loaded_hold is not None and moved_from is None:
+                inventory.release_hold(loaded_hold)
+            start, end = self.pickup_point.order, self.dropoff_point.order
+            if current_hold is not None and not inventory.claim(
+                    self.seat_number, start, end, hold_until=self.hold_expires_at):
+                # Chỉ khi tranh chấp mới đọc lại sơ đồ ghế (1 query) để gợi ý ghế trống gần nhất
+                free = TripSeatInventory.for_trips([self.trip], ignore_expired_holds=True, refresh=True)[
+                    self.trip_id].free_seats(start, end)
+                raise SeatConflict(conflict, TripSeatInventory.nearest_seats(free, [self.seat_number]))
+            super().save(*args, **kwargs)
+            if loaded_hold is not None:
+                SeatClaim.objects.filter(booking_id=self.pk).delete()
+            if current_hold is not None and not SeatClaim.add([(self.pk, self.trip_id, self.seat_number, start, end)]):
+                raise SeatConflict(conflict)
+            if moved_from is not None:
+                self._release_on_previous_trip(loaded_hold)
+            self._hold_expiry_saved()
+        self._loaded_hold = current_hold
+
+    def _release_on_previous_trip(self, hold):
+        # Vé vừa chuyển sang chuyến khác: trả chặng trên sơ đồ ghế của chuyến cũ (chưa dựng thì thôi, dựng sau
+        # từ Booking sẽ không còn vé này), tính lại hạn giữ chỗ và làm mới cache response của chuyến đó
+        trip_id = hold[0]
+        inventory = TripSeatInventory.objects.filter(trip_id=trip_id).first()
+        if inventory is not None:
+            inventory.release_hold(hold)
+            if getattr(self, '_loaded_hold_expiry', None) is not None:
+                TripSeatInventory.refresh_next_hold_expiry([trip_id])
+        previous_trip = Trip.objects.filter(pk=trip_id).only('departure_time').first()
+        if previous_trip is not None:
+            invalidate_trip_responses_on_commit(previous_trip)
+
+    def _hold_expiry_saved(self):
+        # Vé vừa thôi PENDING (xác nhận/hủy): tính lại next_hold_expiry của chuyến, nếu không mọi lần đọc
+        # sơ đồ ghế sau hạn cũ đều tốn thêm 1 query che vé quá hạn dù không còn vé nào như vậy
+        loaded_expiry = getattr(self, '_loaded_hold_expiry', None)
+        self._loaded_hold_expiry = self.hold_expires_at
+        if loaded_expiry is not None and self.hold_expires_at is None:
+            TripSeatInventory.refresh_next_hold_expiry([self.trip_id], released_expiry=loaded_expiry)
+
+    # Xóa vé (kể cả QuerySet.delete(), action xóa của admin, xóa Trip/User kéo theo) trả ghế
+    # trong receiver post_delete (signals.release_seat_on_booking_delete), không override delete()
+
+    def cancel(self):
+        """Hủy vé và trả ghế về sơ đồ ghế của chuyến."""
+        self.status = 'CANCELLED'
+        # Hủy chỉ trả ghế: không kiểm tra lại vé, vé có thể đã không còn hợp lệ sau khi đổi xe ít ghế hơn
+        # hoặc sắp xếp lại các điểm của lộ trình, mà vẫn phải hủy được
+        self.save(update_fields=['status', 'hold_expires_at'], validate=False)
+
+    def __str__(self):
+        return f"Vé {self.id} | Ghế {self.seat_number} | Đón: {self.pickup_point.name} -> Trả: {self.dropoff_point.name}"
+
+
+# 5. Sơ đồ ghế phi chuẩn hóa của từng chuyến
+class TripSeatInventory(models.Model):
+    """Trạng thái ghế theo từng chặng của 1 chuyến, lưu trên đúng 1 dòng.
+
+    Chặng k là đoạn giữa RoutePoint.order = k và k + 1, tuyến có ``segment_count``
+    chặng (= order lớn nhất). ``occupancy`` là lưới ghế x chặng: mỗi ghế chiếm
+    ``segment_count`` ký tự liên tiếp ('0' trống, '1' đã giữ), nên "ghế i trống từ
+    điểm đón a tới điểm trả b" chỉ là so sánh 1 chuỗi con với '0' * (b - a).
+
+    Giữ/trả ghế là 1 câu UPDATE có điều kiện trên dòng này nên không cần
+    SELECT ... FOR UPDATE, và đọc sơ đồ ghế không phải quét bảng Booking.
+    ``available_count`` đếm số ghế còn trống trên toàn tuyến.
+
+    Giới hạn: câu UPDATE đó giữ khóa dòng tới khi transaction đặt vé commit, nên các lượt đặt vé
+    của cùng 1 chuyến vẫn chạy lần lượt (chuyến khác nhau thì không chặn nhau). Thứ được bỏ là
+    lượt đọc-rồi-khóa và IntegrityError khi trùng ghế, không phải việc xếp hàng trên 1 chuyến;
+    vì vậy transaction giữ ghế phải ngắn (Booking.save giữ chặng ngay trước khi ghi vé).
+
+    Ghế của vé PENDING quá hạn vẫn là '1' cho tới khi được dọn; ``next_hold_expiry``
+    (không muộn hơn hạn giữ chỗ sớm nhất còn lại) cho biết khi nào cần che các
+    chặng đó đi lúc đọc, mà không phải ghi gì (xem ``for_trips``).
+    """
+    FREE = '0'
+    TAKEN = '1'
+
+    trip = models.OneToOneField(Trip, on_delete=models.CASCADE, primary_key=True, related_name='seat_inventory')
+    total_seats = models.PositiveIntegerField()
+    segment_count = models.PositiveIntegerField(default=1)
+    available_count = models.PositiveIntegerField()
+    occupancy = models.TextField()
+    next_hold_expiry = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.trip} | Còn {self.available_count}/{self.total_seats} ghế"
+
+    @classmethod
+    def build(cls, trip, segment_count, holds, next_hold_expiry=None):
+        """Dựng sơ đồ ghế từ danh sách (ghế, order điểm đón, order điểm trả)."""
+        total_seats = trip.bus.total_seats
+        segment_count = max(segment_count, 1)
+        grid = bytearray(cls.FREE * (total_seats * segment_count), 'ascii')
+        for seat_number, start, end in holds:
+            if 1 <= seat_number <= total_seats:
+                offset = (seat_number - 1) * segment_count
+                grid[offset + start:offset + min(end, segment_count)] = \
+                    cls.TAKEN.encode() * (min(end, segment_count) - start)
+        inventory = cls(trip=trip, total_seats=total_seats, segment_count=segment_count,
+                        occupancy=grid.decode('ascii'), next_hold_expiry=next_hold_expiry)
+        inventory.available_count = len(inventory.free_seats())
+        return inventory
+
+    @classmethod
+    def for_trips(cls, trips, ignore_expired_holds=False, refresh=False):
+        """Trả về {trip_id: inventory}; chuyến nào chưa có thì dựng từ Booking (1 query chung).
+
+        ``ignore_expired_holds=True`` (dùng khi đọc để hiển thị) trả về bản trong bộ nhớ
+        đã coi các chặng của vé PENDING quá hạn là trống; chỉ tốn thêm 1 query khi có
+        chuyến thực sự có vé quá hạn chưa được dọn.
+        """
+        trips = {trip.pk: trip for trip in trips}
+        # Trip đã select_related('seat_inventory') thì dùng luôn, không query lại
+        inventories = {}
+        for trip_id, trip in trips.items():
+            if refresh or not Trip.seat_inventory.is_cached(trip):
+                continue
+            inventory = getattr(trip, 'seat_inventory', None)
+            if inventory is not None:
+                inventories[trip_id] = inventory
+        unknown = trips.keys() - inventories.keys()
+        if unknown:
+            inventories.update((inv.trip_id, inv) for inv in cls.objects.filter(trip_id__in=unknown))
+        missing = [trip for trip_id, trip in trips.items() if trip_id not in inventories]
+        if missing:
+            inventories.update(cls._build_missing(missing))
+        if ignore_expired_holds:
+            cls._mask_expired_holds(inventories)
+        return inventories
+
+    @classmethod
+    def _build_missing(cls, trips):
+        """Dựng và lưu sơ đồ ghế cho các chuyến chưa có, trả về {trip_id: inventory}.
+
+        Khóa các dòng Trip trong lúc dựng nên mỗi chuyến chỉ có 1 nơi dựng (hoặc dựng lại) tại 1 thời
+        điểm. Vé đang giữ được đọc bằng SELECT ... FOR UPDATE: locking read luôn thấy dữ liệu mới commit,
+        kể cả vé vừa giữ chặng trên sơ đồ ghế cũ (DELETE sơ đồ cũ phải chờ transaction đó xong).
+        Mọi truy vấn đều ở DB ghi, kể cả khi đang trong ``read_from_replica()``: sơ đồ ghế dựng từ
+        bản sao trễ sẽ thiếu vé vừa đặt mà vẫn được lưu vào DB chính.
+        """
+        db = router.db_for_write(cls)
+        trips = {trip.pk: trip for trip in trips}
+        with transaction.atomic(using=db):
+            list(Trip.objects.using(db).select_for_update().filter(pk__in=trips.keys()).order_by('pk')
+                 .values_list('pk'))
+            # Có thể nơi khác vừa dựng xong trong lúc chờ khóa (đọc bằng locking read vì lý do như trên)
+            inventories = {inventory.trip_id: inventory for inventory in
+                           cls.objects.using(db).select_for_update().filter(trip_id__in=trips.keys())}
+            missing = [trip for trip_id, trip in trips.items() if trip_id not in inventories]
+            if not missing:
+                return inventories
+            segment_counts = dict(
+                RoutePoint.objects.using(db).filter(route_id__in={trip.route_id for trip in missing})
+                .values('route_id').annotate(last_order=Max('order')).values_list('route_id', 'last_order')
+            )
+            holds, expiries = {trip.pk: [] for trip in missing}, {}
+            rows = Booking.objects.using(db).select_for_update(of=('self',)) \
+                .filter(trip_id__in=holds.keys(), status__in=Booking.ACTIVE_STATUSES) \
+                .values_list('trip_id', 'seat_number', 'pickup_point__order', 'dropoff_point__order',
+                             'hold_expires_at')
+            for trip_id, seat_number, start, end, hold_expires_at in rows:
+                holds[trip_id].append((seat_number, start, end))
+                if hold_expires_at is not None:
+                    expiries[trip_id] = min(hold_expires_at, expiries.get(trip_id, hold_expires_at))
+            created = [cls.build(trip, segment_counts.get(trip.route_id, 1), holds[trip.pk],
+                                 expiries.get(trip.pk)) for trip in missing]
+            cls.objects.using(db).bulk_create(created)
+            inventories.update((inventory.trip_id, inventory) for inventory in created)
+            return inventories
+
+    @classmethod
+    def _mask_expired_holds(cls, inventories):
+        # Chỉ sửa bản trong bộ nhớ; việc hủy vé và ghi lại sơ đồ ghế là của release_expired_holds
+        now = timezone.now()
+        stale = [trip_id for trip_id, inventory in inventories.items() if inventory.has_expired_holds(now)]
+        if not stale:
+            return
+        rows = Booking.objects.filter(trip_id__in=stale, status='PENDING', hold_expires_at__lte=now) \
+            .values_list('trip_id', 'seat_number', 'pickup_point__order', 'dropoff_point__order')
+        grids = {trip_id: bytearray(inventories[trip_id].occupancy, 'ascii') for trip_id in stale}
+        for trip_id, seat_number, start, end in rows:
+            inventory = inventories[trip_id]
+            start, end = inventory._span(start, end)
+            if 1 <= seat_number <= inventory.total_seats and start < end:
+                offset = (seat_number - 1) * inventory.segment_count
+                grids[trip_id][offset + start:offset + end] = cls.FREE.encode() * (end - start)
+        for trip_id, grid in grids.items():
+            inventory = inventories[trip_id]
+            inventory.occupancy = grid.decode('ascii')
+            inventory.available_count = len(inventory.free_seats())
+
+    @classmethod
+    def refresh_next_hold_expiry(cls, trip_ids, released_expiry=None):
+        """Tính lại hạn giữ chỗ sớm nhất của các chuyến (1 câu UPDATE với subquery).
+
+        ``released_expiry``: hạn giữ chỗ của 1 vé vừa thôi PENDING; chuyến còn hạn sớm hơn thế thì
+        next_hold_expiry không đổi, không cần tính lại.
+        """
+        inventories = cls.objects.filter(trip_id__in=trip_ids)
+        if released_expiry is not None:
+            inventories = inventories.filter(next_hold_expiry__gte=released_expiry)
+        inventories.update(next_hold_expiry=Subquery(
+            Booking.objects.filter(trip_id=OuterRef('trip_id'), status='PENDING', hold_expires_at__isnull=False)
+            .order_by('hold_expires_at').values('hold_expires_at')[:1]
+        ))
+
+    def has_expired_holds(self, now=None):
+        return self.next_hold_expiry is not None and self.next_hold_expiry <= (now or timezone.now())
+
+    @classmethod
+    def for_trip(cls, trip):
+        return cls.for_trips([trip])[trip.pk]
+
+    @classmethod
+    def current(cls, trip_id):
+        """Sơ đồ ghế đang lưu của 1 chuyến (đã che vé PENDING quá hạn), None nếu chưa dựng."""
+        inventory = cls.objects.filter(trip_id=trip_id).first()
+        if inventory is not None:
+            cls._mask_expired_holds({trip_id: inventory})
+        return inventory
+
+    @classmethod
+    @transaction.atomic
+    def rebuild(cls, trip):
+        """Dựng lại sơ đồ ghế từ Booking (dùng sau khi sửa tay dữ liệu, đổi xe, sửa lộ trình...).
+
+        Xóa và dựng lại trong cùng 1 transaction, giữ khóa dòng Trip (xem ``_build_missing``).
+        """
+        list(Trip.objects.select_for_update().filter(pk=trip.pk).values_list('pk'))
+        cls.objects.filter(trip_id=trip.pk).delete()
+        return cls._build_missing([trip])[trip.pk]
+
+    def _span(self, start, end):
+        # Giới hạn [start, end) vào các chặng đang có; end=None nghĩa là tới cuối tuyến
+        end = self.segment_count if end is None else min(end, self.segment_count)
+        return max(start, 0), end
+
+    def free_seats(self, start=0, end=None):
+        """Các ghế còn trống trên toàn bộ chặng [start, end) - O(số ghế), không lặp theo booking."""
+        start, end = self._span(start, end)
+        width, free = self.segment_count, self.FREE * (end - start)
+        return {
+            seat_number for seat_number in range(1, self.total_seats + 1)
+            if self.occupancy[(seat_number - 1) * width + start:(seat_number - 1) * width + end] == free
+        }
+
+    @staticmethod
+    def nearest_seats(free_seats, seat_numbers, limit=3):
+        """Gợi ý tối đa ``limit`` ghế trống thay cho các ghế đã bị giữ trong ``seat_numbers``.
+
+        Ghế gần ghế bị giữ nhất đứng trước (bằng nhau thì số ghế nhỏ trước), bỏ qua ghế đã có trong yêu cầu.
+        """
+        taken = [seat for seat in seat_numbers if seat not in free_seats] or list(seat_numbers)
+        candidates = set(free_seats).difference(seat_numbers)
+        return sorted(candidates, key=lambda seat: (min(abs(seat - wanted) for wanted in taken), seat))[:limit]
+
+    def seat_segments(self, seat_number):
+        """Trạng thái từng chặng của 1 ghế, vd. '0110' ('0' trống, '1' đã giữ)."""
+        offset = (seat_number - 1) * self.segment_count
+        return self.occupancy[offset:offset + self.segment_count]
+
+    def occupied_seats(self, start=0, end=None):
+        """Các ghế đã có người giữ ở ít nhất 1 chặng trong [start, end)."""
+        return set(range(1, self.total_seats + 1)) - self.free_seats(start, end)
+
+    def _set_span(self, seat_numbers, start, end, expected, new, hold_until=None):
+        # 1 câu UPDATE cho mọi ghế trong seat_numbers:
+        #   SET occupancy = <các chặng [start, end) của từng ghế đổi thành new>
+        #   WHERE trip_id = ... AND SUBSTRING(occupancy, pos_i, length) = expected * length (với mọi ghế i)
+        width, length = self.segment_count, end - start
+        conditions, pieces, count_changes, cursor = [], [], [], 1
+        for seat_number in sorted(seat_numbers):
+            seat_pos = (seat_number - 1) * width + 1
+            pos = seat_pos + start
+            conditions.append(Exact(Substr('occupancy', pos, length), Value(expected * length)))
+            pieces += [Substr('occupancy', cursor, pos - cursor), Value(new * length)]
+            cursor = pos + length
+            if new == self.TAKEN:
+                # Ghế đang trống toàn tuyến thì giờ không còn trống nữa
+                became = Exact(Substr('occupancy', seat_pos, width), Value(self.FREE * width))
+            else:
+                # Ghế trống toàn tuyến sau khi trả nếu các chặng còn lại của ghế đều trống
+                rest_of_seat = Concat(Substr('occupancy', seat_pos, start),
+                                      Substr('occupancy', pos + length, width - end),
+                                      output_field=models.TextField())
+                became = Exact(rest_of_seat, Value(self.FREE * (width - length)))
+            count_changes.append(Case(When(became, then=Value(1)), default=Value(0),
+                                      output_field=models.IntegerField()))
+        pieces.append(Substr('occupancy', cursor))
+
+        count_change = reduce(operator.add, count_changes)
+        available_count = F('available_count') - count_change if new == self.TAKEN \
+            else F('available_count') + count_change
+        # available_count phải đứng trước occupancy: MySQL tính SET từ trái sang phải,
+        # biểu thức của available_count cần đọc giá trị occupancy trước khi bị ghi đè
+        changes = {
+            'available_count': ExpressionWrapper(available_count, output_field=models.PositiveIntegerField()),
+            'occupancy': Concat(*pieces, output_field=models.TextField()),
+        }
+        if hold_until is not None:
+            # Giữ chỗ có hạn: next_hold_expiry = MIN(next_hold_expiry, hold_until)
+            changes['next_hold_expiry'] = Coalesce(Least('next_hold_expiry', Value(hold_until)), Value(hold_until))
+        updated = TripSeatInventory.objects.filter(*conditions, trip_id=self.trip_id).update(**changes)
+        if updated:
+            for seat_number in seat_numbers:
+                seat_pos = (seat_number - 1) * width
+                was_free = self.occupancy[seat_pos:seat_pos + width] == self.FREE * width
+                pos = seat_pos + start
+                self.occupancy = self.occupancy[:pos] + new * length + self.occupancy[pos + length:]
+                is_free = self.occupancy[seat_pos:seat_pos + width] == self.FREE * width
+                self.available_count += is_free - was_free
+            if hold_until is not None and (self.next_hold_expiry is None or hold_until < self.next_hold_expiry):
+                self.next_hold_expiry = hold_until
+            # Báo cho các client đang theo dõi sơ đồ ghế của chuyến (SSE) sau khi commit
+            publish_seat_changes_on_commit(self.trip_id, seat_numbers)
+        return bool(updated)
+
+    def claim_many(self, seat_numbers, start=0, end=None, hold_until=None):
+        """Giữ cùng lúc nhiều ghế trên chặng [start, end): được tất cả hoặc không ghế nào.
+
+        ``hold_until``: hạn giữ chỗ của vé PENDING. Nếu không giữ được vì vướng vé quá hạn
+        chưa được dọn thì dọn ngay các vé quá hạn của chuyến này rồi thử lại 1 lần.
+        """
+        start, end = self._span(start, end)
+        seat_numbers = set(seat_numbers)
+        if not seat_numbers or start >= end or not all(1 <= seat <= self.total_seats for seat in seat_numbers):
+            return False
+        if self._set_span(seat_numbers, start, end, self.FREE, self.TAKEN, hold_until):
+            return True
+        if not self.has_expired_holds():
+            return False
+        Booking.release_expired_holds(trip_ids=[self.trip_id])
+        self.refresh_from_db()
+        return self._set_span(seat_numbers, start, end, self.FREE, self.TAKEN, hold_until)
+
+    def claim(self, seat_number, start=0, end=None, hold_until=None):
+        """Giữ ghế trên các chặng [start, end); trả về False nếu có chặng đã bị giữ hoặc ghế không tồn tại."""
+        return self.claim_many([seat_number], start, end, hold_until)
+
+    def release_many(self, seat_numbers, start=0, end=None):
+        start, end = self._span(start, end)
+        seat_numbers = {seat for seat in seat_numbers if 1 <= seat <= self.total_seats}
+        if not seat_numbers or start >= end:
+            return False
+        return self._set_span(seat_numbers, start, end, self.TAKEN, self.FREE)
+
+    def release(self, seat_number, start=0, end=None):
+        return self.release_many([seat_number], start, end)
+
+    def release_hold(self, hold):
+        """Trả lại chặng mà 1 booking đã giữ (xem ``Booking._current_hold``)."""
+        trip_id, seat_number, pickup_point_id, dropoff_point_id = hold
+        orders = dict(RoutePoint.objects.filter(pk__in=[pickup_point_id, dropoff_point_id])
+                      .values_list('pk', 'order'))
+        return self.release(seat_number, orders[pickup_point_id], orders[dropoff_point_id])
+
+
+# 6. Chốt chặn ở tầng DB cho sơ đồ ghế
+class SeatClaim(models.Model):
+    """Mỗi chặng mà 1 vé đang giữ là 1 dòng (chuyến, ghế, chặng), duy nhất theo UniqueConstraint.
+
+    Giữ ghế vẫn do TripSeatInventory đảm nhiệm (1 câu UPDATE có điều kiện); bảng này chỉ là chốt
+    chặn: nếu sơ đồ ghế bị dựng sai (dữ liệu cũ, sửa tay...) thì DB vẫn không cho 2 vé đang giữ
+    cùng 1 chặng của 1 ghế. Ghi cùng transaction với Booking, xóa khi vé thôi giữ ghế.
+    """
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name='seat_claims')
+    # Index của UniqueConstraint đã bắt đầu bằng trip_id
+    trip = models.ForeignKey(Trip, on_delete=models.CASCADE, related_name='+', db_index=False)
+    seat_number = models.PositiveIntegerField()
+    segment = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['trip', 'seat_number', 'segment'], name='unique_seat_segment_claim'),
+        ]
+
+    def __str__(self):
+        return f"Vé {self.booking_id} | Ghế {self.seat_number} | Chặng {self.segment}"
+
+    @classmethod
+    def for_holds(cls, holds):
+        """Các dòng của ``holds`` dạng (booking_id, trip_id, ghế, order điểm đón, order điểm trả)."""
+        return [cls(booking_id=booking_id, trip_id=trip_id, seat_number=seat_number, segment=segment)
+                for booking_id, trip_id, seat_number, start, end in holds for segment in range(start, end)]
+
+    @classmethod
+    def add(cls, holds):
+        """Ghi các chặng của ``holds``; False nếu có chặng đã có vé khác giữ.
+
+        Không mở savepoint riêng (thêm 2 query mỗi lần đặt vé): khi lỗi, transaction.atomic của nơi gọi
+        bị đánh dấu rollback, nơi gọi phải raise ngay (xem Booking.save, Booking.book_seats).
+        """
+        try:
+            with transaction.atomic(savepoint=False):
+                cls.objects.bulk_create(cls.for_holds(holds))
+        except IntegrityError:
+            return False
+        return True
+
+    @classmethod
+    @transaction.atomic
+    def sync_trips(cls, trip_ids):
+        """Ghi lại toàn bộ chặng của các chuyến từ vé đang giữ (sau khi đổi thứ tự điểm, ghi vé hàng loạt...)."""
+        cls.objects.filter(trip_id__in=trip_ids).delete()
+        holds = Booking.objects.filter(trip_id__in=trip_ids, status__in=Booking.ACTIVE_STATUSES) \
+            .values_list('pk', 'trip_id', 'seat_number', 'pickup_point__order', 'dropoff_point__order')
+        cls.objects.bulk_create(cls.for_holds(holds), batch_size=1000)
+
+
+# 7. Lưu trữ: chuyến đã kết thúc từ lâu và vé của chúng (xem archive.py, lệnh archive_trips)
+# Giữ nguyên id và các cột của Trip/Booking; các bảng nóng chỉ còn dữ liệu đang dùng nên
+# index của tìm kiếm, sơ đồ ghế và dọn vé quá hạn luôn nhỏ.
+class ArchivedTrip(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    route = models.ForeignKey(Route, on_delete=models.PROTECT, related_name='archived_trips')
+    bus = models.ForeignKey(Bus, on_delete=models.PROTECT, related_name='archived_trips')
+    departure_time = models.DateTimeField()
+    arrival_time = models.DateTimeField()
+    status = models.CharField(max_length=20, choices=Trip.STATUS_CHOICES)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['departure_time'], name='archived_trip_departure_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.route} | {self.departure_time.strftime('%d/%m/%Y %H:%M')} (lưu trữ)"
+
+
+class ArchivedBooking(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_bookings')
+    trip = models.ForeignKey(ArchivedTrip, on_delete=models.CASCADE, related_name='bookings')
+    pickup_point = models.ForeignKey(RoutePoint, on_delete=models.PROTECT, related_name='+', verbose_name="Điểm đón")
+    dropoff_point = models.ForeignKey(RoutePoint, on_delete=models.PROTECT, related_name='+',
+                                      verbose_name="Điểm trả")
+    seat_number = models.PositiveIntegerField()
+    booking_time = models.DateTimeField()
+    status = models.CharField(max_length=20, choices=Booking.STATUS_CHOICES)
+    price_paid = models.DecimalField(max_digits=10, decimal_places=0)
+
+    class Meta:
+        indexes = [
+            # Xuất vé theo ngày đặt (exports.bookings_on)
+            models.Index(fields=['booking_time'], name='archived_booking_time_idx'),
+        ]
 
     def __str__(self):
-        return f"Vé {self.id} | Ghế {self.seat_number} | Đón: {self.pickup_point.name} -> Trả: {self.dropoff_point.name}"
\ No newline at end of file
+        return f"Vé {self.id} | Ghế {self.seat_number} (lưu trữ)"
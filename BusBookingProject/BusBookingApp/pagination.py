@@ -0,0 +1,145 @@
+import base64
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class TripKeysetPagination(BasePagination):
+    """Phân trang keyset theo (departure_time, id).
+
+    Trang sau được lấy bằng điều kiện ``(departure_time, id) > (t, id)`` thay cho
+    OFFSET, nên trang sâu không phải quét lại các trang trước và chi phí không
+    tăng theo số trang. Chỉ hỗ trợ đi tới (``next``).
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    ordering = ('departure_time', 'id')
+
+    def __init__(self):
+        rest_framework = getattr(settings, 'REST_FRAMEWORK', {})
+        self.default_page_size = rest_framework.get('PAGE_SIZE') or 20
+        self.max_page_size = rest_framework.get('MAX_PAGE_SIZE') or 100
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.default_page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            departure_time, pk = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            return datetime.fromisoformat(departure_time), int(pk)
+        except (TypeError, ValueError, UnicodeEncodeError):
+            raise NotFound("Cursor không hợp lệ.")
+
+    def encode_cursor(self, trip):
+        position = json.dumps([trip.departure_time.isoformat(), trip.pk])
+        return base64.urlsafe_b64encode(position.encode('ascii')).decode('ascii')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.get_page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Bản async cho view ASGI: đọc trang bằng ``async for`` thay cho list()."""
+        return self.set_page([trip async for trip in self.get_page_queryset(queryset, request)])
+
+    def get_page_queryset(self, queryset, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            departure_time, pk = position
+            queryset = queryset.filter(
+                Q(departure_time__gt=departure_time) | Q(departure_time=departure_time, id__gt=pk)
+            )
+
+        # Lấy dư 1 bản ghi để biết còn trang sau hay không;
+        # select_related/prefetch_related chỉ chạy trên đúng trang này
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, page):
+        self.has_next = len(page) > self.page_size
+        self.page = page[:self.page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param, 'required': False, 'in': 'query',
+                'description': "Cursor của trang tiếp theo (lấy từ trường next)",
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param, 'required': False, 'in': 'query',
+                'description': f"Số chuyến mỗi trang (tối đa {self.max_page_size})",
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+
+def estimate_row_count(using, table):
+    """Số dòng ước lượng của bảng theo thống kê của DB (không quét bảng); None nếu DB không hỗ trợ."""
+    connection = connections[using]
+    if connection.vendor == 'mysql':
+        sql = "SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s"
+    elif connection.vendor == 'postgresql':
+        sql = "SELECT reltuples::bigint FROM pg_class WHERE relname = %s"
+    else:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [table])
+        row = cursor.fetchone()
+    return int(row[0]) if row and row[0] is not None and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator cho trang danh sách admin của bảng lớn: không COUNT(*) cả bảng.
+
+    Không có bộ lọc thì dùng số dòng ước lượng của DB; có bộ lọc (hoặc DB không có thống kê,
+    hoặc bảng còn nhỏ) thì đếm nhưng dừng ở ``count_limit`` dòng.
+    """
+    count_limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_row_count(queryset.db, queryset.model._meta.db_table)
+            if estimate is not None and estimate >= self.count_limit:
+                return estimate
+        return queryset.order_by()[:self.count_limit].count()
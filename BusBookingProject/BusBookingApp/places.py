@@ -0,0 +1,19 @@
+from .utils import fold_place_name
+
+
+def route_stop_entries(origin, destination, points):
+    """Sinh các dòng chỉ mục địa danh của 1 tuyến: [(name, key, order), ...].
+
+    ``points`` là danh sách (name, order) của các RoutePoint. Điểm đi của tuyến
+    đứng cùng thứ tự với điểm đón đầu tiên, điểm đến cùng thứ tự với điểm trả
+    cuối cùng. Mỗi tên được chỉ mục theo mọi hậu tố từ (word suffix) để gõ
+    "my dinh" vẫn ra "Bến xe Mỹ Đình".
+    """
+    orders = [order for _, order in points]
+    first, last = (min(orders), max(orders)) if orders else (0, 1)
+    entries = []
+    for name, order in [(origin, first), *points, (destination, last)]:
+        words = fold_place_name(name).split()
+        for i in range(len(words)):
+            entries.append((name, ' '.join(words[i:])[:200], order))
+    return entries
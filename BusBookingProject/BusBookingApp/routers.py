@@ -0,0 +1,60 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+
+REPLICA = 'replica'
+
+_read_from_replica = ContextVar('read_from_replica', default=False)
+
+
+@contextmanager
+def read_from_replica():
+    """Trong khối này, các truy vấn đọc của BusBookingApp đi tới bản sao (nếu có cấu hình)."""
+    token = _read_from_replica.set(True)
+    try:
+        yield
+    finally:
+        _read_from_replica.reset(token)
+
+
+def replica_reads(view):
+    """Bọc view (sync hoặc async) để toàn bộ phần đọc DB của request chạy trên bản sao."""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(*args, **kwargs):
+            with read_from_replica():
+                return await view(*args, **kwargs)
+    else:
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            with read_from_replica():
+                return view(*args, **kwargs)
+    return wrapper
+
+
+class ReadReplicaRouter:
+    """Chỉ các view bật ``read_from_replica`` mới đọc từ bản sao.
+
+    Mọi thao tác ghi và mọi truy vấn khác (đặt vé, admin, dọn vé quá hạn...) vẫn ở default,
+    nên không bị đọc phải dữ liệu trễ của bản sao ngay sau khi ghi. Bảng của app khác
+    (tài khoản, phiên đăng nhập) luôn đọc ở default.
+    """
+    app_label = 'BusBookingApp'
+
+    def db_for_read(self, model, **hints):
+        if _read_from_replica.get() and model._meta.app_label == self.app_label:
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # 2 alias cùng 1 dữ liệu (bản sao), quan hệ giữa chúng luôn hợp lệ
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Bản sao nhận schema qua replication
+        return db != REPLICA
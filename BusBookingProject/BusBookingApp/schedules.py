@@ -0,0 +1,120 @@
+"""Sinh Trip hàng loạt từ lịch chạy định kỳ (TripSchedule).
+
+Cả đợt sinh chỉ tốn vài query cố định: 1 query đọc lịch, 1 query đọc các chuyến đã có của
+các xe trong khoảng ngày (vừa để bỏ qua chuyến đã sinh, vừa để kiểm tra trùng xe), rồi
+bulk_create theo lô. Không gọi Trip.save() nên signal không chạy: tự làm mới cache tìm kiếm.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import TRIPS_ALL, bump_version, trips_on_date
+from .models import Trip, TripSchedule
+
+BATCH_SIZE = 1000
+
+
+def invalidate_trip_searches(dates):
+    for name in (TRIPS_ALL, *map(trips_on_date, dates)):
+        bump_version(name)
+
+
+def expand_schedules(schedules, start_date, end_date):
+    """Các chuyến (schedule, departure_time, arrival_time) của ``schedules`` trong [start_date, end_date]."""
+    candidates = []
+    for schedule in schedules:
+        duration = timedelta(hours=schedule.route.duration_hours)
+        times = schedule.times()
+        for day in schedule.dates(start_date, end_date):
+            for departure_time in times:
+                departure_time = timezone.make_aware(datetime.combine(day, departure_time))
+                candidates.append((schedule, departure_time, departure_time + duration))
+    return candidates
+
+
+def find_bus_conflicts(candidates, existing):
+    """Quét theo thời gian từng xe, trả về tập chỉ số các chuyến mới bị trùng xe.
+
+    ``existing``: các khoảng (bus_id, departure, arrival) đã có trong DB, luôn được giữ;
+    chuyến mới trùng với chuyến đã nhận trước đó (cũ hoặc mới) thì bị loại.
+    """
+    intervals = defaultdict(list)
+    for bus_id, departure_time, arrival_time in existing:
+        intervals[bus_id].append((departure_time, arrival_time, None))
+    for index, (schedule, departure_time, arrival_time) in enumerate(candidates):
+        intervals[schedule.bus_id].append((departure_time, arrival_time, index))
+
+    conflicts = set()
+    for bus_intervals in intervals.values():
+        # Cùng giờ xuất phát thì chuyến đã có (index None) xếp trước
+        bus_intervals.sort(key=lambda interval: (interval[0], interval[2] is not None))
+        busy_until, holder = None, None  # xe bận tới lúc nào, bởi chuyến mới nào (None: chuyến đã có)
+        for departure_time, arrival_time, index in bus_intervals:
+            if busy_until is None or departure_time >= busy_until:
+                busy_until, holder = arrival_time, index
+            elif index is not None:
+                conflicts.add(index)
+            else:
+                # Chuyến đã có luôn được giữ: bỏ chuyến mới đang chiếm xe trước nó. Chuyến mới đó xuất phát
+                # sau khi xe rảnh nên bỏ nó đi thì xe chỉ còn bận tới lúc chuyến đã có này về.
+                if holder is not None:
+                    conflicts.add(holder)
+                    busy_until = arrival_time
+                else:
+                    busy_until = max(busy_until, arrival_time)
+                holder = None
+    return conflicts
+
+
+@transaction.atomic
+def generate_trips(start_date, end_date, schedules=None, dry_run=False):
+    """Sinh Trip cho các lịch chạy đang bật trong [start_date, end_date].
+
+    Bỏ qua chuyến đã có (cùng tuyến, xe, giờ xuất phát) và chuyến làm 1 xe phải chạy 2 chuyến
+    chồng giờ. Trả về số chuyến đã tạo/bỏ qua và danh sách chuyến bị trùng xe.
+    """
+    if schedules is None:
+        schedules = TripSchedule.objects.filter(is_active=True)
+    schedules = list(schedules.select_related('route', 'bus'))
+    candidates = expand_schedules(schedules, start_date, end_date)
+    if not candidates:
+        return {'created': 0, 'existing': 0, 'bus_conflicts': []}
+
+    # 1 query: mọi chuyến của các xe liên quan có khoảng chạy giao với [xuất phát sớm nhất, đến muộn nhất]
+    # của các chuyến sẽ sinh (gồm cả chuyến đã có xuất phát sau giờ đầu tiên, hay chạy dài hơn mọi chuyến mới).
+    # Chuyến đã hủy vẫn tính là đã có (không sinh lại) nhưng không chiếm xe.
+    rows = Trip.objects.filter(
+        bus_id__in={schedule.bus_id for schedule in schedules},
+        departure_time__lte=max(arrival_time for _, _, arrival_time in candidates),
+        arrival_time__gte=min(departure_time for _, departure_time, _ in candidates),
+    ).values_list('route_id', 'bus_id', 'departure_time', 'arrival_time', 'status')
+    existing_keys, existing = set(), []
+    for route_id, bus_id, departure_time, arrival_time, status in rows:
+        existing_keys.add((route_id, bus_id, departure_time))
+        if status != 'CANCELLED':
+            existing.append((bus_id, departure_time, arrival_time))
+
+    new = []
+    for candidate in candidates:
+        key = (candidate[0].route_id, candidate[0].bus_id, candidate[1])
+        if key not in existing_keys:
+            existing_keys.add(key)  # 2 lịch trùng nhau chỉ sinh 1 chuyến
+            new.append(candidate)
+    conflicts = find_bus_conflicts(new, existing)
+    trips = [Trip(route_id=schedule.route_id, bus_id=schedule.bus_id, departure_time=departure_time,
+                  arrival_time=arrival_time)
+             for index, (schedule, departure_time, arrival_time) in enumerate(new) if index not in conflicts]
+
+    if not dry_run:
+        for i in range(0, len(trips), BATCH_SIZE):
+            Trip.objects.bulk_create(trips[i:i + BATCH_SIZE])
+        dates = {timezone.localtime(trip.departure_time).date() for trip in trips}
+        if dates:
+            transaction.on_commit(lambda: invalidate_trip_searches(dates))
+    return {
+        'created': len(trips),
+        'existing': len(candidates) - len(new),
+        'bus_conflicts': [(new[index][0], new[index][1]) for index in sorted(conflicts)],
+    }
@@ -0,0 +1,73 @@
+"""Những gì chỉ cần khi sinh schema OpenAPI (drf-spectacular).
+
+Không import lúc worker khởi động: ``/api/schema/`` đọc file build sẵn, chỉ khi chưa có file mới
+dùng ``SchemaView`` (qua LazyView); lệnh ``build_schema`` import module này trước khi sinh.
+
+Mô tả thêm cho view/serializer (tham số, response, kiểu field) cũng gắn ở đây thay vì dùng decorator
+trong views.py/serializers.py: ``extend_schema`` đọc ``DEFAULT_SCHEMA_CLASS`` ngay khi được áp, tức là
+import cả ``drf_spectacular.openapi`` và các ``contrib`` lúc nạp urls.
+"""
+from drf_spectacular.contrib.rest_auth import SimpleJWTCookieScheme
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema, extend_schema_field, extend_schema_view, OpenApiParameter
+from drf_spectacular.views import SpectacularAPIView
+from rest_framework import serializers
+
+from .exports import FORMATS as EXPORT_FORMATS
+from .serializers import FareMatrixSerializer, RouteSerializer, SEAT_MAP_FORMATS, TripSerializer
+from .views import (
+    BookingExportView, MetricsView, PlaceAutocompleteView, TripDetailView, TripListView, TripManifestExportView,
+)
+
+
+class CachedJWTCookieScheme(SimpleJWTCookieScheme):
+    # drf-spectacular chỉ khớp đúng class, không nhận lớp con của JWTCookieAuthentication
+    target_class = 'BusBookingApp.authentication.CachedJWTCookieAuthentication'
+
+
+class SchemaView(SpectacularAPIView):
+    """Sinh schema lúc chạy, có đủ các extension ở trên."""
+
+
+# --------------------------------------
+# Serializers
+# --------------------------------------
+
+extend_schema_field(FareMatrixSerializer)(RouteSerializer.get_fare_matrix)
+extend_schema_field(RouteSerializer)(TripSerializer.get_route)
+extend_schema_field(serializers.DecimalField(max_digits=4, decimal_places=2))(TripSerializer.get_fare_multiplier)
+extend_schema_field(serializers.ListField(child=serializers.ListField(child=serializers.IntegerField())))(
+    TripSerializer.get_fares)
+# full: danh sách ghế, compact: object
+extend_schema_field(OpenApiTypes.ANY)(TripSerializer.get_seat_map)
+
+
+# --------------------------------------
+# Views
+# --------------------------------------
+
+SEAT_MAP_PARAMETER = OpenApiParameter(
+    'seat_map', OpenApiTypes.STR, enum=SEAT_MAP_FORMATS,
+    description="Định dạng sơ đồ ghế: full (mặc định), compact (bitmask base64) hoặc none (bỏ qua)"
+)
+SEGMENT_PARAMETERS = [
+    OpenApiParameter('pickup', OpenApiTypes.INT,
+                     description="ID điểm đón: sơ đồ ghế chỉ xét chặng từ điểm đón tới điểm trả"),
+    OpenApiParameter('dropoff', OpenApiTypes.INT, description="ID điểm trả (đi cùng pickup)"),
+]
+EXPORT_OUTPUT_PARAMETER = OpenApiParameter('output', OpenApiTypes.STR, enum=list(EXPORT_FORMATS),
+                                           description="Định dạng file (mặc định csv)")
+EXPORT_RESPONSES = {(200, content_type.split(';')[0]): OpenApiTypes.BINARY
+                    for content_type, _, _ in EXPORT_FORMATS.values()}
+
+extend_schema(parameters=[SEAT_MAP_PARAMETER, *SEGMENT_PARAMETERS])(TripListView)
+extend_schema(parameters=[SEAT_MAP_PARAMETER, *SEGMENT_PARAMETERS])(TripDetailView)
+extend_schema(parameters=[OpenApiParameter('q', OpenApiTypes.STR, description="Tên địa danh (không cần dấu)")])(
+    PlaceAutocompleteView)
+extend_schema(exclude=True)(MetricsView)
+extend_schema_view(get=extend_schema(
+    parameters=[EXPORT_OUTPUT_PARAMETER, OpenApiParameter('date', OpenApiTypes.DATE, required=True)],
+    responses=EXPORT_RESPONSES,
+))(BookingExportView)
+extend_schema_view(get=extend_schema(parameters=[EXPORT_OUTPUT_PARAMETER], responses=EXPORT_RESPONSES))(
+    TripManifestExportView)
@@ -1,6 +1,12 @@
-from rest_framework import serializers
+import base64
+
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
 from django.core.exceptions import ValidationError as DjangoValidationError
-from .models import Bus, Route, Trip, Booking, RoutePoint
+from .cache import get_route_payloads
+from .fares import apply_multiplier, dynamic_pricing_enabled, fare_matrix, occupancy_multiplier
+from .metrics import TimedSerializerMixin
+from .models import Bus, Route, Trip, Booking, RoutePoint, SeatConflict, TripSeatInventory
 
 
 # Chỉ giữ lại các Serializer nghiệp vụ (RoutePoint, Route, Trip, Booking)
@@ -14,37 +20,181 @@ class RoutePointSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'address', 'point_type', 'type_display', 'order', 'surcharge']
 
 
+class FareMatrixSerializer(serializers.Serializer):
+    points = serializers.ListField(child=serializers.IntegerField())
+    fares = serializers.ListField(child=serializers.ListField(child=serializers.IntegerField()))
+
+
 class RouteSerializer(serializers.ModelSerializer):
     points = RoutePointSerializer(many=True, read_only=True)
+    # Giá gốc theo cặp điểm đón/trả, tính sẵn và cache cùng payload tuyến
+    fare_matrix = serializers.SerializerMethodField()
 
     class Meta:
         model = Route
-        fields = ['id', 'origin', 'destination', 'base_price', 'duration_hours', 'points']
+        fields = ['id', 'origin', 'destination', 'base_price', 'duration_hours', 'points', 'fare_matrix']
+
+    def get_fare_matrix(self, obj):
+        points = sorted(obj.points.all(), key=lambda point: point.order)
+        return fare_matrix(obj.base_price, [(point.pk, point.surcharge) for point in points])
+
+
+class PlaceSerializer(serializers.Serializer):
+    name = serializers.CharField()
+
+
+def load_seat_inventories(trips):
+    """Nạp sơ đồ ghế cho cả trang chuyến xe bằng 1 query duy nhất vào TripSeatInventory.
+
+    Kết quả được gắn vào từng trip (``trip._seat_inventory``) để
+    ``TripSerializer.get_seat_map`` đọc lại mà không phải query thêm.
+    """
+    trips = [trip for trip in trips if not hasattr(trip, '_seat_inventory')]
+    if not trips:
+        return
+    # Vé PENDING quá hạn (chưa kịp dọn) được coi là ghế trống
+    inventories = TripSeatInventory.for_trips(trips, ignore_expired_holds=True)
+    for trip in trips:
+        trip._seat_inventory = inventories[trip.pk]
+
+
+def load_route_payloads(route_ids):
+    return {route.pk: RouteSerializer(route).data
+            for route in Route.objects.filter(pk__in=route_ids).prefetch_related('points')}
+
+
+def attach_route_payloads(trips):
+    """Gắn payload tuyến đường (đọc từ cache, thiếu mới query DB) vào từng trip."""
+    trips = [trip for trip in trips if not hasattr(trip, '_route_payload')]
+    payloads = get_route_payloads({trip.route_id for trip in trips}, load_route_payloads)
+    for trip in trips:
+        trip._route_payload = payloads[trip.route_id]
 
 
-class TripSerializer(serializers.ModelSerializer):
-    route = RouteSerializer(read_only=True)
+def encode_seat_bitmap(total_seats, occupied_seats):
+    """Mã hóa ghế đã bị giữ thành bitmask base64 (bit i-1 = ghế số i, LSB trước)."""
+    bitmap = bytearray((total_seats + 7) // 8)
+    for seat in occupied_seats:
+        if 1 <= seat <= total_seats:
+            bitmap[(seat - 1) // 8] |= 1 << ((seat - 1) % 8)
+    return base64.b64encode(bytes(bitmap)).decode('ascii')
+
+
+# Định dạng sơ đồ ghế client có thể chọn qua ?seat_map=
+SEAT_MAP_FULL = 'full'
+SEAT_MAP_COMPACT = 'compact'
+SEAT_MAP_NONE = 'none'
+SEAT_MAP_FORMATS = [SEAT_MAP_FULL, SEAT_MAP_COMPACT, SEAT_MAP_NONE]
+
+
+def needs_seat_inventories(seat_map_format):
+    # Giá động đọc độ lấp đầy từ sơ đồ ghế kể cả khi không trả sơ đồ ghế
+    return seat_map_format != SEAT_MAP_NONE or dynamic_pricing_enabled()
+
+
+class TripListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    def to_representation(self, data):
+        trips = list(data.all() if hasattr(data, 'all') else data)
+        attach_route_payloads(trips)
+        # Nạp trước sơ đồ ghế cho cả danh sách để tránh N+1 query
+        if needs_seat_inventories(self.child.seat_map_format):
+            load_seat_inventories(trips)
+        return super().to_representation(trips)
+
+
+class TripSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    # Phần tuyến đường lấy nguyên từ cache, serializer chỉ tính thêm các trường riêng của chuyến
+    route = serializers.SerializerMethodField()
     bus_name = serializers.CharField(source='bus.LICENSE_PLATE', read_only=True)
     seat_map = serializers.SerializerMethodField()
+    fare_multiplier = serializers.SerializerMethodField()
+    fares = serializers.SerializerMethodField()
 
     class Meta:
         model = Trip
-        fields = ['id', 'route', 'bus_name', 'departure_time', 'seat_map']
+        fields = ['id', 'route', 'bus_name', 'departure_time', 'fare_multiplier', 'fares', 'seat_map']
+        list_serializer_class = TripListSerializer
+
+    @property
+    def seat_map_format(self):
+        return self.context.get('seat_map_format', SEAT_MAP_FULL)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.seat_map_format == SEAT_MAP_NONE:
+            fields.pop('seat_map')
+        return fields
+
+    def get_route(self, obj):
+        attach_route_payloads([obj])
+        return obj._route_payload
+
+    def get_multiplier(self, obj):
+        if not dynamic_pricing_enabled():
+            return occupancy_multiplier(None)
+        load_seat_inventories([obj])
+        return occupancy_multiplier(obj._seat_inventory)
 
+    def get_fare_multiplier(self, obj):
+        return str(self.get_multiplier(obj))
+
+    def get_fares(self, obj):
+        """Giá cuối của chuyến, cùng dạng ``route.fare_matrix.fares`` (đã nhân ``fare_multiplier``)."""
+        attach_route_payloads([obj])
+        return apply_multiplier(obj._route_payload['fare_matrix']['fares'], self.get_multiplier(obj))
+
+    def get_seat_span(self, obj):
+        """Chặng [order đón, order trả) cần xem ghế trống; mặc định là toàn tuyến."""
+        segment = self.context.get('segment')
+        if segment is not None:
+            pickup, dropoff = segment
+            if pickup.route_id == obj.route_id and dropoff.route_id == obj.route_id:
+                return pickup.order, dropoff.order
+        return 0, None
+
+    # full: danh sách ghế, compact: object (xem bên dưới)
     def get_seat_map(self, obj):
-        total_seats = obj.bus.total_seats
-        booked_seats = obj.bookings.filter(status__in=['PENDING', 'CONFIRMED']).values_list('seat_number', flat=True)
-        seats = []
-        for i in range(1, total_seats + 1):
-            seats.append({'seat_number': i, 'is_available': i not in booked_seats})
-        return seats
+        load_seat_inventories([obj])
+        inventory = obj._seat_inventory
+        start, end = self.get_seat_span(obj)
+        booked_seats = inventory.occupied_seats(start, end)
+        total_seats = inventory.total_seats
+        if self.seat_map_format == SEAT_MAP_COMPACT:
+            return {
+                'total_seats': total_seats,
+                'available_count': total_seats - len(booked_seats),
+                'occupied': encode_seat_bitmap(total_seats, booked_seats),
+            }
+        return [
+            {'seat_number': i, 'is_available': i not in booked_seats}
+            for i in range(1, total_seats + 1)
+        ]
+
+
+class SeatConflictError(APIException):
+    """409: ghế vừa bị người khác giữ; kèm ``suggested_seats`` để client đặt lại ngay không cần tải sơ đồ ghế."""
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Ghế đã có người đặt trên chặng này."
+    default_code = 'seat_conflict'
+
+    def __init__(self, errors, suggested_seats):
+        super().__init__(errors)
+        # Giữ số ghế dạng int (không bọc thành ErrorDetail như thông báo lỗi)
+        self.detail['suggested_seats'] = list(suggested_seats)
+
 
+class BookingSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    # Nạp sẵn route, bus và sơ đồ ghế cùng trip: clean(), tính giá và giữ ghế không phải query thêm
+    trip = serializers.PrimaryKeyRelatedField(
+        queryset=Trip.objects.select_related('route', 'bus', 'seat_inventory')
+    )
 
-class BookingSerializer(serializers.ModelSerializer):
     class Meta:
         model = Booking
         fields = ['id', 'trip', 'seat_number', 'pickup_point', 'dropoff_point', 'price_paid', 'status', 'booking_time']
         read_only_fields = ['price_paid', 'status', 'booking_time']
+        # Ghế trùng được chặn bởi TripSeatInventory.claim(), không cần quét bảng Booking
+        validators = []
 
     def validate(self, data):
         request = self.context.get('request')
@@ -67,5 +217,71 @@ class BookingSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         user = self.context['request'].user
-        booking = Booking.objects.create(user=user, **validated_data)
-        return booking
\ No newline at end of file
+        booking = Booking(user=user, **validated_data)
+        try:
+            # Đã clean() trong validate(); save() chỉ tính giá từ các object đã nạp và giữ ghế
+            booking.save(validate=False)
+        except SeatConflict as e:
+            raise SeatConflictError(e.errors, e.suggested_seats)
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.message_dict)
+        return booking
+
+
+class GroupBookingSerializer(serializers.Serializer):
+    """Đặt nhiều ghế của 1 chuyến trong 1 request (cùng điểm đón/trả)."""
+    max_seats = 10
+
+    trip = serializers.PrimaryKeyRelatedField(
+        queryset=Trip.objects.select_related('route', 'bus', 'seat_inventory')
+    )
+    pickup_point = serializers.PrimaryKeyRelatedField(queryset=RoutePoint.objects.all())
+    dropoff_point = serializers.PrimaryKeyRelatedField(queryset=RoutePoint.objects.all())
+    seats = serializers.ListField(child=serializers.IntegerField(min_value=1), min_length=1, max_length=max_seats)
+
+    def validate(self, data):
+        trip, seats = data['trip'], data['seats']
+        # Kiểm tra chuyến/điểm đón/điểm trả 1 lần cho cả nhóm
+        template = Booking(trip=trip, seat_number=1,
+                           pickup_point=data['pickup_point'], dropoff_point=data['dropoff_point'])
+        try:
+            template.clean()
+        except DjangoValidationError as e:
+            if hasattr(e, 'message_dict'):
+                raise serializers.ValidationError(e.message_dict)
+            raise serializers.ValidationError(str(e))
+
+        # Lỗi theo từng ghế, đọc trên sơ đồ ghế đã nạp cùng trip
+        inventory = TripSeatInventory.for_trips([trip], ignore_expired_holds=True)[trip.pk]
+        free = inventory.free_seats(data['pickup_point'].order, data['dropoff_point'].order)
+        errors, taken, seen = {}, {}, set()
+        for seat_number in seats:
+            if seat_number in seen:
+                errors[str(seat_number)] = f"Ghế số {seat_number} bị chọn trùng."
+            elif seat_number > trip.bus.total_seats:
+                errors[str(seat_number)] = f"Ghế số {seat_number} không tồn tại."
+            elif seat_number not in free:
+                taken[str(seat_number)] = f"Ghế số {seat_number} đã có người đặt trên chặng này."
+            seen.add(seat_number)
+        if errors:
+            raise serializers.ValidationError({'seats': {**errors, **taken}})
+        if taken:
+            # Yêu cầu hợp lệ, chỉ vướng ghế đã có người giữ: 409 kèm gợi ý ghế trống gần nhất
+            raise SeatConflictError({'seats': taken}, TripSeatInventory.nearest_seats(free, seats))
+        return data
+
+    def create(self, validated_data):
+        try:
+            return Booking.book_seats(
+                self.context['request'].user, validated_data['trip'], validated_data['pickup_point'],
+                validated_data['dropoff_point'], validated_data['seats'],
+            )
+        except SeatConflict as e:
+            raise SeatConflictError(e.errors, e.suggested_seats)
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.message_dict)
+
+    @property
+    def data(self):
+        # Trả về danh sách vé vừa tạo theo đúng định dạng của BookingSerializer
+        return BookingSerializer(self.instance, many=True, context=self.context).data
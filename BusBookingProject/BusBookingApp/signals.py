@@ -0,0 +1,149 @@
+import threading
+
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_out
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import (
+    bump_version, invalidate_route, invalidate_trip_responses, invalidate_trip_responses_on_commit, invalidate_user,
+    trip_namespace,
+)
+from .models import Booking, Route, RoutePoint, RouteStop, SeatClaim, Trip, TripSeatInventory
+
+
+def _reset_seat_inventories(route_id):
+    # Số chặng của lộ trình thay đổi -> xóa sơ đồ ghế, lần đọc sau sẽ dựng lại từ Booking (khóa dòng Trip,
+    # xem TripSeatInventory._build_missing). DELETE chờ các transaction đang giữ ghế trên sơ đồ cũ xong.
+    TripSeatInventory.objects.filter(trip__route_id=route_id).delete()
+
+
+@receiver(post_save, sender=RoutePoint)
+def reset_seat_inventories_on_point_save(sender, instance, created, **kwargs):
+    # Đổi tên, địa chỉ, phụ phí... không đổi các chặng: giữ nguyên sơ đồ ghế
+    loaded_order = getattr(instance, '_loaded_order', None)
+    instance._loaded_order = instance.order
+    if created:
+        _reset_seat_inventories(instance.route_id)
+    elif instance.order != loaded_order:
+        _reset_seat_inventories(instance.route_id)
+        # Vé đón/trả ở điểm này giờ giữ các chặng khác. Ghi lại SeatClaim sau commit: đổi chỗ 2 điểm
+        # phải qua 1 thứ tự tạm (unique_together route, order), lúc đó các chặng có thể chồng nhau
+        trip_ids = list(Trip.objects.filter(route_id=instance.route_id).values_list('pk', flat=True))
+        transaction.on_commit(lambda: SeatClaim.sync_trips(trip_ids))
+
+
+@receiver(post_delete, sender=RoutePoint)
+def reset_seat_inventories_on_point_delete(sender, instance, **kwargs):
+    # Xóa điểm không đổi order của các điểm khác (và điểm còn vé thì không xóa được): SeatClaim vẫn đúng
+    _reset_seat_inventories(instance.route_id)
+
+
+@receiver(post_save, sender=Route)
+def rebuild_stops_on_route_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        RouteStop.rebuild_for_route(instance)
+
+
+def _rebuild_route_stops(route_id):
+    route = Route.objects.filter(pk=route_id).first()
+    if route is not None:
+        RouteStop.rebuild_for_route(route)
+
+
+@receiver(post_save, sender=RoutePoint)
+def rebuild_stops_on_point_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _rebuild_route_stops(instance.route_id)
+
+
+@receiver(post_delete, sender=RoutePoint)
+def rebuild_stops_on_point_delete(sender, instance, **kwargs):
+    # Đợi commit: nếu điểm bị xóa theo Route (cascade) thì lúc đó Route đã không còn
+    transaction.on_commit(lambda: _rebuild_route_stops(instance.route_id))
+
+
+@receiver([post_save, post_delete], sender=Route)
+def invalidate_route_cache_on_route_change(sender, instance, **kwargs):
+    invalidate_route(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=RoutePoint)
+def invalidate_route_cache_on_point_change(sender, instance, **kwargs):
+    invalidate_route(instance.route_id)
+
+
+@receiver([post_save, post_delete], sender=Trip)
+def invalidate_responses_on_trip_change(sender, instance, **kwargs):
+    invalidate_trip_responses_on_commit(instance)
+
+
+@receiver(post_save, sender=Booking)
+def invalidate_responses_on_booking_save(sender, instance, **kwargs):
+    invalidate_trip_responses_on_commit(instance.trip)
+
+
+@receiver(pre_delete, sender=Booking)
+def load_hold_before_booking_delete(sender, instance, **kwargs):
+    # Vé nạp bằng only()/defer(): đọc chặng đang giữ và chuyến khi dòng còn trong DB
+    instance._loaded_hold_or_fetch()
+    deferred = instance.get_deferred_fields() & {'trip_id', 'hold_expires_at'}
+    if deferred:
+        instance.refresh_from_db(fields=[name.removesuffix('_id') for name in deferred])
+
+
+@receiver(post_delete, sender=Booking)
+def release_seat_on_booking_delete(sender, instance, **kwargs):
+    # Mọi đường xóa vé đều qua đây (Collector luôn bắn signal khi có receiver), cùng transaction với DELETE.
+    # Không dựng sơ đồ ghế nếu chưa có: dựng sau từ Booking thì vé đã xóa vốn không còn trong đó.
+    # Xóa Trip kéo theo vé thì sơ đồ ghế cũng bị xóa cùng, có thể đã không còn ở đây.
+    hold = instance._loaded_hold_or_fetch()
+    if hold is not None:
+        # Chuyến theo DB (hold[0]), không phải trip đang gán trên instance
+        inventory = TripSeatInventory.objects.filter(trip_id=hold[0]).first()
+        if inventory is not None:
+            inventory.release_hold(hold)
+            if instance.hold_expires_at is not None:  # vé PENDING
+                TripSeatInventory.refresh_next_hold_expiry([hold[0]], instance.hold_expires_at)
+
+
+# trip_id của các vé vừa bị xóa mà chưa nạp Trip, chờ commit (xem _invalidate_deleted_booking_trips)
+_deleted_booking_trips = threading.local()
+
+
+def _invalidate_deleted_booking_trips():
+    # Callback đầu tiên sau commit xử lý cả lô, các callback còn lại không còn gì để làm
+    trip_ids = _deleted_booking_trips.__dict__.pop('trip_ids', set())
+    departures = dict(Trip.objects.filter(pk__in=trip_ids).values_list('pk', 'departure_time'))
+    for trip_id in trip_ids:
+        if trip_id in departures:
+            invalidate_trip_responses(trip_id, timezone.localtime(departures[trip_id]).date())
+        else:
+            # Chuyến cũng đã bị xóa (cascade): signal của chính Trip đã lo phần tìm kiếm theo ngày
+            bump_version(trip_namespace(trip_id))
+
+
+@receiver(post_delete, sender=Booking)
+def invalidate_responses_on_booking_delete(sender, instance, **kwargs):
+    trip = instance._state.fields_cache.get('trip')
+    if trip is not None:
+        invalidate_trip_responses_on_commit(trip)
+        return
+    # Xóa hàng loạt (QuerySet.delete(), xóa Trip/User kéo theo): không query Trip cho từng vé, gom trip_id
+    # rồi đọc giờ xuất phát của cả lô 1 lần lúc commit để làm mới cả tìm kiếm theo ngày lẫn mọi chuyến
+    _deleted_booking_trips.__dict__.setdefault('trip_ids', set()).add(instance.trip_id)
+    transaction.on_commit(_invalidate_deleted_booking_trips)
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_user_on_change(sender, instance, **kwargs):
+    # Gồm cả đổi mật khẩu (set_password + save) và khóa tài khoản (is_active)
+    invalidate_user(instance.pk)
+
+
+@receiver(user_logged_out)
+def invalidate_cached_user_on_logout(sender, request, user, **kwargs):
+    if user is not None:
+        invalidate_user(user.pk)
@@ -0,0 +1,141 @@
+"""Sinh dữ liệu lịch chạy giả lập (xe, tuyến, điểm đón/trả, chuyến, vé) để đo hiệu năng.
+
+Mọi bảng đều ghi bằng bulk_create theo lô, không đi qua Model.save()/signal: các trường
+save() thường tự tính (khóa tìm kiếm của Route, giá vé, RouteStop, sơ đồ ghế) được tính sẵn ở đây.
+"""
+import random
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Booking, Bus, Route, RoutePoint, RouteStop, SeatClaim, Trip, TripSeatInventory
+from .places import route_stop_entries
+from .utils import fold_place_name
+
+CITIES = [
+    'Hà Nội', 'Hải Phòng', 'Quảng Ninh', 'Thanh Hóa', 'Vinh', 'Huế', 'Đà Nẵng', 'Quy Nhơn',
+    'Nha Trang', 'Đà Lạt', 'Buôn Ma Thuột', 'Sài Gòn', 'Vũng Tàu', 'Cần Thơ', 'Sa Pa', 'Lào Cai',
+]
+BATCH_SIZE = 1000
+
+
+def bulk_create(model, objects):
+    """bulk_create theo lô và trả về các object đã có id.
+
+    MySQL không trả id sau bulk_create nên đọc lại các dòng có id lớn hơn id lớn nhất trước đó
+    (chỉ đúng khi không có ai khác ghi vào bảng cùng lúc - đủ cho công cụ sinh dữ liệu).
+    """
+    if not objects:
+        return []
+    last_pk = model.objects.aggregate(last=Max('pk'))['last'] or 0
+    created = model.objects.bulk_create(objects, batch_size=BATCH_SIZE)
+    if created[0].pk is None:
+        created = list(model.objects.filter(pk__gt=last_pk).order_by('pk'))
+    return created
+
+
+def build_seat_inventories(trip_ids):
+    """Dựng sẵn sơ đồ ghế (và SeatClaim) cho các chuyến theo lô, để lần đọc đầu không phải dựng."""
+    trip_ids = list(trip_ids)
+    for i in range(0, len(trip_ids), BATCH_SIZE):
+        SeatClaim.sync_trips(trip_ids[i:i + BATCH_SIZE])
+        TripSeatInventory.for_trips(Trip.objects.filter(pk__in=trip_ids[i:i + BATCH_SIZE]).select_related('bus'))
+
+
+@transaction.atomic
+def generate_timetable(buses=20, routes=10, points_per_route=4, days=7, trips_per_day=50, fill=0.5,
+                       seats_per_bus=40, start_date=None, seed=None, user=None):
+    """Sinh ``days`` ngày lịch chạy, mỗi ngày ``trips_per_day`` chuyến chia đều cho các tuyến.
+
+    ``fill``: tỉ lệ ghế của mỗi chuyến đã có vé (chặng đón/trả ngẫu nhiên trên tuyến).
+    Trả về số dòng đã tạo của từng bảng.
+    """
+    rng = random.Random(seed)
+    points_per_route = max(points_per_route, 2)
+    start_date = start_date or timezone.localdate() + timedelta(days=1)
+    user = user or User.objects.get_or_create(username='bench')[0]
+    tag = f'{timezone.now():%y%m%d%H%M%S}{rng.randrange(1000):03d}'
+
+    bus_objects = bulk_create(Bus, [
+        Bus(LICENSE_PLATE=f'SIM{tag}-{i}', bus_type='Giường nằm', total_seats=seats_per_bus)
+        for i in range(buses)
+    ])
+
+    route_objects = []
+    for i in range(routes):
+        origin = CITIES[i % len(CITIES)]
+        destination = CITIES[(i + 1 + i // len(CITIES)) % len(CITIES)]
+        route_objects.append(Route(
+            origin=origin, destination=destination, base_price=Decimal(rng.randrange(100, 500) * 1000),
+            duration_hours=rng.choice([3, 4.5, 6, 8, 10]),
+            origin_key=fold_place_name(origin), destination_key=fold_place_name(destination),
+        ))
+    route_objects = bulk_create(Route, route_objects)
+
+    point_objects = []
+    for route in route_objects:
+        for order in range(points_per_route):
+            if order == 0:
+                name = f'Bến xe {route.origin}'
+            elif order == points_per_route - 1:
+                name = f'Bến xe {route.destination}'
+            else:
+                name = f'Trạm dừng {order} ({route.origin} - {route.destination})'
+            point_objects.append(RoutePoint(route=route, name=name, order=order,
+                                            surcharge=Decimal(rng.choice([0, 0, 10000, 20000]))))
+    point_objects = bulk_create(RoutePoint, point_objects)
+    points = {}
+    for point in point_objects:
+        points.setdefault(point.route_id, []).append(point)
+
+    RouteStop.objects.bulk_create([
+        RouteStop(route=route, name=name, key=key, order=order)
+        for route in route_objects
+        for name, key, order in route_stop_entries(
+            route.origin, route.destination, [(point.name, point.order) for point in points[route.pk]])
+    ], batch_size=BATCH_SIZE)
+
+    # Chuyến chạy rải đều từ 5h tới 23h mỗi ngày
+    trip_objects = []
+    spacing = timedelta(hours=18) / max(trips_per_day, 1)
+    for day in range(days):
+        day_start = timezone.make_aware(datetime.combine(start_date + timedelta(days=day), time(5)))
+        for i in range(trips_per_day):
+            route = route_objects[(day * trips_per_day + i) % routes]
+            departure_time = day_start + spacing * i
+            trip_objects.append(Trip(route=route, bus=bus_objects[i % buses], departure_time=departure_time,
+                                     arrival_time=departure_time + timedelta(hours=route.duration_hours)))
+    trip_objects = bulk_create(Trip, trip_objects)
+
+    routes_by_id = {route.pk: route for route in route_objects}
+    booking_count = 0
+    bookings = []
+    for trip in trip_objects:
+        route_points = points[trip.route_id]
+        for seat_number in rng.sample(range(1, seats_per_bus + 1), round(seats_per_bus * fill)):
+            start = rng.randrange(points_per_route - 1)
+            pickup, dropoff = route_points[start], route_points[rng.randrange(start + 1, points_per_route)]
+            bookings.append(Booking(
+                user=user, trip_id=trip.pk, seat_number=seat_number, pickup_point=pickup, dropoff_point=dropoff,
+                status='CONFIRMED',
+                price_paid=routes_by_id[trip.route_id].base_price + pickup.surcharge + dropoff.surcharge,
+            ))
+        if len(bookings) >= BATCH_SIZE:
+            Booking.objects.bulk_create(bookings, batch_size=BATCH_SIZE)
+            booking_count += len(bookings)
+            bookings = []
+    Booking.objects.bulk_create(bookings, batch_size=BATCH_SIZE)
+    booking_count += len(bookings)
+
+    build_seat_inventories(trip.pk for trip in trip_objects)
+    return {
+        'buses': len(bus_objects),
+        'routes': len(route_objects),
+        'route_points': len(point_objects),
+        'trips': len(trip_objects),
+        'bookings': booking_count,
+    }
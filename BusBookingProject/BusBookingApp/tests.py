@@ -1,3 +1,1136 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from unittest import mock
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from time import monotonic
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_out
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .archive import archive_trips
+from .authentication import user_cache
+from .cache import TRIPS_ALL, get_versions, is_shared_cache, trip_namespace, trips_on_date, versioned_timeout
+from .live import get_broadcaster
+from .management.commands.stress_booking import find_double_bookings
+from .metrics import percentile, registry as metrics_registry
+from .models import (
+    ArchivedBooking, ArchivedTrip, Bus, Route, RoutePoint, SeatClaim, SeatConflict, Trip, TripSchedule, Booking,
+    TripSeatInventory,
+)
+from .pagination import EstimatedCountPaginator
+from .routers import ReadReplicaRouter, read_from_replica, replica_reads
+from .schedules import generate_trips
+from .serializers import load_seat_inventories
+from .synthetic import generate_timetable
+from .utils import fold_place_name
+from .views import TripListView
+
+
+class BusBookingTestCase(TestCase):
+    """Dữ liệu dùng chung: khách ``user``, xe ``bus``, tuyến ``route`` Hà Nội -> ``destination`` có các điểm
+    ``points`` theo ``route_points`` (``pickup``/``dropoff``: điểm đầu/cuối) và chuyến ``trip``.
+
+    Lớp con đổi thuộc tính lớp / ``trip_departure`` cho khác đi, rồi gọi ``super().setUpTestData()``
+    trước khi thêm dữ liệu riêng.
+    """
+    total_seats = 40
+    destination = 'Thanh Hóa'
+    duration_hours = 3
+    route_points = [{'name': 'Bến xe Giáp Bát'}, {'name': 'Bến xe Thanh Hóa'}]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='khach', password='matkhau123', email='khach@example.com')
+        cls.bus = Bus.objects.create(LICENSE_PLATE='29B-12345', bus_type='Giường nằm', total_seats=cls.total_seats)
+        cls.route = Route.objects.create(origin='Hà Nội', destination=cls.destination,
+                                         base_price=150000, duration_hours=cls.duration_hours)
+        cls.points = [RoutePoint.objects.create(route=cls.route, order=order, **point)
+                      for order, point in enumerate(cls.route_points)]
+        if cls.points:
+            cls.pickup, cls.dropoff = cls.points[0], cls.points[-1]
+        start = cls.trip_departure()
+        if start is not None:
+            cls.trip = cls.create_trip(start)
+
+    @classmethod
+    def trip_departure(cls):
+        """Giờ xuất phát của ``trip``; None nếu lớp con tự tạo chuyến."""
+        return timezone.now() + timedelta(days=1)
+
+    @classmethod
+    def create_trip(cls, start):
+        return Trip.objects.create(route=cls.route, bus=cls.bus, departure_time=start,
+                                   arrival_time=start + timedelta(hours=cls.duration_hours))
+
+
+@override_settings(TRIP_RESPONSE_CACHE_TTL=0)
+class TripListQueryCountTests(BusBookingTestCase):
+    @classmethod
+    def trip_departure(cls):
+        return None
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def _create_trips(self, count):
+        start = timezone.now() + timedelta(days=1)
+        for i in range(count):
+            trip = Trip.objects.create(route=self.route, bus=self.bus,
+                                       departure_time=start + timedelta(hours=i),
+                                       arrival_time=start + timedelta(hours=i + 3))
+            Booking.objects.create(user=self.user, trip=trip, seat_number=i + 1,
+                                   pickup_point=self.pickup, dropoff_point=self.dropoff)
+
+    def test_trip_list_query_count_does_not_grow_with_trips(self):
+        self._create_trips(2)
+        # trips + route + route points (cache trống) + sơ đồ ghế (gộp cho cả danh sách)
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('trip-list'))
+        self.assertEqual(len(response.data['results']), 2)
+
+        self._create_trips(5)
+        # Tuyến đường đã có trong cache: chỉ còn trips + sơ đồ ghế
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('trip-list'))
+        self.assertEqual(len(response.data['results']), 7)
+
+    def test_route_payload_cache_is_invalidated_on_point_change(self):
+        self._create_trips(1)
+        self.client.get(reverse('trip-list'))
+        RoutePoint.objects.filter(pk=self.dropoff.pk).update(name='Tên cũ trong DB')
+        # update() không bắn signal -> vẫn đọc payload cũ từ cache
+        response = self.client.get(reverse('trip-list'))
+        self.assertEqual(response.data['results'][0]['route']['points'][1]['name'], 'Bến xe Thanh Hóa')
+
+        self.dropoff.name = 'Bến xe phía Nam Thanh Hóa'
+        self.dropoff.save()
+        response = self.client.get(reverse('trip-list'))
+        self.assertEqual(response.data['results'][0]['route']['points'][1]['name'], 'Bến xe phía Nam Thanh Hóa')
+
+    @override_settings(ROUTE_CACHE_TIMEOUT=86400, LOCAL_CACHE_MAX_TTL=30)
+    def test_versioned_cache_ttl_is_capped_for_per_process_cache(self):
+        # LocMemCache: bump_version chỉ thấy được trong process này, payload chỉ được sống LOCAL_CACHE_MAX_TTL
+        self.assertFalse(is_shared_cache())
+        self.assertEqual(versioned_timeout(settings.ROUTE_CACHE_TIMEOUT), 30)
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                                                   'LOCATION': 'redis://127.0.0.1:6379'}}):
+            self.assertTrue(is_shared_cache())
+            self.assertEqual(versioned_timeout(settings.ROUTE_CACHE_TIMEOUT), 86400)
+
+    def test_keyset_pagination_walks_trips_in_departure_order(self):
+        self._create_trips(5)
+        # 2 chuyến trùng giờ khởi hành: thứ tự phụ theo id
+        trip = Trip.objects.order_by('departure_time').first()
+        Trip.objects.create(route=self.route, bus=self.bus, departure_time=trip.departure_time,
+                            arrival_time=trip.arrival_time)
+        expected = list(Trip.objects.order_by('departure_time', 'id').values_list('id', flat=True))
+
+        seen, url = [], reverse('trip-list') + '?page_size=2&seat_map=none'
+        while url:
+            response = self.client.get(url)
+            self.assertLessEqual(len(response.data['results']), 2)
+            seen += [item['id'] for item in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(seen, expected)
+
+    def test_seat_map_marks_booked_seats(self):
+        self._create_trips(1)
+        trip = Trip.objects.get()
+        response = self.client.get(reverse('trip-detail', args=[trip.pk]))
+        seat_map = response.data['seat_map']
+        self.assertEqual(len(seat_map), 40)
+        self.assertFalse(seat_map[0]['is_available'])
+        self.assertTrue(seat_map[1]['is_available'])
+
+    def test_compact_and_none_seat_map_formats(self):
+        self._create_trips(2)
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('trip-list'), {'seat_map': 'compact'})
+        compact = response.data['results'][1]['seat_map']
+        self.assertEqual(compact['total_seats'], 40)
+        self.assertEqual(compact['available_count'], 39)
+        # Ghế số 2 đã đặt -> bit thứ 2 của byte đầu tiên
+        self.assertEqual(compact['occupied'], 'AgAAAAA=')
+
+        # Không yêu cầu sơ đồ ghế -> không query bảng Booking
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('trip-list'), {'seat_map': 'none'})
+        self.assertNotIn('seat_map', response.data['results'][0])
+
+
+class TripSeatInventoryTests(BusBookingTestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _book(self, seat_number):
+        return self.client.post(reverse('booking-create'), {
+            'trip': self.trip.pk, 'seat_number': seat_number,
+            'pickup_point': self.pickup.pk, 'dropoff_point': self.dropoff.pk,
+        })
+
+    def test_booking_claims_seat_and_rejects_double_booking(self):
+        self.assertEqual(self._book(5).status_code, 201)
+        inventory = TripSeatInventory.objects.get(trip=self.trip)
+        self.assertEqual(inventory.available_count, 39)
+        self.assertEqual(inventory.occupied_seats(), {5})
+
+        response = self._book(5)
+        self.assertEqual(response.status_code, 409)
+        self.assertIn('seat_number', response.data)
+        self.assertEqual(response.data['suggested_seats'], [4, 6, 3])
+        self.assertEqual(Booking.objects.filter(trip=self.trip).count(), 1)
+
+    def test_cancel_releases_seat(self):
+        self._book(7)
+        Booking.objects.get(trip=self.trip, seat_number=7).cancel()
+        inventory = TripSeatInventory.objects.get(trip=self.trip)
+        self.assertEqual(inventory.available_count, 40)
+        self.assertEqual(inventory.occupied_seats(), set())
+        self.assertEqual(self._book(7).status_code, 201)
+
+    def test_cancel_after_switching_to_smaller_bus(self):
+        self._book(9)
+        self.trip.bus = Bus.objects.create(LICENSE_PLATE='29B-54321', bus_type='Limousine', total_seats=8)
+        self.trip.save()
+        TripSeatInventory.rebuild(self.trip)
+        booking = Booking.objects.get(trip=self.trip, seat_number=9)
+        with self.assertRaises(ValidationError):
+            booking.full_clean()
+        booking.cancel()
+        self.assertEqual(Booking.objects.get(pk=booking.pk).status, 'CANCELLED')
+        self.assertFalse(SeatClaim.objects.filter(booking=booking).exists())
+
+    def test_deferred_booking_loads_and_cancel_releases_seat(self):
+        self._book(8)
+        booking = Booking.objects.only('id').get(trip=self.trip, seat_number=8)
+        self.assertEqual(booking.status, 'PENDING')
+        Booking.objects.defer('status').get(pk=booking.pk).cancel()
+        self.assertEqual(TripSeatInventory.objects.get(trip=self.trip).occupied_seats(), set())
+
+    def test_admin_reports_taken_seat_as_form_error(self):
+        self._book(5)
+        self.client.force_login(User.objects.create_superuser(username='admin', password='matkhau123'))
+        data = {'user': self.user.pk, 'trip': self.trip.pk, 'pickup_point': self.pickup.pk,
+                'dropoff_point': self.dropoff.pk, 'seat_number': 5, 'status': 'CONFIRMED', 'price_paid': 150000}
+        response = self.client.post(reverse('admin:BusBookingApp_booking_add'), data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['adminform'].form.errors['seat_number'],
+                         ["Ghế số 5 đã có người đặt trên chặng này."])
+        self.assertEqual(Booking.objects.filter(trip=self.trip).count(), 1)
+
+        # Sửa chính vé đang giữ ghế đó thì không tính là trùng
+        booking = Booking.objects.get(trip=self.trip)
+        response = self.client.post(reverse('admin:BusBookingApp_booking_change', args=[booking.pk]), data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Booking.objects.get(pk=booking.pk).status, 'CONFIRMED')
+
+    def test_moving_booking_to_another_trip_moves_its_seat(self):
+        self._book(5)
+        other = self.create_trip(self.trip.departure_time + timedelta(days=1))
+        TripSeatInventory.for_trip(other)
+        booking = Booking.objects.get(trip=self.trip, seat_number=5)
+        booking.trip = other
+        booking.save()
+        self.assertEqual(TripSeatInventory.objects.get(trip=self.trip).occupied_seats(), set())
+        self.assertEqual(TripSeatInventory.objects.get(trip=other).occupied_seats(), {5})
+        self.assertEqual(set(SeatClaim.objects.values_list('trip_id', flat=True)), {other.pk})
+        with self.assertRaises(SeatConflict):
+            Booking.objects.create(user=self.user, trip=other, seat_number=5,
+                                   pickup_point=self.pickup, dropoff_point=self.dropoff)
+        self.assertEqual(self._book(5).status_code, 201)
+
+    @override_settings(DATABASE_ROUTERS=['BusBookingApp.routers.ReadReplicaRouter'])
+    def test_missing_inventory_is_built_from_primary_inside_replica_reads(self):
+        # Không cấu hình alias 'replica': chỉ cần 1 truy vấn dựng sơ đồ ghế đi tới bản sao là lỗi
+        self._book(6)
+        TripSeatInventory.objects.all().delete()
+        with read_from_replica():
+            inventory = TripSeatInventory._build_missing([self.trip])[self.trip.pk]
+        self.assertEqual(inventory.occupied_seats(), {6})
+        self.assertEqual(TripSeatInventory.objects.get(trip=self.trip).occupied_seats(), {6})
+
+    def test_every_delete_path_releases_seat(self):
+        for seat_number in (1, 2, 3):
+            self._book(seat_number)
+        Booking.objects.only('id').get(trip=self.trip, seat_number=1).delete()
+        Booking.objects.filter(trip=self.trip, seat_number=2).delete()
+        staff = User.objects.create_superuser(username='admin', password='matkhau123')
+        self.client.force_login(staff)
+        self.client.post(reverse('admin:BusBookingApp_booking_changelist'), {
+            'action': 'delete_selected', 'post': 'yes',
+            '_selected_action': Booking.objects.filter(trip=self.trip).values_list('pk', flat=True),
+        })
+        self.assertFalse(Booking.objects.filter(trip=self.trip).exists())
+        inventory = TripSeatInventory.objects.get(trip=self.trip)
+        self.assertEqual(inventory.occupied_seats(), set())
+        self.assertEqual(inventory.available_count, 40)
+
+        # Xóa chuyến kéo theo vé và sơ đồ ghế: không dựng lại sơ đồ ghế cho chuyến đã xóa
+        self._book(4)
+        self.trip.delete()
+        self.assertFalse(TripSeatInventory.objects.exists())
+
+
+class SegmentSeatInventoryTests(BusBookingTestCase):
+    route_points = [{'name': 'Bến xe Giáp Bát'}, {'name': 'Ninh Bình'}, {'name': 'Bến xe Thanh Hóa'}]
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.ha_noi, cls.ninh_binh, cls.thanh_hoa = cls.points
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _book(self, seat_number, pickup, dropoff):
+        return self.client.post(reverse('booking-create'), {
+            'trip': self.trip.pk, 'seat_number': seat_number,
+            'pickup_point': pickup.pk, 'dropoff_point': dropoff.pk,
+        })
+
+    def test_seat_is_resold_on_non_overlapping_segment(self):
+        self.assertEqual(self._book(3, self.ha_noi, self.ninh_binh).status_code, 201)
+        self.assertEqual(self._book(3, self.ninh_binh, self.thanh_hoa).status_code, 201)
+        self.assertEqual(self._book(3, self.ha_noi, self.thanh_hoa).status_code, 409)
+        inventory = TripSeatInventory.objects.get(trip=self.trip)
+        self.assertEqual(inventory.available_count, 39)
+
+        Booking.objects.get(trip=self.trip, pickup_point=self.ha_noi).cancel()
+        inventory.refresh_from_db()
+        self.assertEqual(inventory.free_seats(0, 1), set(range(1, 41)))
+        self.assertNotIn(3, inventory.free_seats(1, 2))
+        self.assertEqual(inventory.available_count, 39)
+
+    def test_seat_map_for_segment(self):
+        self._book(3, self.ha_noi, self.ninh_binh)
+        url = reverse('trip-detail', args=[self.trip.pk])
+        whole_route = self.client.get(url).data['seat_map']
+        self.assertFalse(whole_route[2]['is_available'])
+        segment = self.client.get(url, {'pickup': self.ninh_binh.pk, 'dropoff': self.thanh_hoa.pk}).data['seat_map']
+        self.assertTrue(segment[2]['is_available'])
+
+    def test_find_double_bookings_reports_every_overlapping_pair(self):
+        # bulk_create bỏ qua sơ đồ ghế và SeatClaim: dựng thẳng dữ liệu hỏng
+        bookings = Booking.objects.bulk_create([
+            Booking(user=self.user, trip=self.trip, seat_number=1, pickup_point=pickup, dropoff_point=dropoff,
+                    price_paid=0)
+            for pickup, dropoff in [(self.ha_noi, self.thanh_hoa), (self.ha_noi, self.ninh_binh),
+                                    (self.ha_noi, self.thanh_hoa)]
+        ])
+        pairs = {frozenset(item['bookings']) for item in find_double_bookings([self.trip.pk])}
+        first, second, third = (booking.pk for booking in bookings)
+        self.assertEqual(pairs, {frozenset({first, second}), frozenset({first, third}), frozenset({second, third})})
+
+    def test_only_point_order_changes_reset_seat_inventory(self):
+        self._book(3, self.ha_noi, self.ninh_binh)
+        point = RoutePoint.objects.get(pk=self.ninh_binh.pk)
+        point.surcharge = 10000
+        point.save()
+        self.assertTrue(TripSeatInventory.objects.filter(trip=self.trip).exists())
+
+        RoutePoint.objects.create(route=self.route, name='Sầm Sơn', order=3)
+        self.assertFalse(TripSeatInventory.objects.filter(trip=self.trip).exists())
+        self.assertEqual(TripSeatInventory.for_trip(self.trip).segment_count, 3)
+
+    def test_seat_claims_block_double_booking_when_inventory_is_stale(self):
+        self.assertEqual(self._book(3, self.ha_noi, self.thanh_hoa).status_code, 201)
+        # Sơ đồ ghế bị ghi sai (vd. dựng từ dữ liệu cũ): ghế 3 hiện là trống
+        TripSeatInventory.objects.filter(trip=self.trip).update(occupancy='0' * 80, available_count=40)
+        self.assertEqual(self._book(3, self.ninh_binh, self.thanh_hoa).status_code, 409)
+        self.assertEqual(Booking.objects.filter(trip=self.trip).count(), 1)
+
+        Booking.objects.get(trip=self.trip).cancel()
+        self.assertEqual(TripSeatInventory.rebuild(self.trip).occupied_seats(), set())
+        self.assertEqual(self._book(3, self.ninh_binh, self.thanh_hoa).status_code, 201)
+
+
+@override_settings(TRIP_RESPONSE_CACHE_TTL=0)
+class TripSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.bus = Bus.objects.create(LICENSE_PLATE='29B-12345', bus_type='Giường nằm', total_seats=40)
+        cls.route = Route.objects.create(origin='Hà Nội', destination='Đà Nẵng',
+                                         base_price=400000, duration_hours=14)
+        other = Route.objects.create(origin='Hải Phòng', destination='Hà Nội', base_price=100000, duration_hours=2)
+        day = timezone.make_aware(datetime(2030, 5, 1))
+        cls.trip = Trip.objects.create(route=cls.route, bus=cls.bus, departure_time=day,
+                                       arrival_time=day + timedelta(hours=14))
+        Trip.objects.create(route=cls.route, bus=cls.bus, departure_time=day + timedelta(days=1),
+                            arrival_time=day + timedelta(days=1, hours=14))
+        Trip.objects.create(route=other, bus=cls.bus, departure_time=day, arrival_time=day + timedelta(hours=2))
+
+    def _search(self, **params):
+        response = APIClient().get(reverse('trip-list'), {**params, 'seat_map': 'none'})
+        return [item['id'] for item in response.data['results']]
+
+    def test_search_is_accent_and_case_insensitive(self):
+        self.assertEqual(self.route.origin_key, 'ha noi')
+        self.assertEqual(self.route.destination_key, 'da nang')
+        self.assertEqual(self._search(origin='ha noi', destination='DA NANG', date='2030-05-01'), [self.trip.pk])
+        self.assertEqual(self._search(origin='Hà', destination='Đà', date='2030-05-01'), [self.trip.pk])
+
+    def test_date_filter_is_half_open_day_range(self):
+        self.assertEqual(len(self._search(date='2030-05-01')), 2)
+        self.assertEqual(len(self._search(date='2030-05-02')), 1)
+
+    def test_intermediate_stops_resolve_in_route_order(self):
+        RoutePoint.objects.create(route=self.route, name='Bến xe Giáp Bát', order=0)
+        RoutePoint.objects.create(route=self.route, name='Ninh Bình', order=1)
+        RoutePoint.objects.create(route=self.route, name='Bến xe Đà Nẵng', order=2)
+        self.assertEqual(self._search(origin='ninh binh', destination='da nang', date='2030-05-01'),
+                         [self.trip.pk])
+        self.assertEqual(self._search(origin='Giáp Bát', destination='Ninh Bình', date='2030-05-01'),
+                         [self.trip.pk])
+        # Ngược chiều lộ trình thì không khớp
+        self.assertEqual(self._search(origin='da nang', destination='ninh binh'), [])
+
+    def test_one_sided_search_excludes_route_ends(self):
+        # Tuyến Hà Nội -> Đà Nẵng: điểm cuối (Đà Nẵng) không phải điểm đi, điểm đầu (Hà Nội) không phải điểm đến
+        self.assertEqual(self._search(origin='Đà Nẵng'), [])
+        self.assertEqual(self._search(destination='Hải Phòng'), [])
+        self.assertEqual(len(self._search(origin='Hà Nội')), 2)
+        # Hà Nội chỉ là điểm đến của tuyến Hải Phòng -> Hà Nội
+        hai_phong = Trip.objects.get(route__origin='Hải Phòng')
+        self.assertEqual(self._search(destination='Hà Nội'), [hai_phong.pk])
+        self.assertEqual(self._search(origin='Hải Phòng'), [hai_phong.pk])
+
+    def test_place_autocomplete(self):
+        RoutePoint.objects.create(route=self.route, name='Bến xe Mỹ Đình', order=0)
+        response = APIClient().get(reverse('place-autocomplete'), {'q': 'my dinh'})
+        self.assertEqual([item['name'] for item in response.data], ['Bến xe Mỹ Đình'])
+        response = APIClient().get(reverse('place-autocomplete'), {'q': 'HA'})
+        self.assertEqual([item['name'] for item in response.data], ['Hà Nội', 'Hải Phòng'])
+
+
+class TripResponseCacheTests(BusBookingTestCase):
+    @classmethod
+    def trip_departure(cls):
+        return timezone.make_aware(datetime(2030, 5, 1, 8))
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_anonymous_search_is_cached_and_supports_etag(self):
+        url = reverse('trip-list')
+        response = self.client.get(url, {'date': '2030-05-01'})
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            cached = self.client.get(url, {'date': '2030-05-01'})
+        self.assertEqual(cached.data, response.data)
+        with self.assertNumQueries(0):
+            not_modified = self.client.get(url, {'date': '2030-05-01'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_booking_invalidates_cached_responses(self):
+        list_url, detail_url = reverse('trip-list'), reverse('trip-detail', args=[self.trip.pk])
+        etag = self.client.get(list_url, {'date': '2030-05-01'})['ETag']
+        detail_etag = self.client.get(detail_url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.create(user=self.user, trip=self.trip, seat_number=1,
+                                   pickup_point=self.pickup, dropoff_point=self.dropoff)
+        response = self.client.get(list_url, {'date': '2030-05-01'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data['results'][0]['seat_map'][0]['is_available'])
+        self.assertNotEqual(self.client.get(detail_url)['ETag'], detail_etag)
+
+
+    def test_bulk_booking_delete_invalidates_date_search(self):
+        booking = Booking.objects.create(user=self.user, trip=self.trip, seat_number=1,
+                                         pickup_point=self.pickup, dropoff_point=self.dropoff)
+        url = reverse('trip-list')
+        etag = self.client.get(url, {'date': '2030-05-01'})['ETag']
+        all_etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.filter(pk=booking.pk).delete()
+        response = self.client.get(url, {'date': '2030-05-01'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['results'][0]['seat_map'][0]['is_available'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=all_etag).status_code, 200)
+
+class AsyncTripViewTests(BusBookingTestCase):
+    @classmethod
+    def trip_departure(cls):
+        return None
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        start = timezone.make_aware(datetime(2030, 5, 1, 8))
+        for i in range(3):
+            trip = cls.create_trip(start + timedelta(hours=i))
+            Booking.objects.create(user=cls.user, trip=trip, seat_number=i + 1,
+                                   pickup_point=cls.pickup, dropoff_point=cls.dropoff)
+        cls.trip = trip
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(TRIP_RESPONSE_CACHE_TTL=0)
+    def test_async_views_match_sync_views(self):
+        params = {'origin': 'ha noi', 'date': '2030-05-01', 'page_size': 2, 'seat_map': 'compact'}
+        expected = APIClient().get(reverse('trip-list'), params).json()
+        response = async_to_sync(self.async_client.get)(reverse('trip-list-async'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], expected['results'])
+        self.assertEqual(len(response.json()['results']), 2)
+        self.assertIsNotNone(response.json()['next'])
+
+        expected = APIClient().get(reverse('trip-detail', args=[self.trip.pk])).json()
+        response = async_to_sync(self.async_client.get)(reverse('trip-detail-async', args=[self.trip.pk]))
+        self.assertEqual(response.json(), expected)
+        response = async_to_sync(self.async_client.get)(reverse('trip-detail-async', args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_async_list_uses_response_cache_and_etag(self):
+        url = reverse('trip-list-async')
+        response = async_to_sync(self.async_client.get)(url, {'date': '2030-05-01'})
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            not_modified = async_to_sync(self.async_client.get)(url, {'date': '2030-05-01'},
+                                                                headers={'If-None-Match': etag})
+        self.assertEqual(not_modified.status_code, 304)
+        # Cùng key cache với bản sync
+        self.assertEqual(APIClient().get(reverse('trip-list'), {'date': '2030-05-01'})['ETag'], etag)
+
+    def test_jwt_cookie_user_bypasses_anonymous_cache(self):
+        url = reverse('trip-list-async')
+        async_to_sync(self.async_client.get)(url, {'date': '2030-05-01'})
+        self.async_client.cookies[settings.REST_AUTH['JWT_AUTH_COOKIE']] = str(AccessToken.for_user(self.user))
+        with CaptureQueriesContext(connection) as queries:
+            response = async_to_sync(self.async_client.get)(url, {'date': '2030-05-01'})
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(len(queries), 0)
+
+
+class SeatEventStreamTests(BusBookingTestCase):
+    destination = 'Vinh'
+    duration_hours = 6
+    route_points = [{'name': 'Giáp Bát'}, {'name': 'Thanh Hóa'}, {'name': 'Vinh'}]
+
+    def _book(self, seat_number, pickup, dropoff):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Booking.objects.create(user=self.user, trip=Trip.objects.get(pk=self.trip.pk),
+                                          seat_number=seat_number, pickup_point=pickup, dropoff_point=dropoff)
+
+    def _cancel(self, booking):
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.cancel()
+
+    @staticmethod
+    def _parse(chunk):
+        chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+        name, data = chunk.strip().split('\n')
+        return name.removeprefix('event: '), json.loads(data.removeprefix('data: '))
+
+    def test_stream_sends_snapshot_then_deltas_for_watched_segment(self):
+        first_leg = self._book(1, self.points[0], self.points[1])
+        url = reverse('trip-seat-events', args=[self.trip.pk])
+
+        async def scenario():
+            # Khách theo dõi chặng Thanh Hóa -> Vinh
+            response = await self.async_client.get(url, {'pickup': self.points[1].pk, 'dropoff': self.points[2].pk})
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            stream = aiter(response.streaming_content)
+            events = [self._parse(await anext(stream))]
+            await sync_to_async(self._book)(2, self.points[0], self.points[2])
+            # Ghế 1 chỉ đổi trên chặng đầu: không có gì để báo cho chặng sau
+            await sync_to_async(self._cancel)(first_leg)
+            await sync_to_async(self._book)(3, self.points[1], self.points[2])
+            events += [self._parse(await anext(stream)) for _ in range(2)]
+            # Như khi client ngắt kết nối: đóng generator gốc để hủy đăng ký nghe
+            await response._iterator.aclose()
+            return events
+
+        (name, snapshot), seats_2, seats_3 = async_to_sync(scenario)()
+        self.assertEqual((name, snapshot['available_count']), ('snapshot', 40))
+        self.assertEqual(seats_2, ('seats', {'available_count': 39,
+                                             'seats': [{'seat_number': 2, 'is_available': False}]}))
+        self.assertEqual(seats_3[1]['seats'], [{'seat_number': 3, 'is_available': False}])
+        self.assertFalse(get_broadcaster().has_subscribers(self.trip.pk))
+
+
+class ReadReplicaRouterTests(SimpleTestCase):
+    def test_only_app_reads_inside_replica_views_go_to_replica(self):
+        router = ReadReplicaRouter()
+        self.assertIsNone(router.db_for_read(Trip))
+        with read_from_replica():
+            self.assertEqual(router.db_for_read(Trip), 'replica')
+            self.assertIsNone(router.db_for_read(User))
+            self.assertEqual(router.db_for_write(Booking), 'default')
+        self.assertIsNone(router.db_for_read(Trip))
+        self.assertFalse(router.allow_migrate('replica', 'BusBookingApp'))
+
+    def test_trip_views_are_wrapped_for_replica_reads(self):
+        seen = []
+        view = replica_reads(lambda request: seen.append(ReadReplicaRouter().db_for_read(Trip)))
+        view(None)
+        self.assertEqual(seen, ['replica'])
+        self.assertTrue(TripListView.as_view().csrf_exempt)
+
+
+@override_settings(MIDDLEWARE=['BusBookingApp.middleware.RequestMetricsMiddleware', *settings.MIDDLEWARE],
+                   TRIP_RESPONSE_CACHE_TTL=0)
+class RequestMetricsTests(BusBookingTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.staff = User.objects.create_user(username='quantri', password='matkhau123', is_staff=True)
+
+    def setUp(self):
+        cache.clear()
+        metrics_registry.reset()
+
+    def test_records_per_endpoint_stats_and_server_timing(self):
+        response = self.client.get(reverse('trip-list'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", serializer;dur=[\d.]+, total')
+        self.client.get(reverse('trip-detail', args=[self.trip.pk]))
+
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        self.client.force_login(self.staff)
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('busbooking_requests_total{endpoint="trip-list"} 1', body)
+        self.assertIn('busbooking_requests_total{endpoint="trip-detail"} 1', body)
+        queries = response['Server-Timing'].split('"')[1].split()[0]
+        self.assertIn(f'busbooking_request_db_queries{{endpoint="trip-list",quantile="0.99"}} {queries}', body)
+        self.assertIn('busbooking_response_bytes_count{endpoint="trip-list"} 1', body)
+
+    def test_percentile_uses_nearest_rank(self):
+        samples = [5, 1, 4, 2, 3, 10, 9, 8, 7, 6]
+        self.assertEqual([percentile(samples, q) for q in (0, 0.5, 0.9, 0.95, 0.99, 1)], [1, 5, 9, 10, 10, 10])
+        self.assertEqual(percentile([7], 0.5), 7)
+
+
+class SyntheticTimetableTests(TestCase):
+    def test_generator_builds_consistent_timetable(self):
+        counts = generate_timetable(buses=3, routes=2, points_per_route=3, days=2, trips_per_day=4,
+                                    fill=0.25, seats_per_bus=8, seed=7)
+        self.assertEqual(counts, {'buses': 3, 'routes': 2, 'route_points': 6, 'trips': 8, 'bookings': 16})
+        route = Route.objects.first()
+        self.assertEqual(route.origin_key, fold_place_name(route.origin))
+        self.assertTrue(route.stops.exists())
+        # Sơ đồ ghế dựng sẵn khớp với sơ đồ dựng lại từ Booking
+        for inventory in TripSeatInventory.objects.select_related('trip__bus'):
+            self.assertEqual(inventory.occupancy, TripSeatInventory.rebuild(inventory.trip).occupancy)
+        response = APIClient().get(reverse('trip-list'), {'origin': route.origin})
+        self.assertEqual(len(response.data['results']), 4)
+
+
+class BookingQueryCountTests(BusBookingTestCase):
+    route_points = [{'name': 'Bến xe Giáp Bát', 'surcharge': 20000}, {'name': 'Bến xe Thanh Hóa'}]
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        TripSeatInventory.for_trip(cls.trip)
+
+    def test_booking_query_count_is_pinned(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        # trip (+ route, bus, sơ đồ ghế) + điểm đón + điểm trả
+        # + SAVEPOINT / UPDATE giữ ghế / INSERT vé / INSERT SeatClaim / RELEASE SAVEPOINT
+        with self.assertNumQueries(8):
+            response = client.post(reverse('booking-create'), {
+                'trip': self.trip.pk, 'seat_number': 1,
+                'pickup_point': self.pickup.pk, 'dropoff_point': self.dropoff.pk,
+            })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['data']['price_paid'], '170000')
+
+
+class FareTests(BusBookingTestCase):
+    total_seats = 4
+    route_points = [
+        {'name': 'Bến xe Giáp Bát', 'surcharge': 20000},
+        {'name': 'Phủ Lý'},
+        {'name': 'Bến xe Thanh Hóa', 'surcharge': 15000},
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for seat_number in (1, 2, 3):
+            Booking.objects.create(user=cls.user, trip=cls.trip, seat_number=seat_number,
+                                   pickup_point=cls.points[0], dropoff_point=cls.points[2])
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_trip_embeds_fare_matrix(self):
+        data = self.client.get(reverse('trip-detail', args=[self.trip.pk]), {'seat_map': 'none'}).data
+        self.assertEqual(data['route']['fare_matrix'], {
+            'points': [point.pk for point in self.points],
+            'fares': [[170000, 185000], [165000]],
+        })
+        self.assertEqual(data['fare_multiplier'], '1')
+        self.assertEqual(data['fares'], [[170000, 185000], [165000]])
+
+    @override_settings(FARE_OCCUPANCY_MULTIPLIERS=[(0.5, '1.1'), (0.9, '1.2')])
+    def test_occupancy_multiplier_applies_to_trip_fares_and_booking_price(self):
+        # 3/4 ghế đã bán trên toàn tuyến: hệ số 1.1, làm tròn tới 1000 đồng
+        data = self.client.get(reverse('trip-detail', args=[self.trip.pk]), {'seat_map': 'none'}).data
+        self.assertEqual(data['fare_multiplier'], '1.1')
+        self.assertEqual(data['fares'], [[187000, 204000], [182000]])
+        with self.assertNumQueries(8):
+            response = self.client.post(reverse('booking-create'), {
+                'trip': self.trip.pk, 'seat_number': 4,
+                'pickup_point': self.points[0].pk, 'dropoff_point': self.points[2].pk,
+            })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['data']['price_paid'], '204000')
+
+
+class GroupBookingTests(BusBookingTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        TripSeatInventory.for_trip(cls.trip)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _book_group(self, seats):
+        return self.client.post(reverse('booking-group-create'), {
+            'trip': self.trip.pk, 'seats': seats,
+            'pickup_point': self.pickup.pk, 'dropoff_point': self.dropoff.pk,
+        }, format='json')
+
+    def test_group_booking_query_count_does_not_depend_on_seat_count(self):
+        with self.assertNumQueries(8):
+            response = self._book_group([1, 2])
+        self.assertEqual(response.status_code, 201)
+        with self.assertNumQueries(8):
+            response = self._book_group([3, 4, 5, 6, 7])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['data']), 5)
+        self.assertTrue(all(item['id'] for item in response.data['data']))
+        inventory = TripSeatInventory.objects.get(trip=self.trip)
+        self.assertEqual(inventory.available_count, 33)
+        self.assertEqual(inventory.occupied_seats(), set(range(1, 8)))
+
+    def test_group_booking_is_all_or_nothing_with_per_seat_errors(self):
+        self._book_group([2])
+        response = self._book_group([1, 2, 41])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data['seats']), {'2', '41'})
+        self.assertEqual(Booking.objects.filter(trip=self.trip).count(), 1)
+        self.assertEqual(TripSeatInventory.objects.get(trip=self.trip).occupied_seats(), {2})
+
+    def test_group_booking_conflict_suggests_nearest_free_seats(self):
+        self._book_group([2, 3])
+        response = self._book_group([1, 2])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(set(response.data['seats']), {'2'})
+        self.assertEqual(response.data['suggested_seats'], [4, 5, 6])
+
+    def test_conflict_lost_at_claim_time_is_409(self):
+        # Ghế còn trống lúc validate nhưng bị giữ trước khi claim (2 request song song)
+        stale_trip = Trip.objects.select_related('route', 'bus', 'seat_inventory').get(pk=self.trip.pk)
+        Booking.book_seats(self.user, Trip.objects.get(pk=self.trip.pk), self.pickup, self.dropoff, [5])
+        with self.assertRaises(SeatConflict) as caught:
+            Booking.book_seats(self.user, stale_trip, self.pickup, self.dropoff, [5, 6])
+        self.assertEqual(set(caught.exception.errors['seats']), {'5'})
+        self.assertEqual(caught.exception.suggested_seats, [4, 3, 7])
+
+
+class ExpiringHoldTests(BusBookingTestCase):
+    def _hold(self, seat_number, expired=False):
+        # Mỗi lần đặt nạp lại chuyến như 1 request mới (không dùng sơ đồ ghế cache trên instance cũ)
+        booking = Booking.objects.create(user=self.user, trip=Trip.objects.get(pk=self.trip.pk),
+                                         seat_number=seat_number,
+                                         pickup_point=self.pickup, dropoff_point=self.dropoff)
+        if expired:
+            Booking.objects.filter(pk=booking.pk).update(hold_expires_at=timezone.now() - timedelta(minutes=1))
+            TripSeatInventory.refresh_next_hold_expiry([self.trip.pk])
+        return booking
+
+    def test_pending_booking_gets_hold_expiry(self):
+        booking = self._hold(1)
+        self.assertIsNotNone(booking.hold_expires_at)
+        booking.status = 'CONFIRMED'
+        booking.save()
+        booking.refresh_from_db()
+        self.assertIsNone(booking.hold_expires_at)
+
+    def test_confirm_and_cancel_refresh_next_hold_expiry(self):
+        first, second = self._hold(1), self._hold(2)
+        first.status = 'CONFIRMED'
+        first.save()
+        self.assertEqual(TripSeatInventory.objects.get(trip=self.trip).next_hold_expiry, second.hold_expires_at)
+        Booking.objects.get(pk=second.pk).cancel()
+        self.assertIsNone(TripSeatInventory.objects.get(trip=self.trip).next_hold_expiry)
+        # Sau hạn giữ chỗ cũ, đọc sơ đồ ghế vẫn chỉ 1 query (không phải che vé quá hạn)
+        trip = Trip.objects.select_related('bus').get()
+        with mock.patch('django.utils.timezone.now', return_value=second.hold_expires_at + timedelta(minutes=1)), \
+                self.assertNumQueries(1):
+            load_seat_inventories([trip])
+
+    def test_expired_hold_is_ignored_on_read_without_writes(self):
+        self._hold(1, expired=True)
+        self._hold(2)
+        trip = Trip.objects.select_related('bus').get()
+        inventory = TripSeatInventory.for_trips([trip], ignore_expired_holds=True)[trip.pk]
+        self.assertEqual(inventory.occupied_seats(), {2})
+        self.assertEqual(TripSeatInventory.objects.get(trip=trip).occupied_seats(), {1, 2})
+        self.assertEqual(Booking.objects.filter(status='PENDING').count(), 2)
+
+    def test_reaper_cancels_expired_holds_and_frees_seats(self):
+        expired = self._hold(1, expired=True)
+        self._hold(2)
+        self.assertEqual(Booking.release_expired_holds(batch_size=10), 1)
+        expired.refresh_from_db()
+        self.assertEqual(expired.status, 'CANCELLED')
+        inventory = TripSeatInventory.objects.get(trip=self.trip)
+        self.assertEqual(inventory.occupied_seats(), {2})
+        self.assertEqual(inventory.available_count, 39)
+        self.assertFalse(inventory.has_expired_holds())
+        self.assertEqual(Booking.release_expired_holds(batch_size=10), 0)
+
+    def test_expired_hold_does_not_block_new_booking(self):
+        self._hold(1, expired=True)
+        self._hold(1)
+        self.assertEqual(Booking.objects.filter(seat_number=1, status='PENDING').count(), 1)
+
+
+class TripScheduleTests(BusBookingTestCase):
+    route_points = []
+
+    @classmethod
+    def trip_departure(cls):
+        return None
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # 2030-05-06 là Thứ 2
+        cls.monday = date(2030, 5, 6)
+
+    def _schedule(self, **kwargs):
+        return TripSchedule.objects.create(**{
+            'route': self.route, 'bus': self.bus, 'days_of_week': '024',
+            'departure_times': '06:00, 13:30', 'valid_from': self.monday, **kwargs,
+        })
+
+    def test_expands_weekdays_and_times_and_skips_existing(self):
+        self._schedule()
+        end = self.monday + timedelta(days=6)
+        with self.assertNumQueries(5):  # lịch + chuyến đã có + 1 lô bulk_create + savepoint/release
+            result = generate_trips(self.monday, end)
+        self.assertEqual(result['created'], 6)
+        first = Trip.objects.order_by('departure_time').first()
+        self.assertEqual(timezone.localtime(first.departure_time).time(), time(6))
+        self.assertEqual(first.arrival_time - first.departure_time, timedelta(hours=3))
+        self.assertEqual({timezone.localtime(trip.departure_time).weekday() for trip in Trip.objects.all()},
+                         {0, 2, 4})
+
+        result = generate_trips(self.monday, end)
+        self.assertEqual((result['created'], result['existing']), (0, 6))
+        self.assertEqual(Trip.objects.count(), 6)
+
+    def test_bus_double_assignment_is_skipped(self):
+        departure_time = timezone.make_aware(datetime.combine(self.monday, time(7)))
+        Trip.objects.create(route=self.route, bus=self.bus, departure_time=departure_time,
+                            arrival_time=departure_time + timedelta(hours=3))
+        # 06:00 chồng với chuyến 07:00-10:00 đã có; 13:30 chồng với 13:00-16:00 của lịch kia
+        self._schedule(days_of_week='0', departure_times='06:00,10:00')
+        self._schedule(days_of_week='0', departure_times='13:00,13:30')
+        result = generate_trips(self.monday, self.monday)
+        self.assertEqual(result['created'], 2)
+        self.assertEqual(sorted(timezone.localtime(departure).strftime('%H:%M')
+                                for _, departure in result['bus_conflicts']), ['06:00', '13:30'])
+        self.assertEqual(sorted(timezone.localtime(trip.departure_time).strftime('%H:%M')
+                                for trip in Trip.objects.all()), ['07:00', '10:00', '13:00'])
+
+    def test_existing_trip_departing_inside_candidate_run_is_a_conflict(self):
+        # Chuyến 06:00-12:00 mới với chuyến 08:00 đã có của cùng xe
+        long_route = Route.objects.create(origin='Hà Nội', destination='Vinh', base_price=250000, duration_hours=6)
+        departure_time = timezone.make_aware(datetime.combine(self.monday, time(8)))
+        Trip.objects.create(route=self.route, bus=self.bus, departure_time=departure_time,
+                            arrival_time=departure_time + timedelta(hours=3))
+        self._schedule(route=long_route, days_of_week='0', departure_times='06:00')
+        result = generate_trips(self.monday, self.monday)
+        self.assertEqual((result['created'], len(result['bus_conflicts'])), (0, 1))
+
+    def test_trip_right_after_existing_trip_is_kept_when_longer_candidate_is_dropped(self):
+        # Chuyến mới 06:00-12:00 bị bỏ vì chuyến 08:00-11:00 đã có; chuyến mới 11:00 nối ngay sau vẫn được sinh
+        long_route = Route.objects.create(origin='Hà Nội', destination='Vinh', base_price=250000, duration_hours=6)
+        departure_time = timezone.make_aware(datetime.combine(self.monday, time(8)))
+        Trip.objects.create(route=self.route, bus=self.bus, departure_time=departure_time,
+                            arrival_time=departure_time + timedelta(hours=3))
+        self._schedule(route=long_route, days_of_week='0', departure_times='06:00')
+        self._schedule(days_of_week='0', departure_times='11:00')
+        result = generate_trips(self.monday, self.monday)
+        self.assertEqual([timezone.localtime(departure).strftime('%H:%M') for _, departure in result['bus_conflicts']],
+                         ['06:00'])
+        self.assertEqual(sorted(timezone.localtime(trip.departure_time).strftime('%H:%M')
+                                for trip in Trip.objects.all()), ['08:00', '11:00'])
+
+    def test_earlier_trip_longer_than_every_candidate_is_a_conflict(self):
+        # Chuyến 20:00 hôm trước chạy 14 tiếng (tới 10:00) dài hơn mọi chuyến mới (3 tiếng)
+        departure_time = timezone.make_aware(datetime.combine(self.monday - timedelta(days=1), time(20)))
+        Trip.objects.create(route=self.route, bus=self.bus, departure_time=departure_time,
+                            arrival_time=departure_time + timedelta(hours=14))
+        self._schedule(days_of_week='0', departure_times='06:00,13:30')
+        result = generate_trips(self.monday, self.monday)
+        self.assertEqual(result['created'], 1)
+        self.assertEqual([timezone.localtime(departure).strftime('%H:%M') for _, departure in result['bus_conflicts']],
+                         ['06:00'])
+
+
+class AdminChangeListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='admin', password='matkhau123')
+        generate_timetable(buses=2, routes=2, points_per_route=3, days=1, trips_per_day=2, fill=0.1,
+                           seats_per_bus=20, seed=1)
+
+    def _changelist_queries(self, model):
+        self.client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(reverse(f'admin:BusBookingApp_{model}_changelist'))
+        self.assertEqual(response.status_code, 200)
+        return len(captured)
+
+    def test_changelist_query_count_does_not_depend_on_rows(self):
+        models = ('booking', 'trip')
+        before = [self._changelist_queries(model) for model in models]
+        generate_timetable(buses=2, routes=2, points_per_route=3, days=1, trips_per_day=4, fill=0.5,
+                           seats_per_bus=20, seed=2)
+        self.assertEqual([self._changelist_queries(model) for model in models], before)
+
+    def test_route_search_matches_whole_folded_place_name(self):
+        route = Route.objects.create(origin='Hà Nội', destination='Đà Nẵng', base_price=400000, duration_hours=14)
+        from_ha_noi = set(Route.objects.filter(origin='Hà Nội'))
+        self.assertGreater(len(from_ha_noi), 1)
+        self.client.force_login(self.admin)
+        for term, expected in [('Hà Nội', from_ha_noi), ('ha noi', from_ha_noi), ('Đà Nẵng', {route}),
+                               ('đà', {route}), ('Nẵng', set())]:
+            response = self.client.get(reverse('admin:BusBookingApp_route_changelist'), {'q': term})
+            self.assertEqual(set(response.context['cl'].result_list), expected, term)
+        response = self.client.get(reverse('admin:autocomplete'), {
+            'term': 'Đà Nẵng', 'app_label': 'BusBookingApp', 'model_name': 'trip', 'field_name': 'route',
+        })
+        self.assertEqual([item['id'] for item in response.json()['results']], [str(route.pk)])
+
+    def test_estimated_count_paginator_caps_filtered_count(self):
+        paginator = EstimatedCountPaginator(Booking.objects.filter(status='CONFIRMED').order_by('pk'), 2)
+        paginator.count_limit = 3
+        self.assertEqual(paginator.count, 3)
+        self.assertEqual(paginator.num_pages, 2)
+
+
+class CachedJWTAuthenticationTests(BusBookingTestCase):
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        self.client = APIClient()
+        self.client.cookies[settings.REST_AUTH['JWT_AUTH_COOKIE']] = str(AccessToken.for_user(self.user))
+
+    def _book(self, seat_number):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.post(reverse('booking-create'), {
+                'trip': self.trip.pk, 'seat_number': seat_number,
+                'pickup_point': self.pickup.pk, 'dropoff_point': self.dropoff.pk,
+            })
+        user_queries = [query for query in captured if 'auth_user' in query['sql'] and 'SELECT' in query['sql']]
+        return response, len(user_queries)
+
+    def test_user_is_loaded_once_then_served_from_cache(self):
+        response, user_queries = self._book(1)
+        self.assertEqual((response.status_code, user_queries), (201, 1))
+        response, user_queries = self._book(2)
+        self.assertEqual((response.status_code, user_queries), (201, 0))
+        self.assertEqual(Booking.objects.get(seat_number=2).user, self.user)
+
+    def test_user_save_and_logout_invalidate_cached_user(self):
+        self._book(1)
+        user_logged_out.send(sender=User, request=None, user=self.user)
+        self.assertEqual(self._book(2)[1], 1)
+
+        self.user.is_active = False
+        self.user.save()
+        response, user_queries = self._book(3)
+        self.assertEqual((response.status_code, user_queries), (401, 1))
+
+    @override_settings(AUTH_USER_CACHE_TTL=600, LOCAL_CACHE_MAX_TTL=30)
+    def test_local_cache_caps_cached_user_ttl(self):
+        # LocMemCache: user bị khóa ở worker khác không làm đổi phiên bản ở đây -> chỉ dựa vào TTL
+        self._book(1)
+        with mock.patch('BusBookingApp.authentication.time.monotonic', return_value=monotonic() + 31):
+            self.assertEqual(self._book(2)[1], 1)
+
+
+class BookingExportTests(BusBookingTestCase):
+    route_points = [{'name': 'Bến xe Giáp Bát'}, {'name': 'Ninh Bình'}, {'name': 'Bến xe Thanh Hóa'}]
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.staff = User.objects.create_user(username='dieuphoi', password='matkhau123', is_staff=True)
+        cls.ha_noi, cls.ninh_binh, cls.thanh_hoa = cls.points
+        for seat_number, pickup in [(1, cls.ninh_binh), (2, cls.ha_noi), (3, cls.ninh_binh)]:
+            Booking.objects.create(user=cls.user, trip=cls.trip, seat_number=seat_number,
+                                   pickup_point=pickup, dropoff_point=cls.thanh_hoa)
+        Booking.objects.get(seat_number=3).cancel()
+
+    def _get(self, url, params=None):
+        self.client.force_login(self.staff)
+        response = self.client.get(url, params)
+        return response, b''.join(response.streaming_content).decode('utf-8-sig')
+
+    def test_manifest_is_streamed_in_pickup_order_for_staff_only(self):
+        url = reverse('trip-manifest', args=[self.trip.pk])
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        response, body = self._get(url)
+        self.assertTrue(response.streaming)
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual([(row['seat_number'], row['pickup_point']) for row in rows],
+                         [('2', 'Bến xe Giáp Bát'), ('1', 'Ninh Bình')])
+        self.assertEqual(rows[0]['email'], 'khach@example.com')
+
+    def test_daily_export_as_ndjson_and_command(self):
+        today = timezone.localdate().isoformat()
+        response, body = self._get(reverse('booking-export'), {'date': today, 'output': 'ndjson'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['seat_number'] for row in rows], [1, 2, 3])
+        self.assertEqual(rows[2]['status'], 'CANCELLED')
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(reverse('booking-export'), {'date': 'hôm qua'}).status_code, 400)
+
+        out = io.StringIO()
+        call_command('export_bookings', '--date', today, '--format', 'ndjson', stdout=out)
+        self.assertEqual(out.getvalue(), body)
+
+
+class StartupTests(TestCase):
+    def test_social_login_and_schema_modules_are_not_imported_at_startup(self):
+        code = ("import sys, django; django.setup(); import BusBookingProject.urls; from django.urls import reverse; "
+                "reverse('google_login'); reverse('rest_register'); "
+                "print(' '.join(sorted(m for m in sys.modules if m in ('BusBookingApp.social', "
+                "'BusBookingApp.schema', 'dj_rest_auth.registration.views') or m.startswith('drf_spectacular.'))))")
+        proc = subprocess.run([sys.executable, '-c', code], cwd=settings.BASE_DIR, capture_output=True, text=True,
+                              env={**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE})
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+        # drf_spectacular là app trong INSTALLED_APPS: apps.ready() chỉ nạp các system check của nó
+        self.assertEqual(proc.stdout.split(), ['drf_spectacular.apps', 'drf_spectacular.checks'])
+
+    def test_lazy_auth_views_dispatch_on_first_request(self):
+        response = APIClient().post(reverse('rest_register'), {'username': 'khach'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password1', response.data)
+
+    def test_schema_is_served_from_built_file(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(OPENAPI_SCHEMA_FILE=Path(directory) / 'schema.yaml'):
+            call_command('build_schema', stdout=io.StringIO(), stderr=io.StringIO())
+            call_command('build_schema', '--check', stdout=io.StringIO(), stderr=io.StringIO())
+
+            with self.assertNumQueries(0):
+                response = self.client.get(reverse('schema'))
+            self.assertEqual(response['Content-Type'], 'application/vnd.oai.openapi')
+            body = b''.join(response.streaming_content).decode()
+            self.assertIn('/api/v1/auth/google/:', body)
+            self.assertIn('jwtCookieAuth', body)
+            not_modified = self.client.get(reverse('schema'), HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+            self.assertEqual(not_modified.status_code, 304)
+
+            settings.OPENAPI_SCHEMA_FILE.write_text(body + '# sửa tay\n')
+            with self.assertRaises(CommandError):
+                call_command('build_schema', '--check', stdout=io.StringIO(), stderr=io.StringIO())
+
+
+class ArchiveTripsTests(BusBookingTestCase):
+    @classmethod
+    def trip_departure(cls):
+        return None
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.admin = User.objects.create_superuser(username='admin', password='matkhau123')
+        now = timezone.now()
+
+        def trip(days_ago, status, seats=()):
+            trip = cls.create_trip(now - timedelta(days=days_ago))
+            for seat_number in seats:
+                Booking.objects.create(user=cls.user, trip=trip, seat_number=seat_number, status='CONFIRMED',
+                                       pickup_point=cls.pickup, dropoff_point=cls.dropoff)
+            Trip.objects.filter(pk=trip.pk).update(status=status)
+            return trip
+
+        cls.old_completed = trip(200, 'COMPLETED', seats=[1, 2, 3])
+        Booking.objects.get(trip=cls.old_completed, seat_number=2).cancel()
+        cls.old_cancelled = trip(150, 'CANCELLED')
+        cls.old_scheduled = trip(200, 'SCHEDULED', seats=[1])
+        cls.recent_completed = trip(10, 'COMPLETED', seats=[5])
+
+    def _exports(self):
+        daily, manifest = io.StringIO(), io.StringIO()
+        call_command('export_bookings', '--date', timezone.localdate().isoformat(), stdout=daily)
+        call_command('export_bookings', '--trip', str(self.old_completed.pk), stdout=manifest)
+        return daily.getvalue(), manifest.getvalue()
+
+    def test_old_finished_trips_move_to_archive_and_stay_readable(self):
+        exports = self._exports()
+        departure_date = timezone.localtime(self.old_completed.departure_time).date()
+        namespaces = [trip_namespace(self.old_completed.pk), trips_on_date(departure_date), TRIPS_ALL]
+        versions = get_versions(namespaces)
+        out = io.StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('archive_trips', '--older-than-days', '90', '--batch-size', '1', '--pause', '0',
+                         stdout=out)
+        self.assertIn('Đã chuyển 2 chuyến, 3 vé', out.getvalue())
+        # Xóa không qua signal: cache response của chuyến, của ngày và của mọi chuyến vẫn được làm mới
+        self.assertTrue(all(get_versions(namespaces)[name] != versions[name] for name in namespaces))
+        self.assertFalse(SeatClaim.objects.filter(trip_id=self.old_completed.pk).exists())
+
+        archived = {self.old_completed.pk, self.old_cancelled.pk}
+        self.assertEqual(set(ArchivedTrip.objects.values_list('pk', flat=True)), archived)
+        self.assertFalse(Trip.objects.filter(pk__in=archived).exists())
+        self.assertFalse(Booking.objects.filter(trip_id__in=archived).exists())
+        self.assertFalse(TripSeatInventory.objects.filter(trip_id__in=archived).exists())
+        self.assertEqual(ArchivedBooking.objects.filter(trip_id=self.old_completed.pk, status='CANCELLED').count(), 1)
+        self.assertEqual(Booking.objects.count(), 2)
+        # Báo cáo đọc cả bảng lưu trữ: kết quả không đổi
+        self.assertEqual(self._exports(), exports)
+
+        self.client.force_login(self.admin)
+        for model in ('archivedtrip', 'archivedbooking'):
+            self.assertEqual(self.client.get(reverse(f'admin:BusBookingApp_{model}_changelist')).status_code, 200)
+
+    def test_failed_batch_rolls_back_and_rerun_resumes(self):
+        with mock.patch.object(ArchivedBooking.objects, 'bulk_create', side_effect=DatabaseError), \
+                self.assertRaises(DatabaseError):
+            next(archive_trips(older_than_days=90))
+        self.assertFalse(ArchivedTrip.objects.exists())
+        self.assertTrue(Trip.objects.filter(pk=self.old_completed.pk).exists())
+
+        self.assertEqual([moved[:2] for moved in archive_trips(older_than_days=90)], [(2, 3)])
+        self.assertEqual(list(archive_trips(older_than_days=90)), [])
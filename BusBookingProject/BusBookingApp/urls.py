@@ -1,16 +1,47 @@
-from django.urls import path, include
+from django.urls import path, include, re_path
+from django.views.generic import TemplateView
+
+from .utils import LazyView
 from .views import (
     TripListView,
     TripDetailView,
+    AsyncTripListView,
+    AsyncTripDetailView,
+    TripSeatEventsView,
     BookingCreateView,
-    GoogleLogin
+    GroupBookingCreateView,
+    PlaceAutocompleteView,
+    BookingExportView,
+    TripManifestExportView,
 )
 
+# Giống dj_rest_auth.registration.urls nhưng các view (kéo theo allauth) chỉ import khi được gọi lần đầu
+registration_urlpatterns = [
+    path('', LazyView('dj_rest_auth.registration.views.RegisterView'), name='rest_register'),
+    re_path(r'verify-email/?$', LazyView('dj_rest_auth.registration.views.VerifyEmailView'),
+            name='rest_verify_email'),
+    re_path(r'resend-email/?$', LazyView('dj_rest_auth.registration.views.ResendEmailVerificationView'),
+            name='rest_resend_email'),
+    # allauth cần reverse() được 2 url này khi gửi email xác nhận
+    re_path(r'^account-confirm-email/(?P<key>[-:\w]+)/$', TemplateView.as_view(), name='account_confirm_email'),
+    re_path(r'account-email-verification-sent/?$', TemplateView.as_view(), name='account_email_verification_sent'),
+]
+
 urlpatterns = [
     # --- BUS & BOOKING API (Giữ nguyên logic nghiệp vụ) ---
     path('trips/', TripListView.as_view(), name='trip-list'),
     path('trips/<int:pk>/', TripDetailView.as_view(), name='trip-detail'),
+    # Bản async (ASGI) của 2 endpoint trên
+    path('trips/async/', AsyncTripListView.as_view(), name='trip-list-async'),
+    path('trips/async/<int:pk>/', AsyncTripDetailView.as_view(), name='trip-detail-async'),
+    # Luồng SSE thay đổi sơ đồ ghế của 1 chuyến
+    path('trips/<int:pk>/events/', TripSeatEventsView.as_view(), name='trip-seat-events'),
+    # Xuất dữ liệu cho điều phối/kế toán (chỉ staff, CSV hoặc NDJSON)
+    path('trips/<int:pk>/manifest/', TripManifestExportView.as_view(), name='trip-manifest'),
     path('bookings/', BookingCreateView.as_view(), name='booking-create'),
+    path('bookings/group/', GroupBookingCreateView.as_view(), name='booking-group-create'),
+    path('bookings/export/', BookingExportView.as_view(), name='booking-export'),
+    path('places/', PlaceAutocompleteView.as_view(), name='place-autocomplete'),
 
     # --- AUTH API (Dùng thư viện) ---
     # 1. Login, Logout, User Info, Password Reset...
@@ -19,8 +50,8 @@ urlpatterns = [
 
     # 2. Registration (Đăng ký tài khoản thường)
     # Endpoint: /api/auth/registration/
-    path('auth/registration/', include('dj_rest_auth.registration.urls')),
+    path('auth/registration/', include(registration_urlpatterns)),
 
     # 3. Google Login (Vẫn cần khai báo view này để map với Google Adapter)
-    path('auth/google/', GoogleLogin.as_view(), name='google_login'),
+    path('auth/google/', LazyView('BusBookingApp.social.GoogleLogin'), name='google_login'),
 ]
\ No newline at end of file
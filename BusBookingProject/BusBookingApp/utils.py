@@ -0,0 +1,45 @@
+import unicodedata
+
+from django.utils.functional import cached_property
+from django.utils.module_loading import import_string
+
+
+def fold_place_name(value):
+    """Chuẩn hóa tên địa danh để so khớp: bỏ dấu tiếng Việt, chữ thường, gộp khoảng trắng.
+
+    Ví dụ: "  Hà  Nội " -> "ha noi", "Đà Lạt" -> "da lat".
+    """
+    value = (value or '').replace('đ', 'd').replace('Đ', 'D')
+    value = unicodedata.normalize('NFKD', value)
+    value = ''.join(ch for ch in value if not unicodedata.combining(ch))
+    return ' '.join(value.lower().split())
+
+
+class LazyView:
+    """View chỉ import module chứa nó ở request đầu tiên, không phải lúc nạp urls (worker khởi động).
+
+    Dùng cho các view ít gọi mà kéo theo nhiều import (đăng nhập mạng xã hội, đăng ký, Swagger UI).
+    Chỉ dành cho APIView của DRF: ``csrf_exempt`` giống ``APIView.as_view()`` (DRF tự kiểm tra CSRF
+    khi xác thực bằng session). ``cls``/``initkwargs`` giúp bộ sinh schema thấy view như bình thường.
+    """
+    csrf_exempt = True
+
+    def __init__(self, dotted_path, **initkwargs):
+        self.dotted_path = dotted_path
+        self.initkwargs = initkwargs
+        # reverse() dựng tên view từ __module__/__qualname__ mà không phải import
+        self.__module__, self.__name__ = dotted_path.rsplit('.', 1)
+        self.__qualname__ = self.__name__
+
+    @cached_property
+    def view(self):
+        return import_string(self.dotted_path).as_view(**self.initkwargs)
+
+    def __getattr__(self, name):
+        # Như view của APIView.as_view(); bộ sinh schema còn gán lại ``cls`` nên không dùng property
+        if name == 'cls':
+            return self.view.cls
+        raise AttributeError(name)
+
+    def __call__(self, request, *args, **kwargs):
+        return self.view(request, *args, **kwargs)
@@ -1,30 +1,50 @@
 from rest_framework import generics, permissions, status
+from rest_framework.views import APIView
 from rest_framework.response import Response
-from datetime import datetime
+import asyncio
+import hashlib
+import json
+from datetime import datetime, time, timedelta
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.static import serve
+from django.utils import timezone
+from django.utils.http import parse_etags, quote_etag
+from django.views import View
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.authentication import BasicAuthentication, SessionAuthentication
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
 
 # Import models & serializers
-from .models import Trip, Booking
-from .serializers import TripSerializer, BookingSerializer
+from .cache import TRIPS_ALL, response_cache_key, trip_namespace, trips_on_date, versioned_timeout
+from .exports import FORMATS as EXPORT_FORMATS, bookings_on, iter_merged_rows, manifest_queryset
+from .live import get_broadcaster
+from .metrics import registry as metrics_registry
+from .models import Trip, Booking, RoutePoint, RouteStop, TripSeatInventory
+from .pagination import TripKeysetPagination
+from .routers import replica_reads
+from .utils import LazyView, fold_place_name
+from .serializers import (
+    PlaceSerializer, TripSerializer, BookingSerializer, GroupBookingSerializer,
+    attach_route_payloads, load_seat_inventories, needs_seat_inventories, SEAT_MAP_FORMATS, SEAT_MAP_COMPACT,
+    SEAT_MAP_FULL,
+)
 # (Xóa UserRegistrationSerializer khỏi import)
 
-# Import cho Google Login
-from allauth.socialaccount.providers.google.views import GoogleOAuth2Adapter
-from allauth.socialaccount.providers.oauth2.client import OAuth2Client
-from dj_rest_auth.registration.views import SocialLoginView
-
-# Import cho Swagger doc
-from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiTypes
+# Mô tả cho Swagger doc (tham số, response) nằm ở BusBookingApp.schema, chỉ nạp khi sinh schema
 
 
 # --------------------------------------
 # 1. AUTH VIEWS
 # --------------------------------------
 
-# Chỉ giữ lại mỗi cái này vì library yêu cầu phải config Adapter
-class GoogleLogin(SocialLoginView):
-    adapter_class = GoogleOAuth2Adapter
-    client_class = OAuth2Client
-    callback_url = "http://localhost:3000"
+# Google Login nằm ở BusBookingApp.social, urls import nó khi được gọi lần đầu (LazyView)
 
 
 # --------------------------------------
@@ -32,37 +52,356 @@ class GoogleLogin(SocialLoginView):
 # --------------------------------------
 # (Giữ nguyên toàn bộ logic TripListView, TripDetailView, BookingCreateView cũ)
 # ... Copy lại phần logic Business cũ của bạn vào đây ...
-class TripListView(generics.ListAPIView):
+
+
+class SeatMapFormatMixin:
+    """Đọc ?seat_map=full|compact|none và truyền xuống TripSerializer qua context."""
+    default_seat_map_format = SEAT_MAP_FULL
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['seat_map_format'] = self.get_seat_map_format()
+        context['segment'] = self.get_segment()
+        return context
+
+    def get_seat_map_format(self):
+        seat_map_format = self.request.query_params.get('seat_map', self.default_seat_map_format)
+        if seat_map_format not in SEAT_MAP_FORMATS:
+            seat_map_format = self.default_seat_map_format
+        return seat_map_format
+
+    def get_segment_point_ids(self):
+        # ?pickup=<id>&dropoff=<id>: chỉ xét ghế trống trên chặng giữa 2 điểm này
+        pickup_id = self.request.query_params.get('pickup')
+        dropoff_id = self.request.query_params.get('dropoff')
+        if not (pickup_id and dropoff_id and pickup_id.isdigit() and dropoff_id.isdigit()):
+            return None
+        return int(pickup_id), int(dropoff_id)
+
+    @staticmethod
+    def pick_segment(points, pickup_id, dropoff_id):
+        pickup, dropoff = points.get(pickup_id), points.get(dropoff_id)
+        if pickup is None or dropoff is None or pickup.route_id != dropoff.route_id or pickup.order >= dropoff.order:
+            return None
+        return pickup, dropoff
+
+    def get_segment(self):
+        point_ids = self.get_segment_point_ids()
+        if point_ids is None:
+            return None
+        return self.pick_segment(RoutePoint.objects.in_bulk(point_ids), *point_ids)
+
+    async def aget_segment(self):
+        point_ids = self.get_segment_point_ids()
+        if point_ids is None:
+            return None
+        return self.pick_segment(await RoutePoint.objects.ain_bulk(point_ids), *point_ids)
+
+
+class ReplicaReadMixin:
+    """Đọc từ bản sao DB (nếu có cấu hình DB_REPLICA_HOST) cho endpoint chỉ đọc."""
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return replica_reads(super().as_view(**initkwargs))
+
+
+def parse_search_date(date_str):
+    try:
+        return datetime.strptime(date_str or '', '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+class AnonymousResponseCacheMixin:
+    """Cache ngắn hạn (TRIP_RESPONSE_CACHE_TTL giây) response của khách vãng lai, kèm ETag.
+
+    Key gồm tham số đã chuẩn hóa và phiên bản của các namespace trong ``get_cache_scope``;
+    Booking/Trip thay đổi thì signal đổi phiên bản (cache.invalidate_trip_responses).
+    Client gửi If-None-Match trùng ETag nhận 304 mà không phải chạy serializer.
+    """
+
+    def get_cache_scope(self):
+        """Trả về (tham số đã chuẩn hóa, danh sách namespace phiên bản)."""
+        raise NotImplementedError
+
+    def cached_response(self, build_response):
+        if self.request.user.is_authenticated or not settings.TRIP_RESPONSE_CACHE_TTL:
+            return build_response()
+
+        key = response_cache_key(*self.get_cache_scope())
+        entry = cache.get(key)
+        response = None
+        if entry is None:
+            response = build_response()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            entry = self.make_cache_entry(response.data)
+            cache.set(key, entry, timeout=versioned_timeout(settings.TRIP_RESPONSE_CACHE_TTL))
+        return self.conditional_response(entry, response)
+
+    async def acached_response(self, build_response):
+        """Bản async của ``cached_response``: ``build_response`` là coroutine function."""
+        if not settings.TRIP_RESPONSE_CACHE_TTL or await self.ais_authenticated():
+            return await build_response()
+
+        key = await sync_to_async(response_cache_key)(*self.get_cache_scope())
+        entry = await cache.aget(key)
+        response = None
+        if entry is None:
+            response = await build_response()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            entry = self.make_cache_entry(response.data)
+            await cache.aset(key, entry, timeout=versioned_timeout(settings.TRIP_RESPONSE_CACHE_TTL))
+        return self.conditional_response(entry, response)
+
+    async def ais_authenticated(self):
+        # View async không chạy các lớp xác thực (đồng bộ) của DRF: có JWT (header Authorization
+        # hoặc cookie JWT_AUTH_COOKIE như CachedJWTCookieAuthentication) thì coi như đã đăng nhập,
+        # còn lại xét session
+        jwt_cookie = getattr(settings, 'REST_AUTH', {}).get('JWT_AUTH_COOKIE')
+        if 'Authorization' in self.request.headers or (jwt_cookie and jwt_cookie in self.request.COOKIES):
+            return True
+        return (await self.request.auser()).is_authenticated
+
+    @staticmethod
+    def make_cache_entry(data):
+        content = json.dumps(data, cls=JSONEncoder, sort_keys=True).encode('utf-8')
+        return quote_etag(hashlib.md5(content).hexdigest()), data
+
+    def make_response(self, data=None, status=status.HTTP_200_OK, headers=None):
+        return Response(data, status=status, headers=headers)
+
+    def conditional_response(self, entry, response=None):
+        etag, data = entry
+        if_none_match = self.request.headers.get('If-None-Match')
+        if if_none_match and (etag in parse_etags(if_none_match) or if_none_match.strip() == '*'):
+            return self.make_response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        if response is None:
+            response = self.make_response(data)
+        response['ETag'] = etag
+        return response
+
+
+def search_trips(params):
+    """Lọc chuyến xe đang mở bán theo ?origin=&destination=&date= (dùng chung cho view sync và async)."""
+    # Tuyến đường + điểm đón/trả lấy từ cache (serializers.attach_route_payloads)
+    queryset = Trip.objects.filter(status='SCHEDULED').select_related('bus')
+
+    origin = params.get('origin')
+    destination = params.get('destination')
+    date_str = params.get('date')
+
+    # Tra tuyến qua chỉ mục địa danh RouteStop (bỏ dấu, so khớp tiền tố): điểm dừng giữa đường
+    # cũng là điểm đi/đến hợp lệ, miễn là điểm đi đứng trước điểm đến trên lộ trình
+    if origin or destination:
+        queryset = queryset.filter(route_id__in=RouteStop.routes_serving(origin, destination))
+    if date_str:
+        date_obj = parse_search_date(date_str)
+        if date_obj:
+            # Khoảng nửa mở [00:00 ngày đó, 00:00 ngày hôm sau) theo múi giờ hiện hành,
+            # thay cho departure_time__date (DATE(cột) không dùng được index)
+            day_start = timezone.make_aware(datetime.combine(date_obj, time.min))
+            next_day_start = timezone.make_aware(datetime.combine(date_obj + timedelta(days=1), time.min))
+            queryset = queryset.filter(departure_time__gte=day_start, departure_time__lt=next_day_start)
+
+    return queryset
+
+
+def trip_list_cache_scope(params):
+    scope = {name: params.get(name, '') for name in ('seat_map', 'pickup', 'dropoff', 'cursor', 'page_size')}
+    scope['origin'] = fold_place_name(params.get('origin'))
+    scope['destination'] = fold_place_name(params.get('destination'))
+    date_obj = parse_search_date(params.get('date'))
+    scope['date'] = date_obj
+    # Tìm theo ngày chỉ phụ thuộc các chuyến của ngày đó
+    namespace = trips_on_date(date_obj) if date_obj else TRIPS_ALL
+    return ('trip-list', sorted(scope.items(), key=lambda item: item[0])), [namespace]
+
+
+def trip_detail_cache_scope(pk, params):
+    scope = [(name, params.get(name, '')) for name in ('seat_map', 'pickup', 'dropoff')]
+    return ('trip-detail', pk, scope), [trip_namespace(pk)]
+
+
+class TripListView(ReplicaReadMixin, AnonymousResponseCacheMixin, SeatMapFormatMixin, generics.ListAPIView):
     serializer_class = TripSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = TripKeysetPagination
 
     def get_queryset(self):
-        queryset = Trip.objects.filter(status='SCHEDULED') \
-            .select_related('route', 'bus') \
-            .prefetch_related('route__points')
-
-        origin = self.request.query_params.get('origin')
-        destination = self.request.query_params.get('destination')
-        date_str = self.request.query_params.get('date')
+        return search_trips(self.request.query_params)
 
-        if origin:
-            queryset = queryset.filter(route__origin__icontains=origin)
-        if destination:
-            queryset = queryset.filter(route__destination__icontains=destination)
-        if date_str:
-            try:
-                date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
-                queryset = queryset.filter(departure_time__date=date_obj)
-            except ValueError:
-                pass
+    def get_cache_scope(self):
+        return trip_list_cache_scope(self.request.query_params)
 
-        return queryset
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(partial(super().list, request, *args, **kwargs))
 
 
-class TripDetailView(generics.RetrieveAPIView):
+class TripDetailView(ReplicaReadMixin, AnonymousResponseCacheMixin, SeatMapFormatMixin, generics.RetrieveAPIView):
     serializer_class = TripSerializer
     permission_classes = [permissions.AllowAny]
-    queryset = Trip.objects.all().select_related('route', 'bus').prefetch_related('route__points')
+    queryset = Trip.objects.all().select_related('bus')
+
+    def get_cache_scope(self):
+        return trip_detail_cache_scope(self.kwargs['pk'], self.request.query_params)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(partial(super().retrieve, request, *args, **kwargs))
+
+
+# --------------------------------------
+# 3. ASYNC VIEWS (ASGI)
+# --------------------------------------
+# Bản async của tìm kiếm/chi tiết chuyến xe, cùng tham số, cùng response và cùng cache như bản DRF.
+# Khi chạy dưới ASGI (uvicorn/daphne + BusBookingProject.asgi), request đang chờ DB không giữ worker thread.
+
+class DataJsonResponse(JsonResponse):
+    """JsonResponse giữ lại ``data`` (như Response của DRF) để ghi vào cache response."""
+
+    def __init__(self, data, **kwargs):
+        super().__init__(data, encoder=JSONEncoder, safe=False, json_dumps_params={'ensure_ascii': False}, **kwargs)
+        self.data = data
+
+
+class AsyncTripReadView(AnonymousResponseCacheMixin, SeatMapFormatMixin, View):
+    http_method_names = ['get', 'head', 'options']
+
+    def setup(self, request, *args, **kwargs):
+        # Chỉ bọc Request của DRF để đọc query_params; không chạm tới request.user (xác thực đồng bộ)
+        super().setup(Request(request), *args, **kwargs)
+
+    def make_response(self, data=None, status=status.HTTP_200_OK, headers=None):
+        if data is None:
+            return HttpResponse(status=status, headers=headers)
+        return DataJsonResponse(data, status=status, headers=headers)
+
+    async def aget_serializer_context(self):
+        return {
+            'request': self.request,
+            'seat_map_format': self.get_seat_map_format(),
+            'segment': await self.aget_segment(),
+        }
+
+    async def serialize(self, trips, many=True):
+        context = await self.aget_serializer_context()
+        # Payload tuyến đường (cache) rồi sơ đồ ghế của cả trang, trong 1 lần sang luồng đồng bộ:
+        # sync_to_async (thread_sensitive) chạy mọi lời gọi tuần tự trên cùng 1 luồng, gather
+        # cũng không làm chúng song song. Serializer sau đó chỉ đọc lại giá trị đã gắn vào trip
+        def load():
+            attach_route_payloads(trips)
+            if needs_seat_inventories(context['seat_map_format']):
+                load_seat_inventories(trips)
+        await sync_to_async(load)()
+        return TripSerializer(trips if many else trips[0], many=many, context=context).data
+
+
+class AsyncTripListView(ReplicaReadMixin, AsyncTripReadView):
+    """GET /trips/async/: như TripListView (phân trang keyset theo departure_time, id)."""
+
+    def get_cache_scope(self):
+        return trip_list_cache_scope(self.request.query_params)
+
+    async def get(self, request, *args, **kwargs):
+        return await self.acached_response(self.build_response)
+
+    async def build_response(self):
+        paginator = TripKeysetPagination()
+        trips = await paginator.apaginate_queryset(search_trips(self.request.query_params), self.request)
+        data = await self.serialize(trips)
+        return self.make_response(paginator.get_paginated_response(data).data)
+
+
+class AsyncTripDetailView(ReplicaReadMixin, AsyncTripReadView):
+    """GET /trips/async/<pk>/: như TripDetailView."""
+
+    def get_cache_scope(self):
+        return trip_detail_cache_scope(self.kwargs['pk'], self.request.query_params)
+
+    async def get(self, request, *args, **kwargs):
+        return await self.acached_response(self.build_response)
+
+    async def build_response(self):
+        try:
+            trip = await Trip.objects.select_related('bus').aget(pk=self.kwargs['pk'])
+        except Trip.DoesNotExist:
+            return self.make_response({'detail': NotFound.default_detail}, status=status.HTTP_404_NOT_FOUND)
+        return self.make_response(await self.serialize([trip], many=False))
+
+
+class TripSeatEventsView(AsyncTripReadView):
+    """GET /trips/<pk>/events/: luồng SSE (text/event-stream) thay đổi sơ đồ ghế của 1 chuyến.
+
+    - ``snapshot``: sự kiện đầu tiên, sơ đồ ghế rút gọn như ?seat_map=compact.
+    - ``seats``: chỉ các ghế vừa đổi trạng thái trên chặng client đang xem (?pickup=&dropoff=),
+      kèm số ghế còn trống; client áp lên sơ đồ đang có, không phải tải lại cả chuyến.
+    - ``reset``: client cần tải lại sơ đồ ghế (lộ trình đổi số chặng, hoặc đọc sự kiện quá chậm).
+    """
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            trip = await Trip.objects.select_related('bus').aget(pk=self.kwargs['pk'])
+        except Trip.DoesNotExist:
+            return self.make_response({'detail': NotFound.default_detail}, status=status.HTTP_404_NOT_FOUND)
+        segment = await self.aget_segment()
+        response = StreamingHttpResponse(self.stream(trip, segment), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Không để nginx gom buffer luồng sự kiện
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    @staticmethod
+    def format_event(name, data):
+        return f"event: {name}\ndata: {json.dumps(data, cls=JSONEncoder, separators=(',', ':'))}\n\n"
+
+    async def stream(self, trip, segment):
+        # Đăng ký nghe trước rồi mới đọc sơ đồ ghế, để không lỡ thay đổi nào xảy ra ở giữa
+        async with get_broadcaster().subscribe(trip.pk) as subscription:
+            await sync_to_async(load_seat_inventories)([trip])
+            serializer = TripSerializer(context={'seat_map_format': SEAT_MAP_COMPACT, 'segment': segment})
+            yield self.format_event('snapshot', serializer.get_seat_map(trip))
+
+            inventory = trip._seat_inventory
+            start, end = serializer.get_seat_span(trip)
+            free_seats = inventory.free_seats(start, end)
+            while True:
+                try:
+                    event = await subscription.get(timeout=settings.SEAT_EVENTS_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+                    continue
+                if event['type'] != 'seats' or event['segment_count'] != inventory.segment_count:
+                    yield self.format_event('reset', {})
+                    return
+
+                changes = []
+                for seat_number, segments in event['seats'].items():
+                    seat_number, is_available = int(seat_number), TripSeatInventory.TAKEN not in segments[start:end]
+                    if is_available == (seat_number in free_seats):
+                        continue
+                    if is_available:
+                        free_seats.add(seat_number)
+                    else:
+                        free_seats.discard(seat_number)
+                    changes.append({'seat_number': seat_number, 'is_available': is_available})
+                if changes:
+                    yield self.format_event('seats', {'available_count': len(free_seats), 'seats': changes})
+
+
+class PlaceAutocompleteView(generics.ListAPIView):
+    """Gợi ý địa danh (điểm đi/đến của tuyến và các điểm đón/trả) theo tiền tố, không phân biệt dấu."""
+    serializer_class = PlaceSerializer
+    permission_classes = [permissions.AllowAny]
+    max_results = 10
+
+    def get_queryset(self):
+        query = fold_place_name(self.request.query_params.get('q', ''))
+        if not query:
+            return RouteStop.objects.none()
+        return RouteStop.objects.filter(key__istartswith=query) \
+            .values('name').order_by('name').distinct()[:self.max_results]
 
 
 class BookingCreateView(generics.CreateAPIView):
@@ -78,4 +417,90 @@ class BookingCreateView(generics.CreateAPIView):
             {"message": "Đặt vé thành công!", "data": serializer.data},
             status=status.HTTP_201_CREATED,
             headers=headers
-        )
\ No newline at end of file
+        )
+
+
+class GroupBookingCreateView(BookingCreateView):
+    """Đặt nhiều ghế cùng lúc: giữ tất cả ghế hoặc không ghế nào, số query không phụ thuộc số ghế."""
+    serializer_class = GroupBookingSerializer
+
+
+# --------------------------------------
+# 4. METRICS
+# --------------------------------------
+
+class MetricsView(APIView):
+    """Số liệu theo endpoint (xem BusBookingApp.metrics) dạng text của Prometheus, chỉ cho staff.
+
+    Ngoài JWT cookie còn nhận session (xem từ trình duyệt đã đăng nhập admin) và Basic Auth (cho Prometheus).
+    """
+    permission_classes = [permissions.IsAdminUser]
+    authentication_classes = [*api_settings.DEFAULT_AUTHENTICATION_CLASSES, SessionAuthentication, BasicAuthentication]
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(metrics_registry.render_prometheus(), content_type='text/plain; version=0.0.4')
+
+
+# --------------------------------------
+# 5. EXPORT (điều phối, kế toán)
+# --------------------------------------
+# Chỉ cho staff; ghi response theo luồng (xem BusBookingApp.exports), ?output=csv (mặc định) hoặc ndjson.
+
+class BookingExportView(ReplicaReadMixin, APIView):
+    permission_classes = [permissions.IsAdminUser]
+    authentication_classes = [*api_settings.DEFAULT_AUTHENTICATION_CLASSES, SessionAuthentication, BasicAuthentication]
+
+    def stream(self, querysets, filename):
+        output = self.request.query_params.get('output', 'csv')
+        if output not in EXPORT_FORMATS:
+            raise ValidationError({'output': f"Chỉ hỗ trợ: {', '.join(EXPORT_FORMATS)}."})
+        content_type, extension, lines = EXPORT_FORMATS[output]
+        # Truy vấn chỉ chạy khi response được đọc, lúc đó view đã trả về: chốt DB (bản sao) ngay bây giờ
+        querysets = [queryset.using(queryset.db) for queryset in querysets]
+        response = StreamingHttpResponse(lines(iter_merged_rows(querysets)), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}.{extension}"'
+        return response
+
+    def get(self, request, *args, **kwargs):
+        date = parse_search_date(request.query_params.get('date'))
+        if date is None:
+            raise ValidationError({'date': "Cần ngày đặt vé dạng YYYY-MM-DD."})
+        return self.stream(bookings_on(date), f'bookings-{date.isoformat()}')
+
+
+class TripManifestExportView(BookingExportView):
+    """Danh sách hành khách của 1 chuyến (kể cả chuyến đã lưu trữ), theo thứ tự điểm đón."""
+
+    def get(self, request, pk, *args, **kwargs):
+        queryset = manifest_queryset(pk)
+        if queryset is None:
+            raise NotFound()
+        return self.stream([queryset], f'manifest-trip-{pk}')
+
+
+# --------------------------------------
+# 6. API DOCS
+# --------------------------------------
+
+# Sinh schema lúc chạy; drf-spectacular (kể cả các decorator mô tả API) chỉ được nạp ở đây, khi thật sự cần
+runtime_schema_view = LazyView('BusBookingApp.schema.SchemaView')
+
+SCHEMA_CONTENT_TYPES = {'.json': 'application/vnd.oai.openapi+json', '.yaml': 'application/vnd.oai.openapi',
+                        '.yml': 'application/vnd.oai.openapi'}
+
+
+class OpenAPISchemaView(View):
+    """Schema OpenAPI dựng sẵn bằng ``manage.py build_schema`` (OPENAPI_SCHEMA_FILE), đọc thẳng từ đĩa.
+
+    Chưa build (môi trường dev) hoặc có tham số (?format=, ?lang=) thì sinh lúc chạy như SpectacularAPIView.
+    """
+
+    def get(self, request, *args, **kwargs):
+        path = settings.OPENAPI_SCHEMA_FILE
+        if request.GET or not path.is_file():
+            return runtime_schema_view(request, *args, **kwargs)
+        # serve() trả Last-Modified và 304 cho If-Modified-Since
+        response = serve(request, path.name, document_root=path.parent)
+        if response.status_code == 200:
+            response['Content-Type'] = SCHEMA_CONTENT_TYPES.get(path.suffix, response['Content-Type'])
+        return response
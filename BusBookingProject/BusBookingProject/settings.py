@@ -18,6 +18,12 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 config = dotenv_values(BASE_DIR / ".env")
 
+
+def config_flag(name, default=False):
+    value = config.get(name)
+    return default if value is None else value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/4.2/howto/deployment/checklist/
 
@@ -98,15 +104,123 @@ WSGI_APPLICATION = 'BusBookingProject.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.mysql',
-        'NAME': config['DB_NAME'],
-        'USER': config['DB_USER'],
-        'PASSWORD': config['DB_PASSWORD'],
-        'HOST': ''
+# DB_ENGINE=sqlite: chạy thử/benchmark trên máy không có MySQL (file DB_NAME, mặc định db.sqlite3)
+if (config.get('DB_ENGINE') or 'mysql') == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / (config.get('DB_NAME') or 'db.sqlite3'),
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.mysql',
+            'NAME': config['DB_NAME'],
+            'USER': config['DB_USER'],
+            'PASSWORD': config['DB_PASSWORD'],
+            'HOST': config.get('DB_HOST') or '',
+            'PORT': config.get('DB_PORT') or '',
+            # Giữ kết nối MySQL qua nhiều request thay vì bắt tay + xác thực lại mỗi request
+            # (giây, 0 = đóng sau mỗi request)
+            'CONN_MAX_AGE': int(config.get('DB_CONN_MAX_AGE') or 60),
+            # Kiểm tra kết nối đang giữ còn sống trước khi dùng cho request mới
+            'CONN_HEALTH_CHECKS': config_flag('DB_CONN_HEALTH_CHECKS', default=True),
+        }
     }
-}
+
+# Pool kết nối cho bản chạy ASGI (DB_POOL=true, cần gói django-db-connection-pool[mysql]):
+# dưới ASGI mỗi request có thể chạy trên thread khác nhau nên CONN_MAX_AGE không giữ được kết nối,
+# pool (SQLAlchemy QueuePool) dùng lại kết nối giữa các thread
+if config_flag('DB_POOL') and DATABASES['default']['ENGINE'] == 'django.db.backends.mysql':
+    DATABASES['default'].update({
+        'ENGINE': 'dj_db_conn_pool.backends.mysql',
+        'CONN_MAX_AGE': 0,
+        'POOL_OPTIONS': {
+            'POOL_SIZE': int(config.get('DB_POOL_SIZE') or 10),
+            'MAX_OVERFLOW': int(config.get('DB_POOL_MAX_OVERFLOW') or 10),
+            'RECYCLE': int(config.get('DB_POOL_RECYCLE') or 30 * 60),
+            'PRE_PING': DATABASES['default']['CONN_HEALTH_CHECKS'],
+        },
+    })
+
+# Bản sao chỉ đọc (DB_REPLICA_HOST): tìm kiếm/chi tiết chuyến xe đọc từ đây,
+# đặt vé và mọi thao tác ghi vẫn ở default (xem BusBookingApp.routers)
+if config.get('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': config.get('DB_REPLICA_NAME') or DATABASES['default']['NAME'],
+        'USER': config.get('DB_REPLICA_USER') or DATABASES['default']['USER'],
+        'PASSWORD': config.get('DB_REPLICA_PASSWORD') or DATABASES['default']['PASSWORD'],
+        'HOST': config['DB_REPLICA_HOST'],
+        'PORT': config.get('DB_REPLICA_PORT') or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_ROUTERS = ['BusBookingApp.routers.ReadReplicaRouter']
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Mặc định dùng bộ nhớ cục bộ của từng process; khai báo REDIS_URL trong .env để dùng chung Redis.
+# Các cache dưới đây được làm mới bằng cách tăng phiên bản trong cache (xem BusBookingApp/cache.py):
+# chạy nhiều worker thì cần cache dùng chung, nếu không worker khác vẫn đọc bản cũ tới khi hết hạn.
+
+if config.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': config['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'busbooking',
+        }
+    }
+
+# Cache cục bộ của từng process (không có REDIS_URL): mọi cache làm mới theo phiên bản sống tối đa
+# chừng này giây, để dữ liệu cũ ở các worker khác không tồn tại lâu hơn
+LOCAL_CACHE_MAX_TTL = int(config.get('LOCAL_CACHE_MAX_TTL') or 30)
+
+# Payload tuyến đường (Route + RoutePoint) đã serialize, bị vô hiệu hóa qua signal khi sửa tuyến
+# (với cache cục bộ: tối đa LOCAL_CACHE_MAX_TTL)
+ROUTE_CACHE_TIMEOUT = int(config.get('ROUTE_CACHE_TIMEOUT') or 60 * 60 * 24)
+
+# Cache response tìm kiếm/chi tiết chuyến cho khách vãng lai (giây, 0 để tắt)
+TRIP_RESPONSE_CACHE_TTL = int(config.get('TRIP_RESPONSE_CACHE_TTL') or 5)
+
+# Cache User đã xác thực bằng JWT trong bộ nhớ mỗi process (giây, 0 để tắt) và số user tối đa giữ lại
+# Khóa/đổi mật khẩu user chỉ có hiệu lực ngay ở mọi worker khi cache mặc định dùng chung (REDIS_URL);
+# với cache cục bộ TTL bị giới hạn ở LOCAL_CACHE_MAX_TTL
+AUTH_USER_CACHE_TTL = int(config.get('AUTH_USER_CACHE_TTL') or 60)
+AUTH_USER_CACHE_SIZE = int(config.get('AUTH_USER_CACHE_SIZE') or 10000)
+
+# Giá vé động theo độ lấp đầy của chuyến (bật bằng FARE_OCCUPANCY_PRICING=1):
+# [(tỉ lệ ghế đã bán tối thiểu, hệ số giá)], rỗng là tắt; giá sau khi nhân làm tròn tới FARE_ROUNDING đồng
+FARE_OCCUPANCY_MULTIPLIERS = [(0.7, '1.1'), (0.9, '1.2')] if config_flag('FARE_OCCUPANCY_PRICING') else []
+FARE_ROUNDING = int(config.get('FARE_ROUNDING') or 1000)
+
+# Vé PENDING (chờ thanh toán) giữ ghế trong bao nhiêu phút
+BOOKING_HOLD_MINUTES = int(config.get('BOOKING_HOLD_MINUTES') or 15)
+
+# Chuyến đã kết thúc (COMPLETED/CANCELLED) quá số ngày này thì lệnh archive_trips chuyển sang bảng lưu trữ
+ARCHIVE_AFTER_DAYS = int(config.get('ARCHIVE_AFTER_DAYS') or 90)
+
+# Kênh đẩy thay đổi sơ đồ ghế (SSE /api/v1/trips/<pk>/events/): mặc định phát trong cùng process;
+# chạy nhiều process thì dùng Redis pub/sub (BusBookingApp.live.RedisBroadcaster, cần REDIS_URL)
+SEAT_EVENTS_BACKEND = config.get('SEAT_EVENTS_BACKEND') or 'BusBookingApp.live.InProcessBroadcaster'
+SEAT_EVENTS_REDIS_URL = config.get('REDIS_URL')
+# Gửi comment giữ kết nối SSE sau mỗi bao nhiêu giây không có sự kiện
+SEAT_EVENTS_KEEPALIVE = int(config.get('SEAT_EVENTS_KEEPALIVE') or 15)
+
+# Số liệu theo endpoint (số query, thời gian DB/serializer, kích thước response) + header Server-Timing,
+# xem ở /api/_metrics/ (chỉ staff). Tắt thì middleware không có trong MIDDLEWARE, không tốn gì thêm
+REQUEST_METRICS = config_flag('REQUEST_METRICS')
+# Số mẫu gần nhất mỗi endpoint dùng để tính phân vị
+REQUEST_METRICS_WINDOW = int(config.get('REQUEST_METRICS_WINDOW') or 1000)
+if REQUEST_METRICS:
+    MIDDLEWARE.insert(0, 'BusBookingApp.middleware.RequestMetricsMiddleware')
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -151,11 +265,18 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'dj_rest_auth.jwt_auth.JWTCookieAuthentication',
+        # JWTCookieAuthentication + cache User theo (id, phiên bản): không đọc auth_user ở mỗi request
+        'BusBookingApp.authentication.CachedJWTCookieAuthentication',
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # Phân trang keyset cho tìm kiếm chuyến xe (BusBookingApp.pagination.TripKeysetPagination)
+    'PAGE_SIZE': 20,
+    'MAX_PAGE_SIZE': 100,
 }
 
+# PAGE_SIZE chỉ dùng cho các view tự khai báo pagination_class
+SILENCED_SYSTEM_CHECKS = ['rest_framework.W001']
+
 REST_AUTH = {
     'USE_JWT': True,
     'JWT_AUTH_COOKIE': 'my-app-auth',
@@ -174,3 +295,7 @@ SPECTACULAR_SETTINGS = {
     # Tự động nhận diện Authentication (hỗ trợ nút "Authorize" cho JWT)
     'COMPONENT_SPLIT_REQUEST': True,
 }
+
+# Schema OpenAPI dựng sẵn lúc build/deploy bằng `python manage.py build_schema`, /api/schema/ đọc thẳng file này
+# (chưa có file thì sinh lúc chạy). Đuôi .json hoặc .yaml quyết định định dạng.
+OPENAPI_SCHEMA_FILE = Path(config.get('OPENAPI_SCHEMA_FILE') or BASE_DIR / 'openapi-schema.yaml')
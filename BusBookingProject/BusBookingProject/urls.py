@@ -3,18 +3,21 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from rest_framework.authtoken.views import obtain_auth_token
-# Import các view của Swagger (nếu bạn đã cài drf-spectacular ở bước trước)
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
+from BusBookingApp.utils import LazyView
+from BusBookingApp.views import MetricsView, OpenAPISchemaView
 
 urlpatterns = [
     # 1. Trang quản trị Django (Admin)
     path('admin/', admin.site.urls),
     path('api/v1/', include('BusBookingApp.urls')),
     # 3. Cấu hình Swagger API Docs
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
-    path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
-    path('api/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
+    # Schema đọc từ file build sẵn (manage.py build_schema); trang docs chỉ import drf-spectacular khi được mở
+    path('api/schema/', OpenAPISchemaView.as_view(), name='schema'),
+    path('api/docs/', LazyView('drf_spectacular.views.SpectacularSwaggerView', url_name='schema'), name='swagger-ui'),
+    path('api/redoc/', LazyView('drf_spectacular.views.SpectacularRedocView', url_name='schema'), name='redoc'),
+
+    # Số liệu theo endpoint (REQUEST_METRICS=true), chỉ staff
+    path('api/_metrics/', MetricsView.as_view(), name='metrics'),
 ]
 
 # 4. Cấu hình phục vụ file Media (Ảnh xe, avatar...) trong môi trường DEV